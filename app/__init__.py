@@ -38,7 +38,19 @@ def create_app():
     app.register_blueprint(data.bp, url_prefix='/data')
     app.register_blueprint(dispatch_reports.bp)
     app.register_blueprint(sales_order.bp)
+
+    # Build the typeahead index in the background and keep it refreshed
+    from app.utils.suggest_index import start_suggest_index
+    start_suggest_index()
+
+    # Mirror the tab_* tables into the local read replica, if one is configured
+    from app.utils.read_replica import start_replica_sync
+    start_replica_sync()
     
+    # Forms that create records submit a fresh key, so double submits are saved once
+    from app.utils.idempotency import new_idempotency_key
+    app.jinja_env.globals['new_idempotency_key'] = new_idempotency_key
+
     # Register custom Jinja2 filters
     @app.template_filter('number_format')
     def number_format(value):
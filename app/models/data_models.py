@@ -1,95 +1,262 @@
-from supabase import create_client, Client
+from app.utils.supabase_client import get_supabase_client
+from app.utils.cache import cached, invalidate_table
+from app.utils.read_replica import serves_table, ReplicaQuery, replicate_upsert, replicate_delete
+from app.utils.analytics import analytics_available, article_summary_rows, article_months
+from app.utils.paging import POSTGREST_MAX_ROWS
 import os
 import math
 from flask import request
 from datetime import datetime, date, timedelta
 import uuid # Import uuid for ID generation
+import base64
+import json
+import pandas as pd
 
-# Supabase Configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def read_table(table_name):
+    """
+    Returns a query builder for reads of `table_name`.
 
-def get_paginated_data(table_name, search="", page=1, limit=10, columns: list[str] = None):
-    """Helper function to get paginated data from Supabase"""
+    Reads go to the local read replica when one is configured and holds a
+    synced copy of the table, otherwise to Supabase. Writes always go to
+    Supabase through `get_supabase_client().table()`.
+    """
+    if serves_table(table_name):
+        return ReplicaQuery(table_name)
+    return get_supabase_client().table(table_name)
+
+# Cache lifetimes (seconds) for results read from the summary views
+SUMMARY_METRICS_TTL = int(os.getenv("SUMMARY_METRICS_TTL", 60))
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 300))
+
+# Upper bound for the page size accepted from the `limit` query arg
+MAX_PAGE_LIMIT = 100
+
+# Count strategy used for pagination totals, per table, either one mode or a
+# (plain listing, listing with search/filters) pair. PostgREST supports 'exact'
+# (COUNT(*)), 'planned' (planner statistics) and 'estimated' (exact up to the
+# server's max-rows, planner estimate beyond that). 'capped' counts at most
+# PAGINATION_COUNT_CAP rows past the current page and shows larger totals as "N+".
+# Planner estimates are close for a whole table but can be far off once filters
+# apply, which is why filtered listings use a capped count.
+DEFAULT_COUNT_MODE = "exact"
+TABLE_COUNT_MODES = {
+    "tab_cutting": ("planned", "capped"),
+    "tab_production": ("planned", "capped"),
+}
+# The capped probe fetches CAP + 1 rows in one request, so the cap stays below max-rows
+PAGINATION_COUNT_CAP = min(int(os.getenv("PAGINATION_COUNT_CAP", 999)), POSTGREST_MAX_ROWS - 1)
+
+def get_count_mode(table_name, filtered=False):
+    """Returns the count strategy configured for a table, for a plain or a searched/filtered listing."""
+    mode = TABLE_COUNT_MODES.get(table_name, DEFAULT_COUNT_MODE)
+    if isinstance(mode, tuple):
+        mode = mode[1 if filtered else 0]
+    return mode
+
+def clamp_page_limit(limit, default=20):
+    """Coerces a requested page size into the range 1..MAX_PAGE_LIMIT."""
     try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+# Columns forming the keyset used by cursor pagination, in sort order
+CURSOR_KEY_COLUMNS = ["input_timestamp", "id"]
+
+def encode_cursor(row, direction="next"):
+    """Builds an opaque pagination token from a row's (input_timestamp, id) key; the timestamp may be None."""
+    payload = json.dumps({"ts": row.get("input_timestamp"), "id": row.get("id"), "dir": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    """Decodes a pagination token into (input_timestamp, id, direction), or None if it is malformed. The timestamp may be None."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if payload["id"] is None:
+            return None
+        return payload["ts"], payload["id"], "prev" if payload.get("dir") == "prev" else "next"
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def cursor_filter(cursor_ts, cursor_id, descending=True):
+    """
+    PostgREST or= filter selecting the rows past a cursor in the keyset order
+    (input_timestamp DESC NULLS LAST, id DESC), or before it when not `descending`.
+    Rows without a timestamp sort after every dated row, ordered by id.
+    """
+    if cursor_ts is None:
+        if descending:
+            return f'and(input_timestamp.is.null,id.lt."{cursor_id}")'
+        return f'input_timestamp.not.is.null,and(input_timestamp.is.null,id.gt."{cursor_id}")'
+    op = "lt" if descending else "gt"
+    condition = f'input_timestamp.{op}."{cursor_ts}",and(input_timestamp.eq."{cursor_ts}",id.{op}."{cursor_id}")'
+    return f'{condition},input_timestamp.is.null' if descending else condition
+
+# Define numeric fields for appropriate comparison types
+NUMERIC_FILTER_FIELDS = ['pcs_pack', 'sets', 'produced_qty', 'rejection']
+
+def parse_filter_args(args) -> list[tuple]:
+    """Reads the filter_field_N/filter_operator_N/filter_value_N arguments into (field, operator, value) tuples."""
+    filters = []
+    filter_index = 0
+    while True:
+        field = args.get(f'filter_field_{filter_index}')
+        operator = args.get(f'filter_operator_{filter_index}')
+        value = args.get(f'filter_value_{filter_index}')
+
+        if not field or not operator:
+            break # No more filter conditions
+
+        filters.append((field, operator, value))
+        filter_index += 1
+    return filters
+
+def apply_filters(query, filters: list[tuple]):
+    """Applies (field, operator, value) filter conditions to a Supabase query."""
+    for field, operator, value in filters:
+        print(f"[DEBUG] Processing filter: field={field}, operator={operator}, value={value}")
+
+        # Apply Supabase filter based on operator
+        if operator == 'equal':
+            if field in NUMERIC_FILTER_FIELDS:
+                query = query.eq(field, float(value)) if value else query # Handle potential empty value for numeric fields
+            else:
+                query = query.ilike(field, value) # Use ilike for case-insensitive string equality
+        elif operator == 'not_equal':
+            if field in NUMERIC_FILTER_FIELDS:
+                query = query.neq(field, float(value)) if value else query
+            else:
+                query = query.not_.ilike(field, value)
+        elif operator == 'like':
+            query = query.ilike(field, f'%{value}%')
+        elif operator == 'not_like':
+            query = query.not_.ilike(field, f'%{value}%')
+        elif operator == 'is_set':
+            query = query.not_.is_(field, None)
+        elif operator == 'not_set':
+            query = query.is_(field, None)
+        elif operator == 'gt':
+            query = query.gt(field, float(value))
+        elif operator == 'lt':
+            query = query.lt(field, float(value))
+    return query
+
+def get_paginated_data(table_name, search="", page=1, limit=10, columns: list[str] = None, count_mode: str = None, cursor: str = None, pagination: str = "offset"):
+    """Helper function to get paginated data from Supabase.
+
+    Only the requested page is fetched: the page window is pushed into the
+    query as a range and the total comes from the count header, so the cost
+    of a page is bounded by `limit` rather than by the size of the table.
+
+    With pagination="cursor" (or when a cursor token is given) rows are paged
+    by the (input_timestamp, id) keyset instead of an offset, and the result
+    carries opaque next_cursor/prev_cursor tokens instead of a page count.
+
+    Offset pages also report total_rows with total_exact/total_capped flags,
+    as the 'planned', 'estimated' and 'capped' count modes are approximate.
+    """
+    try:
+        limit = clamp_page_limit(limit)
         offset = (page - 1) * limit
+        filters = parse_filter_args(request.args)
+        count_mode = count_mode or get_count_mode(table_name, filtered=bool(search or filters))
+        cursor_mode = pagination == "cursor" or bool(cursor)
+        # Cursor pages don't need a total; capped totals come from a bounded probe instead
+        header_count = None if cursor_mode or count_mode == "capped" else count_mode
+        cursor_key = decode_cursor(cursor) if cursor else None
+        # Previous pages are read in ascending key order and flipped afterwards
+        descending = not (cursor_key and cursor_key[2] == "prev")
+
+        # Cursor tokens are built from the keyset, so make sure it is selected
+        select_columns = columns
+        if cursor_mode and columns:
+            select_columns = columns + [col for col in CURSOR_KEY_COLUMNS if col not in columns]
         
         # Dynamically select columns
-        if columns:
-            select_query_string = ",".join(columns)
+        if select_columns:
+            select_query_string = ",".join(select_columns)
             print(f"[DEBUG] Supabase select query string: {select_query_string}") # DEBUG
-            query = supabase.table(table_name).select(select_query_string)
+            query = read_table(table_name).select(select_query_string, count=header_count)
         else:
             print("[DEBUG] Supabase select query string: *") # DEBUG
-            query = supabase.table(table_name).select("*")
-
-        # Add ordering by input_timestamp descending
-        query = query.order('input_timestamp', desc=True)
-
-        if search:
-            search_conditions = []
-            search_columns = ['unique_key', 'id', 'shipment_id', 'production', 'channel_abb']
-            # Filter search_columns to only include those requested if columns is not None
-            if columns:
-                search_columns = [col for col in search_columns if col in columns]
-            
-            for column in search_columns:
-                search_conditions.append(f"{column}.ilike.%{search}%")
-            if search_conditions:
-                query = query.or_(",".join(search_conditions))
-
-        # Define numeric fields for appropriate comparison types
-        numeric_fields = ['pcs_pack', 'sets', 'produced_qty', 'rejection']
-
-        # Handle filters (field, operator, value)
-        filter_index = 0
-        while True:
-            field = request.args.get(f'filter_field_{filter_index}')
-            operator = request.args.get(f'filter_operator_{filter_index}')
-            value = request.args.get(f'filter_value_{filter_index}')
-
-            if not field or not operator:
-                break # No more filter conditions
-
-            print(f"[DEBUG] Processing filter: field={field}, operator={operator}, value={value}")
-
-            # Apply Supabase filter based on operator
-            if operator == 'equal':
-                if field in numeric_fields:
-                    query = query.eq(field, float(value)) if value else query # Handle potential empty value for numeric fields
-                else:
-                    query = query.ilike(field, value) # Use ilike for case-insensitive string equality
-            elif operator == 'not_equal':
-                if field in numeric_fields:
-                    query = query.neq(field, float(value)) if value else query
-                else:
-                    query = query.not_ilike(field, value)
-            elif operator == 'like':
-                query = query.ilike(field, f'%{value}%')
-            elif operator == 'not_like':
-                query = query.not_ilike(field, f'%{value}%')
-            elif operator == 'is_set':
-                query = query.not_eq(field, None)
-            elif operator == 'not_set':
-                query = query.eq(field, None)
-            elif operator == 'gt':
-                query = query.gt(field, float(value))
-            elif operator == 'lt':
-                query = query.lt(field, float(value))
-            
-            filter_index += 1
-
-        data_response = query.execute()
-        print(f"[DEBUG] Supabase raw data_response.data (before pagination): {data_response.data}") # DEBUG
-        rows = data_response.data
-        total_rows = len(rows)
-        
-        # Paginate after getting all data
-        start_idx = offset
-        end_idx = offset + limit
-        rows = rows[start_idx:end_idx]
-        print(f"[DEBUG] Rows after pagination: {rows}") # DEBUG
+            query = read_table(table_name).select("*", count=header_count)
+
+        # Add ordering by input_timestamp descending, rows without one last
+        query = query.order('input_timestamp', desc=descending, nullsfirst=not descending)
+
+        if cursor_mode:
+            # Tie-break on id so the order is total and the keyset is unique
+            query = query.order('id', desc=descending)
+            if cursor_key:
+                cursor_ts, cursor_id, _ = cursor_key
+                query = query.or_(cursor_filter(cursor_ts, cursor_id, descending))
+
+        def narrow(query):
+            """Applies the search and the filters, shared by the page query and the count probe."""
+            if search:
+                search_conditions = []
+                search_columns = ['unique_key', 'id', 'shipment_id', 'production', 'channel_abb']
+                # Filter search_columns to only include those requested if columns is not None
+                if columns:
+                    search_columns = [col for col in search_columns if col in columns]
+                
+                for column in search_columns:
+                    search_conditions.append(f"{column}.ilike.%{search}%")
+                if search_conditions:
+                    query = query.or_(",".join(search_conditions))
+
+            # Handle filters (field, operator, value)
+            return apply_filters(query, filters)
+
+        query = narrow(query)
+
+        if cursor_mode:
+            # Fetch one extra row to know whether another page follows
+            rows = query.limit(limit + 1).execute().data
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if not descending:
+                rows.reverse()
+            has_next = has_more if descending else True
+            has_prev = bool(cursor_key) if descending else has_more
+            print(f"[DEBUG] Fetched {len(rows)} rows by cursor (has_next {has_next}, has_prev {has_prev})") # DEBUG
+
+            return {
+                "headers": columns if columns else (list(rows[0].keys()) if rows else []),
+                "rows": rows,
+                "current_page": 1,
+                "total_pages": 1,
+                "search": search,
+                "pagination_mode": "cursor",
+                "next_cursor": encode_cursor(rows[-1], "next") if rows and has_next else None,
+                "prev_cursor": encode_cursor(rows[0], "prev") if rows and has_prev else None
+            }
+
+        # Fetch only the requested page window, plus one row to know whether another page follows
+        data_response = query.range(offset, offset + limit).execute()
+        rows = data_response.data[:limit]
+        has_more = len(data_response.data) > limit
+        total_exact = count_mode == "exact"
+        total_capped = False
+        if rows and not has_more or (not rows and page == 1):
+            # The last page, so the total is known whatever the count mode
+            total_rows = offset + len(rows)
+            total_exact = True
+        elif count_mode == "capped":
+            # Count at most PAGINATION_COUNT_CAP rows from this page on (from the start when
+            # the page is past the end), fetching only ids; one more row means there are more
+            probe_start = offset if rows else 0
+            probe = narrow(read_table(table_name).select("id")).range(probe_start, probe_start + PAGINATION_COUNT_CAP).execute().data
+            total_capped = len(probe) > PAGINATION_COUNT_CAP
+            total_rows = probe_start + min(len(probe), PAGINATION_COUNT_CAP)
+            total_exact = not total_capped
+        else:
+            total_rows = data_response.count if data_response.count is not None else 0
+            if rows:
+                # An estimate can undershoot the rows already seen, and a next page exists
+                total_rows = max(total_rows, offset + len(rows) + 1)
+        print(f"[DEBUG] Fetched {len(rows)} rows (offset {offset}, total {total_rows}, count mode {count_mode})") # DEBUG
         
         # Headers should reflect the columns actually fetched/selected
         headers = columns if columns else (list(rows[0].keys()) if rows else [])
@@ -101,7 +268,11 @@ def get_paginated_data(table_name, search="", page=1, limit=10, columns: list[st
             "rows": rows,
             "current_page": page,
             "total_pages": total_pages,
-            "search": search
+            "total_rows": total_rows,
+            "total_exact": total_exact,
+            "total_capped": total_capped,
+            "search": search,
+            "pagination_mode": "offset"
         }
     except Exception as e:
         print(f"Error in get_paginated_data: {e}") # Modified error message
@@ -111,6 +282,7 @@ def get_paginated_data(table_name, search="", page=1, limit=10, columns: list[st
             "current_page": 1,
             "total_pages": 1,
             "search": search,
+            "pagination_mode": "offset",
             "error": "Failed to fetch data"
         }
 
@@ -135,8 +307,10 @@ def add_cutting_record(record_data: dict) -> dict:
         if 'date' in record_data and isinstance(record_data['date'], date):
             record_data['date'] = record_data['date'].isoformat()
 
-        response = supabase.table('tab_cutting').insert(record_data).execute()
+        response = get_supabase_client().table('tab_cutting').insert(record_data).execute()
         if response.data:
+            replicate_upsert('tab_cutting', response.data)
+            invalidate_table('tab_cutting')
             return response.data[0]
         else:
             raise Exception(f"Supabase insert failed: {response.status_code} - {response.count}")
@@ -165,8 +339,10 @@ def update_cutting_record(record_id: str, record_data: dict) -> dict:
         if 'date' in data_to_update and isinstance(data_to_update['date'], date):
             data_to_update['date'] = data_to_update['date'].isoformat()
 
-        response = supabase.table('tab_cutting').update(data_to_update).eq('id', record_id).execute()
+        response = get_supabase_client().table('tab_cutting').update(data_to_update).eq('id', record_id).execute()
         if response.data:
+            replicate_upsert('tab_cutting', response.data)
+            invalidate_table('tab_cutting')
             return response.data[0]
         else:
             raise Exception(f"Supabase update failed: {response.status_code} - {response.count}")
@@ -183,9 +359,11 @@ def delete_cutting_records(record_ids: list[str]) -> int:
         The number of records deleted if successful, otherwise raises an exception.
     """
     try:
-        response = supabase.table('tab_cutting').delete().in_('id', record_ids).execute()
+        response = get_supabase_client().table('tab_cutting').delete().in_('id', record_ids).execute()
         # If we have data in the response, it means records were deleted
         if response.data is not None:
+            replicate_delete('tab_cutting', 'id', record_ids)
+            invalidate_table('tab_cutting')
             return len(response.data)
         else:
             raise Exception("Failed to delete records: No response data from Supabase")
@@ -193,301 +371,344 @@ def delete_cutting_records(record_ids: list[str]) -> int:
         print(f"Error deleting cutting records from Supabase: {e}")
         raise
 
+# --- Bulk ingest of cutting/production entries --------------------------
+
+ENTRY_FIELDS = ["date", "po_no", "sku", "product", "line", "design", "size", "pcs_pack", "produced_qty", "rejection"]
+ENTRY_REQUIRED_FIELDS = ["po_no", "sku", "product", "pcs_pack", "produced_qty"]
+ENTRY_NUMERIC_FIELDS = ["pcs_pack", "produced_qty", "rejection"]
+# Largest quantity accepted, the upper bound of a Postgres integer column
+ENTRY_MAX_QUANTITY = 2**31 - 1
+# Rows per insert request
+INGEST_CHUNK_SIZE = 500
+INGEST_MAX_ROWS = int(os.getenv("INGEST_MAX_ROWS", 10000))
+
+def read_entry_rows(records=None, csv_stream=None) -> pd.DataFrame:
+    """
+    Builds a frame of strings from a JSON array of objects or from a CSV stream.
+    Column names are normalized and missing entry columns are added empty.
+    """
+    if csv_stream is not None:
+        frame = pd.read_csv(csv_stream, dtype=str, keep_default_na=False)
+    elif isinstance(records, list) and all(isinstance(record, dict) for record in records):
+        frame = pd.DataFrame.from_records(records).astype(object)
+        frame = frame.where(frame.notna(), "").astype(str)
+    else:
+        raise ValueError("Send a JSON array of objects or a CSV file.")
+
+    if len(frame) > INGEST_MAX_ROWS:
+        raise ValueError(f"At most {INGEST_MAX_ROWS} rows can be sent at once.")
+    frame.columns = [str(column).strip().lower().replace(" ", "_") for column in frame.columns]
+    for column in ENTRY_FIELDS:
+        if column not in frame.columns:
+            frame[column] = ""
+    return frame[ENTRY_FIELDS].apply(lambda values: values.str.strip()).reset_index(drop=True)
+
+def prepare_entry_rows(frame: pd.DataFrame):
+    """
+    Validates entry rows column-wise and computes sets/unpair_pcs for all of them at once.
+
+    Returns:
+        (frame, errors): the coerced frame and a dict mapping a row's index to
+        its error messages.
+    """
+    errors = {}
+
+    def flag(mask, message):
+        for index in frame.index[mask]:
+            errors.setdefault(index, []).append(message)
+
+    frame = frame.copy()
+    for column in ENTRY_REQUIRED_FIELDS:
+        flag(frame[column] == "", f"{column} is required")
+
+    for column in ENTRY_NUMERIC_FIELDS:
+        values = pd.to_numeric(frame[column].where(frame[column] != ""), errors="coerce").astype("float64")
+        # Checked before the int64 cast, which would silently wrap huge values
+        in_range = values.notna() & (values % 1 == 0) & (values >= 0) & (values <= ENTRY_MAX_QUANTITY)
+        flag((frame[column] != "") & ~in_range, f"{column} must be a whole number between 0 and {ENTRY_MAX_QUANTITY}")
+        frame[column] = values.where(in_range).fillna(0).astype("int64")
+
+    # A blank date means today; others must be YYYY-MM-DD, as in the single-entry forms
+    dates = pd.to_datetime(frame["date"].where(frame["date"] != ""), errors="coerce", format="%Y-%m-%d")
+    flag((frame["date"] != "") & dates.isna(), "date must be a valid YYYY-MM-DD date")
+    frame["date"] = dates.dt.strftime("%Y-%m-%d").fillna(date.today().isoformat())
+
+    has_pack = frame["pcs_pack"] > 0
+    pcs_pack = frame["pcs_pack"].where(has_pack, 1)
+    frame["sets"] = (frame["produced_qty"] // pcs_pack).where(has_pack, 0)
+    frame["unpair_pcs"] = (frame["produced_qty"] % pcs_pack).where(has_pack, frame["produced_qty"])
+    return frame, errors
+
+def ingest_entries(table_name: str, frame: pd.DataFrame, first_row: int = 0) -> dict:
+    """
+    Inserts the valid rows of a cutting/production batch in chunked requests.
+
+    Args:
+        table_name: "tab_cutting" or "tab_production".
+        frame: Rows as returned by read_entry_rows().
+        first_row: Number reported for the first row (e.g. 2 for a CSV with a header line).
+    Returns:
+        {"rows", "inserted", "failed", "results"}, with one {"row", "status", "id"/"errors"}
+        result per row, where status is "inserted", "invalid" or "failed".
+    """
+    frame, errors = prepare_entry_rows(frame)
+    valid = frame[~frame.index.isin(list(errors))].copy()
+    valid["id"] = [str(uuid.uuid4()) for _ in range(len(valid))]
+    valid["input_timestamp"] = datetime.now().isoformat()
+    records = valid.replace({"": None}).astype(object).to_dict("records")
+
+    failed = {}
+    for start in range(0, len(records), INGEST_CHUNK_SIZE):
+        chunk = records[start:start + INGEST_CHUNK_SIZE]
+        try:
+            inserted = get_supabase_client().table(table_name).insert(chunk).execute().data
+            replicate_upsert(table_name, inserted)
+        except Exception as e:
+            print(f"Error ingesting rows into {table_name}: {e}; retrying the chunk row by row")
+            # A chunk insert is all-or-nothing, so find the rows that actually fail
+            for index, record in zip(valid.index[start:start + INGEST_CHUNK_SIZE], chunk):
+                try:
+                    inserted = get_supabase_client().table(table_name).insert(record).execute().data
+                    replicate_upsert(table_name, inserted)
+                except Exception as row_error:
+                    failed[index] = str(row_error)
+    if len(failed) < len(valid):
+        invalidate_table(table_name)
+
+    results = []
+    for index in frame.index:
+        row = int(index) + first_row
+        if index in errors:
+            results.append({"row": row, "status": "invalid", "errors": errors[index]})
+        elif index in failed:
+            results.append({"row": row, "status": "failed", "errors": [f"insert failed: {failed[index]}"]})
+        else:
+            results.append({"row": row, "status": "inserted", "id": valid.at[index, "id"]})
+    return {
+        "rows": len(frame),
+        "inserted": len(valid) - len(failed),
+        "failed": len(failed) + len(errors),
+        "results": results
+    }
+
+@cached(ttl=REPORT_CACHE_TTL, depends_on=("tab_production",), fallback=lambda: ([], []))
 def get_monthly_production_data():
     """Fetches and aggregates monthly production data from Supabase using the monthly_production_summary view."""
-    try:
-        # Query the monthly_production_summary view, which already provides aggregated and sorted data
-        response = supabase.table('monthly_production_summary').select('display_month, total_produced_qty').order('month_key', desc=False).execute()
-        data = response.data
+    # Query the monthly_production_summary view, which already provides aggregated and sorted data
+    response = get_supabase_client().table('monthly_production_summary').select('display_month, total_produced_qty').order('month_key', desc=False).execute()
+    data = response.data
 
-        # Extract data directly from the view's results
-        months = [record.get('display_month') for record in data]
-        production_data = [record.get('total_produced_qty') for record in data]
-        
-        return months, production_data
+    # Extract data directly from the view's results
+    months = [record.get('display_month') for record in data]
+    production_data = [record.get('total_produced_qty') for record in data]
+    
+    return months, production_data
 
-    except Exception as e:
-        print(f"Error in get_monthly_production_data: {e}")
-        return [], []
+def summarize_articles(rows):
+    """
+    Ranks products by their share of a month's production.
 
+    Args:
+        rows: Per-product rows shaped like the article_*_summary views
+            (product, total_produced_qty, total_rejection_qty); rows without a
+            product are skipped and non-numeric quantities count as 0.
+
+    Returns:
+        (labels, quantities, rejection_data, production_percentage_data, total_produced_qty),
+        ordered by share descending, then by product name.
+    """
+    frame = pd.DataFrame(rows, columns=['product', 'total_produced_qty', 'total_rejection_qty'])
+    frame = frame[frame['product'].notna() & (frame['product'] != '')]
+    for column in ('total_produced_qty', 'total_rejection_qty'):
+        values = pd.to_numeric(frame[column], errors='coerce').fillna(0)
+        frame[column] = values.astype('int64') if (values % 1 == 0).all() else values
+
+    totals = frame.groupby('product', sort=True)[['total_produced_qty', 'total_rejection_qty']].sum()
+    total_produced_qty = totals['total_produced_qty'].sum().item() if len(totals) else 0
+    if total_produced_qty > 0:
+        percentages = totals['total_produced_qty'] / total_produced_qty * 100
+    else:
+        percentages = pd.Series(0.0, index=totals.index)
+    order = percentages.sort_values(ascending=False, kind='stable').index
+    totals, percentages = totals.loc[order], percentages.loc[order]
+
+    return (
+        totals.index.tolist(),
+        totals['total_produced_qty'].tolist(),
+        totals['total_rejection_qty'].tolist(),
+        [f"{percentage:.2f}%" for percentage in percentages.tolist()],
+        total_produced_qty
+    )
+
+@cached(ttl=REPORT_CACHE_TTL, depends_on=("tab_production",), fallback=lambda: ([], [], [], [], 0))
 def get_article_summary_data(year_month=None):
-    """Fetches and aggregates production data by product for a given month from the article_production_summary view."""
-    try:
-        query = supabase.table('article_production_summary').select('product, total_produced_qty, total_rejection_qty')
-        
-        if year_month:
-            # Filter by the selected month_key from the view
-            query = query.eq('month_key', year_month)
+    """Fetches production quantities by product for a given month, from the analytics backend when available, else the article_production_summary view."""
+    if analytics_available('tab_production'):
+        return summarize_articles(article_summary_rows('tab_production', year_month))
 
-        response = query.execute()
-        data = response.data
-
-        # Aggregate produced_qty and rejection by product
-        product_production = {}
-        product_rejection = {}
-        total_produced_qty_month = 0
-        for record in data:
-            product = record.get('product')
-            produced_qty = record.get('total_produced_qty', 0) # Use total_produced_qty from view
-            rejection_qty = record.get('total_rejection_qty', 0) # Use total_rejection_qty from view
-            
-            if product:
-                # Ensure quantities are numeric, treat None as 0
-                produced_qty = produced_qty if isinstance(produced_qty, (int, float)) else 0
-                rejection_qty = rejection_qty if isinstance(rejection_qty, (int, float)) else 0
-
-                if product not in product_production:
-                    product_production[product] = 0
-                    product_rejection[product] = 0
-                product_production[product] += produced_qty
-                product_rejection[product] += rejection_qty
-                total_produced_qty_month += produced_qty
-        
-        # Get unique sorted products
-        all_products = sorted(list(set(product_production.keys()).union(set(product_rejection.keys()))))
-
-        # Prepare data for sorting
-        product_data_list = []
-        for product in all_products:
-            produced = product_production.get(product, 0)
-            rejected = product_rejection.get(product, 0)
-            
-            percentage = 0
-            if total_produced_qty_month > 0:
-                percentage = (produced / total_produced_qty_month) * 100
-            
-            product_data_list.append({
-                'product': product,
-                'produced_qty': produced,
-                'rejection_qty': rejected,
-                'percentage': percentage # Store as float for sorting
-            })
-
-        # Sort the data by percentage in descending order
-        product_data_list.sort(key=lambda x: x['percentage'], reverse=True)
-
-        labels = [item['product'] for item in product_data_list]
-        quantities = [item['produced_qty'] for item in product_data_list]
-        rejection_data = [item['rejection_qty'] for item in product_data_list]
-        production_percentage_data = [f"{item['percentage']:.2f}%" for item in product_data_list]
-
-        return labels, quantities, rejection_data, production_percentage_data, total_produced_qty_month
+    query = get_supabase_client().table('article_production_summary').select('product, total_produced_qty, total_rejection_qty')
+    
+    if year_month:
+        # Filter by the selected month_key from the view
+        query = query.eq('month_key', year_month)
 
-    except Exception as e:
-        print(f"Error in get_article_summary_data: {e}")
-        return [], [], [], [], 0
+    response = query.execute()
+    return summarize_articles(response.data)
 
+@cached(ttl=REPORT_CACHE_TTL, depends_on=("tab_production",), fallback=list)
 def get_available_production_months():
     """Fetches all unique YYYY-MM months from the tab_production table."""
-    try:
-        # Fetch months from the new article_production_summary view
-        response = supabase.table('article_production_summary').select('month_key').execute()
-        data = response.data
-
-        print(f"Raw data from article_production_summary for months: {data}") # Added for debugging
-
-        months = set()
-        for record in data:
-            month_key = record.get('month_key')
-            if month_key:
-                months.add(month_key)
-        
-        # Sort months in descending order
-        sorted_months = sorted(list(months), reverse=True)
-        print(f"Processed available months: {sorted_months}") # Added for debugging
-        return sorted_months
-
-    except Exception as e:
-        print(f"Error in get_available_production_months: {e}")
-        return []
-
+    if analytics_available('tab_production'):
+        return article_months('tab_production')
+
+    # Fetch months from the new article_production_summary view
+    response = get_supabase_client().table('article_production_summary').select('month_key').execute()
+    data = response.data
+
+    print(f"Raw data from article_production_summary for months: {data}") # Added for debugging
+
+    months = set()
+    for record in data:
+        month_key = record.get('month_key')
+        if month_key:
+            months.add(month_key)
+    
+    # Sort months in descending order
+    sorted_months = sorted(list(months), reverse=True)
+    print(f"Processed available months: {sorted_months}") # Added for debugging
+    return sorted_months
+
+@cached(ttl=REPORT_CACHE_TTL, depends_on=("tab_cutting",), fallback=lambda: ([], []))
 def get_monthly_cutting_data():
     """Fetches and aggregates monthly produced_qty from Supabase using the monthly_cutting_summary view."""
-    try:
-        # Query the monthly_cutting_summary view, which already provides aggregated and sorted data
-        response = supabase.table('monthly_cutting_summary').select('display_month, total_produced_qty').order('month_key', desc=False).execute()
-        data = response.data
+    # Query the monthly_cutting_summary view, which already provides aggregated and sorted data
+    response = get_supabase_client().table('monthly_cutting_summary').select('display_month, total_produced_qty').order('month_key', desc=False).execute()
+    data = response.data
 
-        # Extract data directly from the view's results
-        months = [record.get('display_month') for record in data]
-        produced_quantities = [record.get('total_produced_qty') for record in data]
-        
-        return months, produced_quantities
-
-    except Exception as e:
-        print(f"Error in get_monthly_cutting_data: {e}")
-        return [], []
+    # Extract data directly from the view's results
+    months = [record.get('display_month') for record in data]
+    produced_quantities = [record.get('total_produced_qty') for record in data]
+    
+    return months, produced_quantities
 
+@cached(ttl=REPORT_CACHE_TTL, depends_on=("tab_cutting",), fallback=list)
 def get_available_cutting_months():
     """Fetches all unique YYYY-MM months from the tab_cutting table."""
-    try:
-        # Fetch months from the new article_cutting_summary view
-        response = supabase.table('article_cutting_summary').select('month_key').execute()
-        data = response.data
-
-        print(f"Raw data from article_cutting_summary for available months: {data}") # Added for debugging
-
-        months = set()
-        for record in data:
-            month_key = record.get('month_key')
-            if month_key:
-                months.add(month_key)
-        
-        sorted_months = sorted(list(months), reverse=True)
-        print(f"Processed available cutting months: {sorted_months}") # Added for debugging
-        return sorted_months
-
-    except Exception as e:
-        print(f"Error in get_available_cutting_months: {e}")
-        return []
-
+    if analytics_available('tab_cutting'):
+        return article_months('tab_cutting')
+
+    # Fetch months from the new article_cutting_summary view
+    response = get_supabase_client().table('article_cutting_summary').select('month_key').execute()
+    data = response.data
+
+    print(f"Raw data from article_cutting_summary for available months: {data}") # Added for debugging
+
+    months = set()
+    for record in data:
+        month_key = record.get('month_key')
+        if month_key:
+            months.add(month_key)
+    
+    sorted_months = sorted(list(months), reverse=True)
+    print(f"Processed available cutting months: {sorted_months}") # Added for debugging
+    return sorted_months
+
+@cached(ttl=REPORT_CACHE_TTL, depends_on=("tab_cutting",), fallback=lambda: ([], [], [], [], 0, 0))
 def get_article_cutting_summary_data(year_month=None):
-    """Fetches and aggregates cutting data by product for a given month, including produced_qty and rejection from article_cutting_summary view."""
-    try:
-        query = supabase.table('article_cutting_summary').select('product, total_produced_qty, total_rejection_qty')
+    """Fetches cutting quantities and rejections by product for a given month, from the analytics backend when available, else the article_cutting_summary view."""
+    if analytics_available('tab_cutting'):
+        rows = article_summary_rows('tab_cutting', year_month)
+    else:
+        query = get_supabase_client().table('article_cutting_summary').select('product, total_produced_qty, total_rejection_qty')
         
         if year_month:
             query = query.eq('month_key', year_month)
 
-        response = query.execute()
-        data = response.data
+        rows = query.execute().data
 
-        product_production = {}
-        product_rejection = {}
-        total_produced_qty_month = 0
-        
-        for record in data:
-            product = record.get('product')
-            produced_qty = record.get('total_produced_qty', 0)
-            rejection_qty = record.get('total_rejection_qty', 0) # Use total_rejection_qty from view
-            
-            if product:
-                produced_qty = produced_qty if isinstance(produced_qty, (int, float)) else 0
-                rejection_qty = rejection_qty if isinstance(rejection_qty, (int, float)) else 0
-
-                if product not in product_production:
-                    product_production[product] = 0
-                    product_rejection[product] = 0
-                product_production[product] += produced_qty
-                product_rejection[product] += rejection_qty
-                total_produced_qty_month += produced_qty
-        
-        all_products = sorted(list(set(product_production.keys()).union(set(product_rejection.keys()))))
-
-        product_data_list = []
-        for product in all_products:
-            produced = product_production.get(product, 0)
-            rejected = product_rejection.get(product, 0)
-            
-            percentage = 0
-            if total_produced_qty_month > 0:
-                percentage = (produced / total_produced_qty_month) * 100
-            
-            product_data_list.append({
-                'product': product,
-                'produced_qty': produced,
-                'rejection_qty': rejected,
-                'percentage': percentage 
-            })
-
-        product_data_list.sort(key=lambda x: x['percentage'], reverse=True)
-
-        labels = [item['product'] for item in product_data_list]
-        quantities = [item['produced_qty'] for item in product_data_list]
-        rejection_data = [item['rejection_qty'] for item in product_data_list]
-        production_percentage_data = [f"{item['percentage']:.2f}%" for item in product_data_list]
-
-        # Calculate total rejection quantity for the month
-        total_rejection_qty_month = sum(rejection_data)
-
-        return labels, quantities, rejection_data, production_percentage_data, total_produced_qty_month, total_rejection_qty_month
+    labels, quantities, rejection_data, production_percentage_data, total_produced_qty_month = summarize_articles(rows)
 
-    except Exception as e:
-        print(f"Error in get_article_cutting_summary_data: {e}")
-        return [], [], [], [], 0
+    # Calculate total rejection quantity for the month
+    total_rejection_qty_month = sum(rejection_data)
 
+    return labels, quantities, rejection_data, production_percentage_data, total_produced_qty_month, total_rejection_qty_month
+
+def empty_summary_metrics():
+    """Zeroed summary metrics, shown when the matrix view has no row or could not be read."""
+    return {
+        "today_total": 0,
+        "yesterday_total": 0,
+        "this_week_total": 0,
+        "last_week_total": 0,
+        "this_month_total": 0,
+        "last_month_total": 0
+    }
+
+@cached(ttl=SUMMARY_METRICS_TTL, depends_on=("tab_cutting",), fallback=empty_summary_metrics)
 def get_cutting_summary_metrics():
     """Calculates and returns summary metrics (today, yesterday, last week, last month) for produced quantity from tab_cutting."""
     # Fetch data directly from the cutting_matrix view
-    try:
-        response = supabase.table('cutting_matrix').select('today_qty, yesterday_qty, this_week_qty, last_week_qty, this_month_qty, last_month_qty').execute()
-        
-        if response.data:
-            # The view returns a single row with the aggregated data
-            metrics = response.data[0]
-            return {
-                "today_total": metrics.get('today_qty', 0),
-                "yesterday_total": metrics.get('yesterday_qty', 0),
-                "this_week_total": metrics.get('this_week_qty', 0),
-                "last_week_total": metrics.get('last_week_qty', 0),
-                "this_month_total": metrics.get('this_month_qty', 0),
-                "last_month_total": metrics.get('last_month_qty', 0)
-            }
-        else:
-            # If no data from view, return zeros
-            return {
-                "today_total": 0,
-                "yesterday_total": 0,
-                "this_week_total": 0,
-                "last_week_total": 0,
-                "this_month_total": 0,
-                "last_month_total": 0
-            }
-
-    except Exception as e:
-        print(f"Error in get_cutting_summary_metrics when querying view: {e}")
+    response = get_supabase_client().table('cutting_matrix').select('today_qty, yesterday_qty, this_week_qty, last_week_qty, this_month_qty, last_month_qty').execute()
+    
+    if response.data:
+        # The view returns a single row with the aggregated data
+        metrics = response.data[0]
         return {
-            "today_total": 0,
-            "yesterday_total": 0,
-            "this_week_total": 0,
-            "last_week_total": 0,
-            "this_month_total": 0,
-            "last_month_total": 0
+            "today_total": metrics.get('today_qty', 0),
+            "yesterday_total": metrics.get('yesterday_qty', 0),
+            "this_week_total": metrics.get('this_week_qty', 0),
+            "last_week_total": metrics.get('last_week_qty', 0),
+            "this_month_total": metrics.get('this_month_qty', 0),
+            "last_month_total": metrics.get('last_month_qty', 0)
         }
+    else:
+        # If no data from view, return zeros
+        return empty_summary_metrics()
 
+@cached(ttl=SUMMARY_METRICS_TTL, depends_on=("tab_production",), fallback=empty_summary_metrics)
 def get_production_summary_metrics():
     """Calculates and returns summary metrics (today, yesterday, this week, last week, this month, last month) for produced quantity from production_matrix view."""
-    try:
-        response = supabase.table('production_matrix').select('today_qty, yesterday_qty, this_week_qty, last_week_qty, this_month_qty, last_month_qty').execute()
-        
-        if response.data:
-            metrics = response.data[0]
-            return {
-                "today_total": metrics.get('today_qty', 0),
-                "yesterday_total": metrics.get('yesterday_qty', 0),
-                "this_week_total": metrics.get('this_week_qty', 0),
-                "last_week_total": metrics.get('last_week_qty', 0),
-                "this_month_total": metrics.get('this_month_qty', 0),
-                "last_month_total": metrics.get('last_month_qty', 0)
-            }
-        else:
-            return {
-                "today_total": 0,
-                "yesterday_total": 0,
-                "this_week_total": 0,
-                "last_week_total": 0,
-                "this_month_total": 0,
-                "last_month_total": 0
-            }
-
-    except Exception as e:
-        print(f"Error in get_production_summary_metrics when querying view: {e}")
+    response = get_supabase_client().table('production_matrix').select('today_qty, yesterday_qty, this_week_qty, last_week_qty, this_month_qty, last_month_qty').execute()
+    
+    if response.data:
+        metrics = response.data[0]
         return {
-            "today_total": 0,
-            "yesterday_total": 0,
-            "this_week_total": 0,
-            "last_week_total": 0,
-            "this_month_total": 0,
-            "last_month_total": 0
+            "today_total": metrics.get('today_qty', 0),
+            "yesterday_total": metrics.get('yesterday_qty', 0),
+            "this_week_total": metrics.get('this_week_qty', 0),
+            "last_week_total": metrics.get('last_week_qty', 0),
+            "this_month_total": metrics.get('this_month_qty', 0),
+            "last_month_total": metrics.get('last_month_qty', 0)
         }
+    else:
+        return empty_summary_metrics()
+
+# Columns of the pending_order view, in display order
+PENDING_ORDER_COLUMNS = [
+    'shipment_id', 'date', 'ETD', 'production', 'channel_abb',
+    'mode', 'po_qty', 'dispatched_qty', 'pending_qty', 'status'
+]
+
+def get_pending_orders() -> dict:
+    """
+    Reads the pending_order view, newest first, for both the HTML table and the JSON route.
+    Returns {"headers", "data", "recordsTotal", "recordsFiltered"}; errors propagate to the caller.
+    """
+    rows = read_table('pending_order').select(','.join(PENDING_ORDER_COLUMNS)).order('date', desc=True).execute().data or []
+    return {
+        "headers": PENDING_ORDER_COLUMNS,
+        "data": rows,
+        "recordsTotal": len(rows),
+        "recordsFiltered": len(rows)
+    }
 
 # Helper function to get limited columns for a table (excluding potentially large text fields)
 def get_limited_columns(table_name, columns: list[str] = None):
     if columns:
         select_query_string = ",".join(columns)
         print(f"[DEBUG] Supabase select query string: {select_query_string}") # DEBUG
-        query = supabase.table(table_name).select(select_query_string)
+        query = read_table(table_name).select(select_query_string)
     else:
         print("[DEBUG] Supabase select query string: *") # DEBUG
-        query = supabase.table(table_name).select("*")
+        query = read_table(table_name).select("*")
     return query 
\ No newline at end of file
@@ -0,0 +1,383 @@
+import logging
+import os
+import uuid
+from datetime import datetime
+import pandas as pd
+from postgrest.exceptions import APIError
+from app.utils.supabase_client import get_supabase_client
+from app.utils.cache import cached, invalidate_table
+from app.utils.read_replica import replicate_upsert, replicate_delete
+
+logger = logging.getLogger(__name__)
+
+# 'rpc' saves orders through the save_sales_order Postgres function (see
+# sql/save_sales_order.sql) in one transactional call; 'local' runs the same
+# steps as separate requests, for databases without the function
+SALES_ORDER_WRITE_MODE = os.getenv('SALES_ORDER_WRITE_MODE', 'rpc')
+
+# Seconds a fetched order (header with items) is reused; writes drop it sooner
+SALES_ORDER_DETAIL_TTL = int(os.getenv('SALES_ORDER_DETAIL_TTL', 30))
+
+# PostgREST error codes
+UNIQUE_VIOLATION = '23505'
+FUNCTION_NOT_FOUND = 'PGRST202'
+RELATIONSHIP_NOT_FOUND = 'PGRST200'
+
+
+class SalesOrderExists(Exception):
+    """Raised when creating an order whose PO number is already taken."""
+
+
+# Item columns an edit may change; items are matched on (sr_no, sku)
+ITEM_KEY_FIELDS = ('sr_no', 'sku')
+ITEM_VALUE_FIELDS = ('product', 'category', 'line', 'design', 'size', 'pack_of', 'sets', 'pieces')
+
+
+def _order_total(items: list[dict]) -> int:
+    return sum(int(item.get('pieces') or 0) for item in items)
+
+
+def _item_key(item: dict) -> tuple:
+    return tuple(_normalized(item.get(field)) for field in ITEM_KEY_FIELDS)
+
+
+def _normalized(value) -> str:
+    # Form values are strings while stored values are typed; None and '' are the same
+    return '' if value is None else str(value)
+
+
+def diff_order_items(existing: list[dict], submitted: list[dict]):
+    """
+    Compares an order's stored items with the submitted ones, matching them on (sr_no, sku).
+
+    Returns:
+        (inserts, updates, delete_ids): submitted items with no stored match;
+        stored items, with the submitted values applied, whose values changed;
+        and the ids of stored items with no submitted match.
+    """
+    stored = {_item_key(item): item for item in existing}
+    inserts, updates, matched = [], [], set()
+
+    for item in submitted:
+        key = _item_key(item)
+        current = stored.get(key)
+        if current is None:
+            inserts.append(item)
+            continue
+        matched.add(key)
+        changes = {
+            field: item.get(field) for field in ITEM_VALUE_FIELDS
+            if _normalized(item.get(field)) != _normalized(current.get(field))
+        }
+        if changes:
+            updates.append({**current, **changes})
+
+    delete_ids = [item['id'] for key, item in stored.items() if key not in matched]
+    return inserts, updates, delete_ids
+
+
+def _save_sales_order_rpc(order: dict, items: list[dict], create: bool) -> dict:
+    try:
+        response = get_supabase_client().rpc(
+            'save_sales_order',
+            {'p_order': order, 'p_items': items, 'p_create': create}
+        ).execute()
+    except APIError as e:
+        if e.code == UNIQUE_VIOLATION:
+            raise SalesOrderExists(f"PO number {order['po_no']} already exists") from e
+        raise
+    # The function returns a single row
+    return response.data[0]
+
+
+def save_sales_order_local(order: dict, items: list[dict], create: bool) -> dict:
+    """
+    Stand-in for the save_sales_order function that issues the same writes as
+    individual requests. It is not atomic; use it where the function is not
+    installed, e.g. local development and tests.
+    """
+    supabase = get_supabase_client()
+    po_no = order['po_no']
+
+    if create:
+        existing = supabase.table('tab_sales_order').select('po_no').eq('po_no', po_no).execute()
+        if existing.data:
+            raise SalesOrderExists(f"PO number {po_no} already exists")
+        supabase.table('tab_sales_order').insert(order).execute()
+        stored_items = []
+    else:
+        supabase.table('tab_sales_order').update(order).eq('po_no', po_no).execute()
+        stored_items = supabase.table('tab_sales_order_items').select('*').eq('po_no', po_no).execute().data
+
+    # One batched request per kind of change
+    inserts, updates, delete_ids = diff_order_items(stored_items, items)
+    if delete_ids:
+        supabase.table('tab_sales_order_items').delete().in_('id', delete_ids).execute()
+    if updates:
+        supabase.table('tab_sales_order_items').upsert(updates).execute()
+    if inserts:
+        supabase.table('tab_sales_order_items').insert(inserts).execute()
+
+    changed = {item['id']: item for item in updates + inserts}
+    saved_items = [changed.pop(item['id'], item) for item in stored_items if item['id'] not in delete_ids]
+    saved_items = sorted(saved_items + list(changed.values()), key=lambda item: int(item.get('sr_no') or 0))
+
+    saved_order = supabase.table('tab_sales_order').update({'total_qty': _order_total(items)}).eq('po_no', po_no).execute().data
+    return {'order': saved_order[0] if saved_order else None, 'items': saved_items}
+
+
+@cached(ttl=SALES_ORDER_DETAIL_TTL)
+def get_sales_order(po_no: str):
+    """
+    Fetches an order header with its items, ordered by sr_no, in one embedded select.
+
+    Returns:
+        (order, items), or None if the PO does not exist.
+    """
+    supabase = get_supabase_client()
+    try:
+        rows = supabase.table('tab_sales_order') \
+            .select('*, tab_sales_order_items(*)') \
+            .eq('po_no', po_no) \
+            .order('sr_no', foreign_table='tab_sales_order_items') \
+            .limit(1) \
+            .execute().data
+    except APIError as e:
+        if e.code != RELATIONSHIP_NOT_FOUND:
+            raise
+        # No foreign key from the items to the orders to embed through
+        logger.warning("tab_sales_order_items has no foreign key to tab_sales_order; fetching items separately.")
+        rows = supabase.table('tab_sales_order').select('*').eq('po_no', po_no).limit(1).execute().data
+        if rows:
+            rows[0]['tab_sales_order_items'] = supabase.table('tab_sales_order_items') \
+                .select('*').eq('po_no', po_no).order('sr_no').execute().data
+
+    if not rows:
+        return None
+    order = rows[0]
+    items = order.pop('tab_sales_order_items', None) or []
+    return order, items
+
+
+def forget_sales_orders(po_numbers):
+    """Drops cached order details after the orders were written or deleted."""
+    for po_no in po_numbers:
+        get_sales_order.invalidate_call(po_no)
+    invalidate_table('tab_sales_order')
+
+
+def save_sales_order(order: dict, items: list[dict], create: bool = False) -> dict:
+    """
+    Saves a sales order header with its items and recomputes total_qty.
+
+    Args:
+        order: Header columns, including po_no.
+        items: The order's complete list of item rows. Only the differences
+            from the stored items, matched on (sr_no, sku), are written.
+        create: True for a new order, which fails if the PO number exists.
+
+    Returns:
+        {"order": saved header row, "items": saved item rows}.
+
+    Raises:
+        SalesOrderExists: When creating an order whose PO number is taken.
+    """
+    if SALES_ORDER_WRITE_MODE == 'rpc':
+        try:
+            result = _save_sales_order_rpc(order, items, create)
+        except APIError as e:
+            if e.code != FUNCTION_NOT_FOUND:
+                raise
+            logger.warning("save_sales_order function not found; saving with separate requests. Apply sql/save_sales_order.sql.")
+            result = save_sales_order_local(order, items, create)
+    else:
+        result = save_sales_order_local(order, items, create)
+
+    # Keep the read replica and cached facets in step with the write
+    if result.get('order'):
+        replicate_upsert('tab_sales_order', [result['order']])
+    replicate_delete('tab_sales_order_items', 'po_no', [order['po_no']])
+    replicate_upsert('tab_sales_order_items', result.get('items') or [])
+    forget_sales_orders([order['po_no']])
+    return result
+
+
+# --- Bulk import ---------------------------------------------------------
+
+# One row per item line; header columns repeat on every line of a PO
+IMPORT_HEADER_FIELDS = ['po_no', 'po_date', 'delivery_date', 'branch', 'warehouse', 'status', 'repository', 'country', 'mode']
+IMPORT_ITEM_FIELDS = ['sku', 'product', 'category', 'line', 'design', 'size', 'pack_of', 'sets', 'pieces']
+IMPORT_NUMERIC_FIELDS = ['pack_of', 'sets', 'pieces']
+IMPORT_DATE_FIELDS = ['po_date', 'delivery_date']
+# Largest quantity accepted, the upper bound of a Postgres integer column
+IMPORT_MAX_QUANTITY = 2**31 - 1
+# Rows per insert request, and PO numbers per duplicate lookup
+IMPORT_INSERT_CHUNK_SIZE = 500
+IMPORT_LOOKUP_CHUNK_SIZE = 200
+
+
+def read_order_file(stream, filename: str) -> pd.DataFrame:
+    """Reads an uploaded CSV, XLSX or XLS file into a frame of strings with normalized column names."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in ('.csv', '.xlsx', '.xls'):
+        raise ValueError("Upload a .csv, .xlsx or .xls file.")
+    try:
+        if extension == '.csv':
+            frame = pd.read_csv(stream, dtype=str, keep_default_na=False)
+        else:
+            frame = pd.read_excel(stream, dtype=str, engine='openpyxl' if extension == '.xlsx' else 'xlrd').fillna('')
+    except Exception as e:
+        # Corrupt or mislabelled uploads fail in many ways (BadZipFile, parser and decode errors)
+        raise ValueError(f"Could not read {filename}: {str(e) or type(e).__name__}") from e
+
+    frame.columns = [str(column).strip().lower().replace(' ', '_') for column in frame.columns]
+    if 'po_no' not in frame.columns:
+        raise ValueError("The file has no po_no column.")
+    for column in IMPORT_HEADER_FIELDS + IMPORT_ITEM_FIELDS:
+        if column not in frame.columns:
+            frame[column] = ''
+    frame = frame[IMPORT_HEADER_FIELDS + IMPORT_ITEM_FIELDS].apply(lambda values: values.str.strip())
+    # Drop lines that are entirely blank, e.g. trailing spreadsheet rows
+    return frame[(frame != '').any(axis=1)]
+
+
+def _existing_po_numbers(po_numbers: list[str]) -> set:
+    supabase = get_supabase_client()
+    existing = set()
+    for start in range(0, len(po_numbers), IMPORT_LOOKUP_CHUNK_SIZE):
+        chunk = po_numbers[start:start + IMPORT_LOOKUP_CHUNK_SIZE]
+        rows = supabase.table('tab_sales_order').select('po_no').in_('po_no', chunk).execute().data
+        existing.update(row['po_no'] for row in rows)
+    return existing
+
+
+def validate_order_rows(frame: pd.DataFrame):
+    """
+    Validates imported lines column-wise.
+
+    Returns:
+        (frame, errors): the frame with numeric and date columns coerced, and a
+        dict mapping a row's index to its error messages. Every line of a PO
+        that has an invalid line is rejected.
+    """
+    errors = {}
+
+    def flag(mask, message):
+        for index in frame.index[mask]:
+            errors.setdefault(index, []).append(message)
+
+    frame = frame.copy()
+    flag(frame['po_no'] == '', "po_no is required")
+
+    for column in IMPORT_NUMERIC_FIELDS:
+        values = pd.to_numeric(frame[column].where(frame[column] != ''), errors='coerce').astype('float64')
+        # Checked before the Int64 cast, which fails on huge values
+        in_range = values.notna() & (values % 1 == 0) & (values >= 0) & (values <= IMPORT_MAX_QUANTITY)
+        flag((frame[column] != '') & ~in_range, f"{column} must be a whole number between 0 and {IMPORT_MAX_QUANTITY}")
+        frame[column] = values.where(in_range).astype('Int64')
+
+    for column in IMPORT_DATE_FIELDS:
+        # YYYY-MM-DD only, as in the order forms, so day and month are never
+        # swapped; spreadsheet date cells read as text carry a midnight time
+        text = frame[column].str.replace(r' 00:00:00$', '', regex=True)
+        values = pd.to_datetime(text.where(text != ''), errors='coerce', format='%Y-%m-%d')
+        flag((frame[column] != '') & values.isna(), f"{column} must be a valid YYYY-MM-DD date")
+        frame[column] = values.dt.strftime('%Y-%m-%d')
+
+    # A PO's header columns must agree on every line
+    named = frame[frame['po_no'] != '']
+    header_columns = [column for column in IMPORT_HEADER_FIELDS if column != 'po_no']
+    conflicting = named.groupby('po_no')[header_columns].nunique(dropna=False).gt(1).any(axis=1)
+    flag(frame['po_no'].isin(conflicting[conflicting].index), "order header values differ between lines of this PO")
+
+    existing = _existing_po_numbers(named['po_no'].unique().tolist())
+    flag(frame['po_no'].isin(existing), "PO number already exists")
+
+    rejected_pos = set(frame.loc[list(errors), 'po_no']) - {''}
+    flag(frame['po_no'].isin(rejected_pos) & ~frame.index.isin(list(errors)), "not imported: another line of this PO has errors")
+    return frame, errors
+
+
+def _remove_partial_orders(po_numbers: list[str]) -> set:
+    """
+    Deletes whatever was already inserted for orders whose import failed part-way,
+    items first, so a corrected file can be imported again.
+
+    Returns the PO numbers that could not be cleaned up.
+    """
+    supabase = get_supabase_client()
+    leftover = set()
+    for start in range(0, len(po_numbers), IMPORT_LOOKUP_CHUNK_SIZE):
+        chunk = po_numbers[start:start + IMPORT_LOOKUP_CHUNK_SIZE]
+        try:
+            for table_name in ('tab_sales_order_items', 'tab_sales_order'):
+                supabase.table(table_name).delete().in_('po_no', chunk).execute()
+                replicate_delete(table_name, 'po_no', chunk)
+        except Exception as e:
+            logger.error(f"Error removing partially imported sales orders: {str(e)}", exc_info=True)
+            leftover.update(chunk)
+    return leftover
+
+
+def _records(frame: pd.DataFrame) -> list[dict]:
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def import_sales_orders(frame: pd.DataFrame) -> dict:
+    """
+    Imports the valid orders of an uploaded file with batched inserts.
+
+    Returns a report: {"rows", "orders_imported", "items_imported", "errors"},
+    where errors lists {"row", "po_no", "errors"} per rejected line, with row
+    numbers as seen in the file (the header is row 1).
+    """
+    frame = frame.reset_index(drop=True)
+    frame, errors = validate_order_rows(frame)
+    valid = frame[~frame.index.isin(list(errors))].copy()
+
+    created_at = datetime.utcnow().isoformat()
+    valid['sr_no'] = valid.groupby('po_no', sort=False).cumcount() + 1
+    valid['id'] = [str(uuid.uuid4()) for _ in range(len(valid))]
+    valid['created_at'] = created_at
+
+    orders = valid.groupby('po_no', sort=False)[IMPORT_HEADER_FIELDS[1:]].first().reset_index()
+    totals = valid.groupby('po_no', sort=False)['pieces'].sum(min_count=1).fillna(0).astype('int64')
+    orders['total_qty'] = orders['po_no'].map(totals)
+    orders['created_at'] = created_at
+    order_records = _records(orders.replace({'': None}))
+    item_records = _records(valid[['id', 'sr_no', 'po_no'] + IMPORT_ITEM_FIELDS + ['created_at']].replace({'': None}))
+
+    supabase = get_supabase_client()
+    failed_pos = {}
+    for table_name, records in (('tab_sales_order', order_records), ('tab_sales_order_items', item_records)):
+        for start in range(0, len(records), IMPORT_INSERT_CHUNK_SIZE):
+            chunk = [record for record in records[start:start + IMPORT_INSERT_CHUNK_SIZE] if record['po_no'] not in failed_pos]
+            if not chunk:
+                continue
+            try:
+                inserted = supabase.table(table_name).insert(chunk).execute().data
+                replicate_upsert(table_name, inserted)
+            except Exception as e:
+                logger.error(f"Error importing sales orders into {table_name}: {str(e)}", exc_info=True)
+                for record in chunk:
+                    failed_pos.setdefault(record['po_no'], str(e))
+    # Headers are inserted before items, so a failed PO may have a header and some items saved
+    leftover = _remove_partial_orders(list(failed_pos)) if failed_pos else set()
+    forget_sales_orders(orders['po_no'].tolist())
+
+    for index, po_no in valid['po_no'].items():
+        if po_no in failed_pos:
+            errors[index] = [f"insert failed: {failed_pos[po_no]}"]
+            if po_no in leftover:
+                errors[index].append("partially saved and could not be removed; delete this PO before importing it again")
+
+    imported = valid[~valid['po_no'].isin(list(failed_pos))]
+    return {
+        "rows": len(frame),
+        "orders_imported": int(imported['po_no'].nunique()),
+        "items_imported": len(imported),
+        "errors": [
+            {"row": int(index) + 2, "po_no": frame.at[index, 'po_no'], "errors": messages}
+            for index, messages in sorted(errors.items())
+        ]
+    }
@@ -1,11 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
-from app.models.data_models import get_paginated_data, add_cutting_record, update_cutting_record, delete_cutting_records, supabase, get_cutting_summary_metrics
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, Response, send_file
+from app.models.data_models import get_paginated_data, read_table, clamp_page_limit, parse_filter_args, apply_filters, add_cutting_record, update_cutting_record, delete_cutting_records, read_entry_rows, ingest_entries, get_pending_orders, get_cutting_summary_metrics
 from datetime import datetime, date
 import logging
 import uuid
 import decimal
 import csv
 import io
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.cache import invalidate_table
+from app.utils.read_replica import replicate_upsert, replicate_delete
+from app.utils.supabase_client import get_supabase_client
+from app.utils.xlsx_export import xlsx_response
+from app.utils.export_jobs import submit_export_job, get_export_job
+from app.utils.idempotency import idempotent
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +27,13 @@ TABLES = {
     "tab_production": "tab_production"
 }
 
+# Export settings per table key: (table name, download filename, listing endpoint)
+EXPORTS = {
+    "cutting": (TABLES["cutting"], "Daily Cutting", 'data.cutting'),
+    "shipment": (TABLES["shipment"], "production_data", 'data.production_data'),
+    "tab_production": (TABLES["tab_production"], "Production Data", 'data.tab_production')
+}
+
 # Define default limited columns for each table
 DEFAULT_LIMITED_COLUMNS = {
     "tab_cutting": ["id", "date", "po_no", "sku", "product", "produced_qty"],
@@ -29,6 +46,39 @@ def get_limited_columns(table_key):
     print(f"Getting limited columns for {table_key}: {columns}")  # Debug log
     return columns
 
+# Rows fetched per round-trip when streaming a table export
+EXPORT_CHUNK_SIZE = 1000
+
+def apply_search(query, table_name: str, search_term: str, columns: list[str] = None):
+    """
+    Adds the OR-of-ilike search used by get_all_data to a Supabase query.
+    
+    If specific columns are provided by the caller, those are searched.
+    Otherwise, a broader set of common text-based columns is used.
+    """
+    if not search_term:
+        return query
+
+    if columns:
+        # Filter out explicitly known non-string/non-searchable columns from the provided list
+        # This list should be expanded if there are other numeric/boolean/date fields in your tables
+        non_searchable_types = ['id', 'date', 'input_timestamp', 'created_at', 'produced_qty', 'rejection', 'pcs_pack', 'sets', 'unpair_pcs', 'po_qty', 'dispatched_qty', 'pending_qty', 'order_qty']
+        searchable_cols = [col for col in columns if col not in non_searchable_types]
+    else:
+        # Fallback to a broader set of common text-based columns for generic search if no specific columns were provided
+        searchable_cols = ['po_no', 'sku', 'product', 'design', 'line', 'shipment_id', 'channel_abb', 'customer_name', 'status', 'production', 'mode']
+
+    conditions = []
+    for col in searchable_cols:
+        conditions.append(f"{col}.ilike.%{search_term}%")
+    
+    if conditions:
+        print(f"[DEBUG] Constructing Supabase OR query for table '{table_name}' with conditions: {','.join(conditions)}")
+        query = query.or_(",".join(conditions))
+    else:
+        print(f"[DEBUG] No valid searchable columns found for table '{table_name}' with query '{search_term}' from provided columns: {columns}")
+    return query
+
 def get_all_data(table_name: str, search_term: str = "", columns: list[str] = None):
     """
     Fetches all data for a given table, optionally filtered by a search term and limited to specific columns.
@@ -49,35 +99,8 @@ def get_all_data(table_name: str, search_term: str = "", columns: list[str] = No
     print(f"[DEBUG] get_all_data - Table: {table_name}, Search Term: '{search_term}', Columns: {columns}")
 
     try:
-        query = supabase.table(table_name).select(select_columns)
-        
-        if search_term:
-            # If specific columns are provided by the caller, use those for the search.
-            # Otherwise, fall back to a broader set of common text-based columns.
-            if columns:
-                # Filter out explicitly known non-string/non-searchable columns from the provided list
-                # This list should be expanded if there are other numeric/boolean/date fields in your tables
-                non_searchable_types = ['id', 'date', 'input_timestamp', 'created_at', 'produced_qty', 'rejection', 'pcs_pack', 'sets', 'unpair_pcs', 'po_qty', 'dispatched_qty', 'pending_qty', 'order_qty']
-                searchable_cols = [col for col in columns if col not in non_searchable_types]
-            else:
-                # Fallback to a broader set of common text-based columns for generic search if no specific columns were provided
-                searchable_cols = ['po_no', 'sku', 'product', 'design', 'line', 'shipment_id', 'channel_abb', 'customer_name', 'status', 'production', 'mode']
-
-            conditions = []
-            for col in searchable_cols:
-                conditions.append(f"{col}.ilike.%{search_term}%")
-            
-            if conditions:
-                print(f"[DEBUG] Constructing Supabase OR query for table '{table_name}' with conditions: {','.join(conditions)}")
-                query = query.or_(",".join(conditions))
-            else:
-                print(f"[DEBUG] No valid searchable columns found for table '{table_name}' with query '{search_term}' from provided columns: {columns}")
-
-        # No dynamic WHERE clause based on `information_schema.columns` needed here for Supabase
-
-        # Handle individual column filters (already implemented in get_paginated_data)
-        # This part will be handled by get_paginated_data or need to be adapted if this was a standalone function.
-        # For now, let's simplify get_all_data to just fetch, as get_paginated_data already does filtering.
+        query = read_table(table_name).select(select_columns)
+        query = apply_search(query, table_name, search_term, columns)
 
         data_response = query.execute()
         rows = data_response.data
@@ -89,56 +112,236 @@ def get_all_data(table_name: str, search_term: str = "", columns: list[str] = No
         print(f"[DEBUG] get_all_data - Error: {e}")
         return [] # Return empty list on error
 
+# Global search: ranked matches kept per table, and lookups run in parallel
+SEARCH_TOP_K = 50
+SEARCH_MAX_WORKERS = 8
+# Column identifying a row of each searched table; tables not listed use `id`
+SEARCH_ROW_KEYS = {"tab_sales_order": "po_no"}
+
+_search_executor = None
+_search_executor_pid = None
+_search_executor_lock = threading.Lock()
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """Returns this worker process's thread pool for search lookups."""
+    global _search_executor, _search_executor_pid
+    with _search_executor_lock:
+        if _search_executor is None or _search_executor_pid != os.getpid():
+            _search_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix='search')
+            _search_executor_pid = os.getpid()
+    return _search_executor
+
+def rank_search_match(row: dict, search_term: str, key_columns: list[str]) -> int:
+    """Ranks a search hit: 0 for an exact key column match (e.g. PO/SKU), 1 for a key prefix match, 2 otherwise."""
+    term = search_term.lower()
+    values = [str(row.get(col) or '').lower() for col in key_columns]
+    if term in values:
+        return 0
+    if any(value.startswith(term) for value in values):
+        return 1
+    return 2
+
+def _search_columns(table_name: str, columns: list[str]) -> list[str]:
+    row_key = SEARCH_ROW_KEYS.get(table_name, "id")
+    return columns if row_key in columns else columns + [row_key]
+
+def _search_substring(table_name: str, search_term: str, columns: list[str], top_k: int):
+    query = read_table(table_name).select(",".join(_search_columns(table_name, columns)), count="exact")
+    response = apply_search(query, table_name, search_term, columns).limit(top_k).execute()
+    return response.data, response.count
+
+def _search_prefix(table_name: str, search_term: str, columns: list[str], key_columns: list[str], top_k: int):
+    conditions = ",".join(f"{col}.ilike.{search_term}%" for col in key_columns)
+    return read_table(table_name).select(",".join(_search_columns(table_name, columns))).or_(conditions).limit(top_k).execute().data
+
+def search_tables(search_term: str, specs: dict, top_k: int = SEARCH_TOP_K) -> dict:
+    """
+    Runs the global search over several tables concurrently.
+    
+    Every table gets a substring lookup (capped to `top_k`, with an exact match
+    count) and a prefix lookup on its key columns, so exact and prefix matches
+    are found even when the substring matches exceed the cap. All lookups are
+    in flight at once, so the latency is that of the slowest one.
+    
+    Args:
+        search_term: The text to search for.
+        specs: Maps a section name to (table_name, columns, key_columns).
+        top_k: Maximum number of ranked rows kept per table.
+        
+    Returns:
+        Maps each section name to {"rows": ranked rows, "total": number of matches}.
+    """
+    executor = _get_search_executor()
+    futures = {}
+    for section, (table_name, columns, key_columns) in specs.items():
+        futures[section] = (
+            executor.submit(_search_substring, table_name, search_term, columns, top_k),
+            executor.submit(_search_prefix, table_name, search_term, columns, key_columns, top_k)
+        )
+
+    results = {}
+    for section, (substring_future, prefix_future) in futures.items():
+        table_name, columns, key_columns = specs[section]
+        try:
+            substring_rows, total = substring_future.result()
+            prefix_rows = prefix_future.result()
+        except Exception as e:
+            logger.error(f"Error searching table {table_name} for '{search_term}' in Supabase: {str(e)}", exc_info=True)
+            results[section] = {"rows": [], "total": 0}
+            continue
+
+        # Prefix hits are also substring hits; keep each row once, by its key,
+        # so distinct rows showing the same values are all kept
+        row_key = SEARCH_ROW_KEYS.get(table_name, "id")
+        unique_rows = {}
+        for row in prefix_rows + substring_rows:
+            unique_rows.setdefault(row.get(row_key), row)
+        ranked = sorted(unique_rows.values(), key=lambda row: rank_search_match(row, search_term, key_columns))
+
+        results[section] = {"rows": ranked[:top_k], "total": total if total is not None else len(ranked)}
+    return results
+
+def iter_all_data(table_name: str, search_term: str = "", columns: list[str] = None, chunk_size: int = EXPORT_CHUNK_SIZE, filters: list[tuple] = None, raise_errors: bool = False):
+    """
+    Yields the same rows as get_all_data, fetched in chunks of `chunk_size`.
+    
+    Chunks are paged by `id` (keyset), so only one chunk is held in memory at a
+    time and each round-trip costs the same regardless of how far into the
+    table the export is. Optional (field, operator, value) filters are applied
+    like the listing filters. Errors are logged and end the iteration unless
+    `raise_errors` is set.
+    """
+    if columns and 'id' not in columns:
+        columns = columns + ['id']
+    select_columns = ",".join(columns) if columns else "*"
+    search_term = search_term.strip()
+
+    last_id = None
+    while True:
+        try:
+            query = read_table(table_name).select(select_columns)
+            query = apply_search(query, table_name, search_term, columns)
+            query = apply_filters(query, filters or [])
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            rows = query.order('id').limit(chunk_size).execute().data
+        except Exception as e:
+            logger.error(f"Error streaming data for table {table_name} with search '{search_term}' from Supabase: {str(e)}", exc_info=True)
+            if raise_errors:
+                raise
+            return
+
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]['id']
+
+def count_all_data(table_name: str, search_term: str = "", filters: list[tuple] = None):
+    """Returns the number of rows iter_all_data would yield, or None if the count fails."""
+    try:
+        query = read_table(table_name).select("id", count="exact", head=True)
+        query = apply_search(query, table_name, search_term.strip(), None)
+        query = apply_filters(query, filters or [])
+        return query.execute().count
+    except Exception as e:
+        logger.error(f"Error counting rows for table {table_name} with search '{search_term}' from Supabase: {str(e)}", exc_info=True)
+        return None
+
+def stream_csv(rows, filename: str, flush_size: int = 64 * 1024):
+    """
+    Builds a streamed CSV download from an iterable of row dicts.
+    The header comes from the first row's keys; output is flushed to the client
+    every `flush_size` characters instead of being built up in memory.
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        headers = None
+        for row in rows:
+            if headers is None:
+                headers = list(row.keys())
+                writer.writerow(headers)
+            writer.writerow([row.get(key) for key in headers])
+            if buffer.tell() >= flush_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    output = Response(generate(), mimetype="text/csv")
+    output.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return output
+
+def export_table(table_name: str, search_term: str, filename: str, empty_redirect: str, export_format: str = "csv", filters: list[tuple] = None):
+    """
+    Streams a table export as CSV or XLSX (`filename` without extension), or
+    redirects back with a notice when there is nothing to export or the read fails.
+
+    A read failing once a CSV stream has started aborts the download, so the
+    client sees a broken transfer rather than a short file that looks complete.
+    """
+    rows = iter_all_data(table_name, search_term=search_term, columns=None, filters=filters, raise_errors=True)
+    try:
+        first_row = next(rows, None)
+        if first_row is None:
+            flash('No data to export.', 'info')
+            return redirect(url_for(empty_redirect))
+
+        rows = itertools.chain([first_row], rows)
+        if export_format == "xlsx":
+            # The workbook is complete before the response is built, so a failure here is reported, not downloaded
+            return xlsx_response([(filename, None, rows)], f"{filename}.xlsx")
+    except Exception as e:
+        flash(f'Error exporting data: {str(e)}', 'error')
+        return redirect(url_for(empty_redirect))
+    return stream_csv(rows, f"{filename}.csv")
+
+def export_job_response(job: dict):
+    """JSON view of an export job, with links for polling and downloading."""
+    payload = {key: job.get(key) for key in ('id', 'status', 'format', 'rows_written', 'total_rows', 'progress', 'error')}
+    payload['status_url'] = url_for('data.export_job_status', job_id=job['id'])
+    if job['status'] == 'finished':
+        payload['download_url'] = url_for('data.export_job_download', job_id=job['id'])
+    return jsonify(payload)
+
+def start_export_job(table_key: str, search_term: str, export_format: str = "csv", filters: list[tuple] = None):
+    """Queues a background export of one of the EXPORTS tables and returns the job as JSON (202)."""
+    table_name, filename, _ = EXPORTS[table_key]
+    search_term = search_term.strip()
+    filters = filters or []
+    params = {"table": table_name, "search": search_term, "filters": filters}
+
+    job = submit_export_job(
+        params,
+        lambda: iter_all_data(table_name, search_term=search_term, columns=None, filters=filters, raise_errors=True),
+        filename,
+        export_format,
+        count_rows=lambda: count_all_data(table_name, search_term, filters)
+    )
+    return export_job_response(job), 202
+
 @bp.route("/pending-order")
 def production_data():
+    """Pending orders as an HTML table, or as JSON with ?format=json or an Accept: application/json header."""
+    wants_json = request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
     try:
-        # Define the columns we want to show in order
-        columns = [
-            'shipment_id',
-            'date',
-            'ETD',
-            'production',
-            'channel_abb',
-            'mode',
-            'po_qty',
-            'dispatched_qty',
-            'pending_qty',
-            'status'
-        ]
-        
-        # Build the query
-        query = supabase.table('pending_order').select(','.join(columns))
-        
-        # Add sorting by date descending
-        query = query.order('date', desc=True)
-        
-        # Execute query
-        response = query.execute()
-        
-        # Process the response
-        if response.data:
-            orders = response.data
-            total_records = len(orders)
-        else:
-            orders = []
-            total_records = 0
-        
-        return render_template(
-            "shipment.html",
-            headers=columns,
-            orders=orders,
-            total_records=total_records
-        )
-        
+        pending = get_pending_orders()
     except Exception as e:
         logger.error(f"Error fetching pending order data: {str(e)}", exc_info=True)
+        if wants_json:
+            return jsonify({'message': 'Internal Server Error'}), 500
         flash(f'Error loading pending orders: {str(e)}', 'error')
-        return render_template(
-            "shipment.html",
-            headers=[],
-            orders=[],
-            total_records=0
-        )
+        pending = {"headers": [], "data": [], "recordsTotal": 0}
+
+    if wants_json:
+        return jsonify(pending)
+    return render_template(
+        "shipment.html",
+        headers=pending["headers"],
+        orders=pending["data"],
+        total_records=pending["recordsTotal"]
+    )
 
 @bp.route("/cutting-phase")
 def cutting():
@@ -147,14 +350,17 @@ def cutting():
         page = max(1, min(int(request.args.get("page", 1)), 9999))
     except ValueError:
         page = 1
-    limit = int(request.args.get("limit", 20))
+    limit = clamp_page_limit(request.args.get("limit", 20))
     column_view = request.args.get("column_view", "all")
     print(f"Cutting page - Column view: {column_view}")  # Debug log
     
     columns_to_fetch = get_limited_columns("tab_cutting") if column_view == "limited" else None
     print(f"Cutting page - Columns to fetch: {columns_to_fetch}")  # Debug log
     
-    data = get_paginated_data(TABLES["cutting"], search, page, limit, columns=columns_to_fetch)
+    cursor = request.args.get("cursor")
+    pagination = request.args.get("pagination", "offset")
+    
+    data = get_paginated_data(TABLES["cutting"], search, page, limit, columns=columns_to_fetch, cursor=cursor, pagination=pagination)
 
     # Fetch summary metrics
     summary_metrics = get_cutting_summary_metrics()
@@ -174,7 +380,7 @@ def get_cutting_details(record_id):
     """
     try:
         logger.info(f"Attempting to fetch details for record ID: {record_id} from Supabase.")
-        response = supabase.table('tab_cutting').select('*').eq('id', record_id).execute()
+        response = get_supabase_client().table('tab_cutting').select('*').eq('id', record_id).execute()
         if response.data:
             record_details = response.data[0]
             logger.info(f"Successfully fetched details for record ID: {record_id} from Supabase.")
@@ -188,6 +394,7 @@ def get_cutting_details(record_id):
         return jsonify({'message': 'Internal Server Error'}), 500
 
 @bp.route("/cutting-phase/add", methods=['POST'])
+@idempotent
 def add_cutting():
     try:
         data = request.form
@@ -242,6 +449,33 @@ def add_cutting():
         flash(f'Error adding cutting data: {str(e)}', 'error')
         return redirect(url_for('data.cutting'))
 
+def ingest_route(table_name: str):
+    """Accepts a JSON array of entries, or a CSV upload/body, and inserts the valid rows in batches."""
+    try:
+        if request.is_json:
+            frame = read_entry_rows(records=request.get_json(silent=True))
+            first_row = 0
+        else:
+            upload = request.files.get('file')
+            frame = read_entry_rows(csv_stream=upload.stream if upload else io.BytesIO(request.get_data()))
+            # Row numbers as seen in the file, where the header is row 1
+            first_row = 2
+    except Exception as e:
+        return jsonify({'message': f'Could not read rows: {str(e)}'}), 400
+
+    try:
+        report = ingest_entries(table_name, frame, first_row=first_row)
+    except Exception as e:
+        logger.error(f"Error ingesting rows into {table_name}: {str(e)}", exc_info=True)
+        return jsonify({'message': 'Internal Server Error'}), 500
+    logger.info(f"Ingested {report['inserted']} of {report['rows']} rows into {table_name}.")
+    return jsonify(report), 200 if report['inserted'] or not report['rows'] else 422
+
+@bp.route("/cutting-phase/bulk", methods=['POST'])
+@idempotent
+def ingest_cutting():
+    return ingest_route(TABLES["cutting"])
+
 @bp.route("/cutting-phase/edit/<string:id>", methods=['GET', 'POST'])
 def edit_cutting(id):
     if request.method == 'POST':
@@ -288,7 +522,7 @@ def edit_cutting(id):
     else: # GET request for edit_cutting
         record = None
         try:
-            response = supabase.table('tab_cutting').select('*').eq('id', id).execute()
+            response = get_supabase_client().table('tab_cutting').select('*').eq('id', id).execute()
             if response.data:
                 record = response.data[0]
                 # Format date for HTML input
@@ -329,14 +563,17 @@ def tab_production():
         page = max(1, min(int(request.args.get("page", 1)), 9999))
     except ValueError:
         page = 1
-    limit = int(request.args.get("limit", 20))
+    limit = clamp_page_limit(request.args.get("limit", 20))
     column_view = request.args.get("column_view", "all")
     print(f"Tab Production page - Column view: {column_view}")  # Debug log
     
     columns_to_fetch = get_limited_columns("tab_production") if column_view == "limited" else None
     print(f"Tab Production page - Columns to fetch: {columns_to_fetch}")  # Debug log
     
-    data = get_paginated_data(TABLES["tab_production"], search, page, limit, columns=columns_to_fetch)
+    cursor = request.args.get("cursor")
+    pagination = request.args.get("pagination", "offset")
+    
+    data = get_paginated_data(TABLES["tab_production"], search, page, limit, columns=columns_to_fetch, cursor=cursor, pagination=pagination)
     print(f"Tab Production page - Headers: {data.get('headers')}")  # Debug log
     return render_template("manufacturing/production_phase.html", **data, column_view=column_view, today_date=date.today().isoformat())
 
@@ -347,7 +584,7 @@ def get_production_details(record_id):
     """
     try:
         logger.info(f"Attempting to fetch details for record ID: {record_id} from Supabase.")
-        response = supabase.table('tab_production').select('*').eq('id', record_id).execute()
+        response = get_supabase_client().table('tab_production').select('*').eq('id', record_id).execute()
         if response.data:
             record_details = response.data[0]
             logger.info(f"Successfully fetched details for record ID: {record_id} from Supabase.")
@@ -361,6 +598,7 @@ def get_production_details(record_id):
         return jsonify({'message': 'Internal Server Error'}), 500
 
 @bp.route("/production-phase/add", methods=['POST'])
+@idempotent
 def add_production():
     try:
         data = request.form
@@ -405,8 +643,10 @@ def add_production():
             "rejection": rejection
         }
 
-        response = supabase.table('tab_production').insert(new_record).execute()
+        response = get_supabase_client().table('tab_production').insert(new_record).execute()
         if response.data:
+            replicate_upsert('tab_production', response.data)
+            invalidate_table('tab_production')
             flash('Production data added successfully!', 'success')
         else:
             raise Exception("Failed to add record: No response data from Supabase")
@@ -418,6 +658,11 @@ def add_production():
         flash(f'Error adding production data: {str(e)}', 'error')
         return redirect(url_for('data.tab_production'))
 
+@bp.route("/production-phase/bulk", methods=['POST'])
+@idempotent
+def ingest_production():
+    return ingest_route(TABLES["tab_production"])
+
 @bp.route("/production-phase/edit/<string:id>", methods=['GET', 'POST'])
 def edit_production(id):
     if request.method == 'POST':
@@ -452,8 +697,10 @@ def edit_production(id):
                 "rejection": rejection
             }
 
-            response = supabase.table('tab_production').update(updated_record_data).eq('id', id).execute()
+            response = get_supabase_client().table('tab_production').update(updated_record_data).eq('id', id).execute()
             if response.data:
+                replicate_upsert('tab_production', response.data)
+                invalidate_table('tab_production')
                 flash('Production data updated successfully!', 'success')
             else:
                 raise Exception("Failed to update record: No response data from Supabase")
@@ -468,7 +715,7 @@ def edit_production(id):
     else: # GET request for edit_production
         record = None
         try:
-            response = supabase.table('tab_production').select('*').eq('id', id).execute()
+            response = get_supabase_client().table('tab_production').select('*').eq('id', id).execute()
             if response.data:
                 record = response.data[0]
                 # Format date for HTML input
@@ -491,8 +738,10 @@ def bulk_delete_production():
         return jsonify({'message': 'No records selected for deletion.'}), 400
 
     try:
-        response = supabase.table('tab_production').delete().in_('id', selected_ids).execute()
+        response = get_supabase_client().table('tab_production').delete().in_('id', selected_ids).execute()
         if response.data is not None:
+            replicate_delete('tab_production', 'id', selected_ids)
+            invalidate_table('tab_production')
             deleted_count = len(response.data)
             flash(f'{deleted_count} records deleted successfully!', 'success')
             return jsonify({'message': 'Records deleted successfully'}), 200
@@ -503,72 +752,52 @@ def bulk_delete_production():
         logger.error(f"Error during bulk delete from Supabase: {str(e)}", exc_info=True)
         return jsonify({'message': f'Error deleting records: {str(e)}'}), 500
 
-@bp.route("/cutting-phase/export", methods=['GET'])
-def export_cutting():
+def export_route(table_key: str):
+    """Shared handler for the /export routes; ?background=1 queues an export job instead of streaming."""
     search = request.args.get("search", "")
-    
-    # Fetch all data (not paginated) for export using Supabase
-    data_rows = get_all_data(TABLES["cutting"], search_term=search, columns=None) # get_all_data now uses Supabase
+    export_format = request.args.get("format", "csv")
+    filters = parse_filter_args(request.args)
+    if request.args.get("background"):
+        return start_export_job(table_key, search, export_format, filters)
 
-    if not data_rows:
-        flash('No data to export.', 'info')
-        return redirect(url_for('data.cutting'))
+    table_name, filename, listing_endpoint = EXPORTS[table_key]
+    return export_table(table_name, search, filename, listing_endpoint, export_format, filters)
 
-    # Create a CSV in memory
-    si = io.StringIO()
-    cw = csv.writer(si)
-
-    # Write headers
-    headers = data_rows[0].keys()
-    cw.writerow(headers)
-
-    # Write data rows
-    for row in data_rows:
-        cw.writerow([row[key] for key in headers])
-
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = "attachment; filename=Daily Cutting.csv"
-    output.headers["Content-type"] = "text/csv"
-    return output
+@bp.route("/cutting-phase/export", methods=['GET'])
+def export_cutting():
+    return export_route("cutting")
 
 @bp.route("/pending-order/export", methods=['GET'])
 def export_production():
-    search = request.args.get("search", "")
-    data_rows = get_all_data(TABLES["shipment"], search_term=search, columns=None) # get_all_data now uses Supabase
-
-    if not data_rows:
-        flash('No data to export.', 'info')
-        return redirect(url_for('data.production_data'))
-    
-    si = io.StringIO()
-    cw = csv.writer(si)
-    headers = data_rows[0].keys()
-    cw.writerow(headers)
-    for row in data_rows:
-        cw.writerow([row[key] for key in headers])
-    
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = "attachment; filename=production_data.csv"
-    output.headers["Content-type"] = "text/csv"
-    return output
+    return export_route("shipment")
 
 @bp.route("/production-phase/export", methods=['GET'])
 def export_tab_production():
-    search = request.args.get("search", "")
-    data_rows = get_all_data(TABLES["tab_production"], search_term=search, columns=None) # get_all_data now uses Supabase
-
-    if not data_rows:
-        flash('No data to export.', 'info')
-        return redirect(url_for('data.tab_production'))
-
-    si = io.StringIO()
-    cw = csv.writer(si)
-    headers = data_rows[0].keys()
-    cw.writerow(headers)
-    for row in data_rows:
-        cw.writerow([row[key] for key in headers])
-    
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = "attachment; filename=Production Data.csv"
-    output.headers["Content-type"] = "text/csv"
-    return output 
\ No newline at end of file
+    return export_route("tab_production")
+
+@bp.route("/export-jobs", methods=['POST'])
+def create_export_job():
+    """Queue an export of a table with optional search, filters and format (csv/xlsx)."""
+    data = request.get_json(silent=True) or request.form
+    table_key = data.get("table")
+    if table_key not in EXPORTS:
+        return jsonify({'message': f'Unknown export table: {table_key}'}), 400
+
+    return start_export_job(table_key, data.get("search", ""), data.get("format", "csv"), parse_filter_args(data))
+
+@bp.route("/export-jobs/<string:job_id>", methods=['GET'])
+def export_job_status(job_id):
+    job = get_export_job(job_id)
+    if not job:
+        return jsonify({'message': 'Export job not found or expired'}), 404
+    return export_job_response(job)
+
+@bp.route("/export-jobs/<string:job_id>/download", methods=['GET'])
+def export_job_download(job_id):
+    job = get_export_job(job_id)
+    if not job:
+        return jsonify({'message': 'Export job not found or expired'}), 404
+    if job['status'] != 'finished':
+        return jsonify({'message': f"Export job is {job['status']}"}), 409
+
+    return send_file(job['artifact'], as_attachment=True, download_name=f"{job['filename']}.{job['format']}")
@@ -1,11 +1,64 @@
 from flask import Blueprint, render_template, request, jsonify
 from datetime import datetime
 import calendar
+import os
+import threading
+import time
 from app.utils.supabase_client import get_supabase_client
+from app.utils.xlsx_export import xlsx_response
+from app.models.data_models import read_table
+from app.utils.analytics import analytics_available, dispatch_cube_rows
+from app.utils.paging import keyset_pages
 from collections import defaultdict
+import pandas as pd
 
 bp = Blueprint('dispatch', __name__, url_prefix='/reports')
 
+# Distinct shipment years for the report dropdowns, rebuilt every YEARS_INDEX_TTL seconds
+YEARS_INDEX_TTL = int(os.getenv('DISPATCH_YEARS_TTL', 3600))
+_years_index = {'years': None, 'loaded_at': 0.0}
+_years_index_lock = threading.Lock()
+
+def _shipment_month(year=None, last=False):
+    """The first (or last) shipment month, optionally within one year, from a one-row ordered lookup."""
+    query = read_table('tab_shipment_meta').select('month').not_.is_('month', None)
+    if year is not None:
+        query = query.gte('month', f'{year}-01-01').lt('month', f'{year + 1}-01-01')
+    rows = query.order('month', desc=last).limit(1).execute().data
+    month = rows[0]['month'] if rows else None
+    return month if isinstance(month, str) and month else None
+
+def _load_available_years():
+    """
+    Find the distinct years that have shipments without reading the whole month column:
+    the first and last months bound the range, and each year in between is checked with a one-row lookup.
+    """
+    first, last = _shipment_month(), _shipment_month(last=True)
+    if first is None or last is None:
+        return []
+    first_year, last_year = int(first[:4]), int(last[:4])
+    years = [first_year]
+    years += [year for year in range(first_year + 1, last_year) if _shipment_month(year) is not None]
+    if last_year != first_year:
+        years.append(last_year)
+    return years
+
+def get_available_years():
+    """Get the sorted shipment years from the cached index, rebuilding it when it is stale."""
+    if _years_index['years'] is None or time.monotonic() - _years_index['loaded_at'] > YEARS_INDEX_TTL:
+        with _years_index_lock:
+            # Another thread may have rebuilt the index while we waited
+            if _years_index['years'] is None or time.monotonic() - _years_index['loaded_at'] > YEARS_INDEX_TTL:
+                try:
+                    _years_index['years'] = _load_available_years()
+                except Exception as e:
+                    print(f"Error refreshing available years index: {str(e)}")
+                    # Keep serving the previous index; retry on the next request
+                    if _years_index['years'] is None:
+                        return []
+                _years_index['loaded_at'] = time.monotonic()
+    return _years_index['years']
+
 def get_monthly_data(year, branch="all", channel="all", repository="all"):
     """Get monthly shipment data for the specified year."""
     supabase = get_supabase_client()
@@ -73,110 +126,93 @@ def get_quarterly_data(monthly_data):
     
     return [{'quarter': q, **d['data']} for q, d in quarters.items()]
 
-def get_channel_data(year, branch="all", repository="all"):
-    """Get channel-wise shipment data."""
-    supabase = get_supabase_client()
-    
-    query = supabase.table('tab_shipment_meta') \
-        .select('channel_abb, branch, total_qty') \
-        .gte('month', f'{year}-01-01') \
-        .lt('month', f'{year + 1}-01-01') \
-        .not_.ilike('shipment_id', '%Return%') \
-        .not_.ilike('shipment_id', '%LPN%') \
-        .not_.ilike('shipment_id', '%Mango%') \
-        .not_.ilike('shipment_id', '%FMC%')
+# Columns needed to build every cube of the monthly dispatch report
+DISPATCH_REPORT_COLUMNS = ['month', 'branch', 'channel_abb', 'repository', 'total_qty']
 
-    if branch != "all":
-        query = query.eq('branch', branch.capitalize())
-    if repository != "all":
-        query = query.eq('repository', repository)
+def fetch_dispatch_rows(year):
+    """
+    Fetch the year's shipment rows, with the standard exclusions, ordered by
+    month and shipment id so the breakdowns list values in a stable order.
+    Rows are read in keyset pages on (month, shipment_id), as a single request
+    would be cut off at PostgREST's max-rows on busy years.
+    With the analytics backend available the rows come pre-aggregated per
+    dimension combination, which yields the same cubes from far fewer rows.
+    """
+    if analytics_available('tab_shipment_meta'):
+        return dispatch_cube_rows(year, DISPATCH_REPORT_COLUMNS)
 
-    response = query.execute()
-    
-    channel_data = defaultdict(lambda: {'count': 0, 'percentage': 0})
-    total_count = 0
-    
-    for record in response.data:
-        channel = record['channel_abb'] or 'Unknown'
-        qty = record['total_qty'] or 0
-        channel_data[channel]['count'] += qty
-        total_count += qty
-    
-    # Calculate percentages
-    for channel in channel_data:
-        channel_data[channel]['percentage'] = round((channel_data[channel]['count'] / total_count * 100), 2) if total_count > 0 else 0
-    
-    return [{'channel': k, **v} for k, v in channel_data.items()]
+    def build_query():
+        return read_table('tab_shipment_meta') \
+            .select(','.join(DISPATCH_REPORT_COLUMNS + ['shipment_id'])) \
+            .gte('month', f'{year}-01-01') \
+            .lt('month', f'{year + 1}-01-01') \
+            .not_.ilike('shipment_id', '%Return%') \
+            .not_.ilike('shipment_id', '%LPN%') \
+            .not_.ilike('shipment_id', '%Mango%') \
+            .not_.ilike('shipment_id', '%FMC%')
 
-def get_repository_data(year, branch="all", channel="all"):
-    """Get repository-wise shipment data."""
-    supabase = get_supabase_client()
-    
-    query = supabase.table('tab_shipment_meta') \
-        .select('repository, branch, total_qty') \
-        .gte('month', f'{year}-01-01') \
-        .lt('month', f'{year + 1}-01-01') \
-        .not_.ilike('shipment_id', '%Return%') \
-        .not_.ilike('shipment_id', '%LPN%') \
-        .not_.ilike('shipment_id', '%Mango%') \
-        .not_.ilike('shipment_id', '%FMC%')
+    return [row for rows in keyset_pages(build_query, ['month', 'shipment_id']) for row in rows]
 
-    if branch != "all":
-        query = query.eq('branch', branch.capitalize())
-    if channel != "all":
-        query = query.eq('channel_abb', channel)
+def _share_breakdown(frame, mask, column, label):
+    """Sum total_qty per value of `column` for the masked rows, with percentage shares."""
+    subset = frame.loc[mask]
+    keys = subset[column].where(subset[column].notna() & (subset[column] != ''), 'Unknown')
+    counts = subset['total_qty'].groupby(keys, sort=False).sum()
+    total_count = counts.sum()
 
-    response = query.execute()
-    
-    repo_data = defaultdict(lambda: {'count': 0, 'percentage': 0})
-    total_count = 0
-    
-    for record in response.data:
-        repo = record['repository'] or 'Unknown'
-        qty = record['total_qty'] or 0
-        repo_data[repo]['count'] += qty
-        total_count += qty
-    
-    # Calculate percentages
-    for repo in repo_data:
-        repo_data[repo]['percentage'] = round((repo_data[repo]['count'] / total_count * 100), 2) if total_count > 0 else 0
-    
-    return [{'repository': k, **v} for k, v in repo_data.items()]
+    return [
+        {label: key, 'count': count, 'percentage': round((count / total_count * 100), 2) if total_count > 0 else 0}
+        for key, count in zip(counts.index.tolist(), counts.tolist())
+    ]
 
-def get_branch_data(year, channel="all", repository="all"):
-    """Get branch-wise shipment data."""
-    supabase = get_supabase_client()
-    
-    query = supabase.table('tab_shipment_meta') \
-        .select('branch, total_qty') \
-        .gte('month', f'{year}-01-01') \
-        .lt('month', f'{year + 1}-01-01') \
-        .not_.ilike('shipment_id', '%Return%') \
-        .not_.ilike('shipment_id', '%LPN%') \
-        .not_.ilike('shipment_id', '%Mango%') \
-        .not_.ilike('shipment_id', '%FMC%')
+def build_dispatch_report(year, branch="all", channel="all", repository="all"):
+    """
+    Build the monthly, quarterly, channel, repository and branch cubes of the
+    dispatch report from a single fetch of the year's shipments.
 
-    if channel != "all":
-        query = query.eq('channel_abb', channel)
-    if repository != "all":
-        query = query.eq('repository', repository)
+    Each cube applies the same filters the separate per-cube queries used to
+    apply, as the report routes called them.
+    """
+    frame = pd.DataFrame(fetch_dispatch_rows(year), columns=DISPATCH_REPORT_COLUMNS)
 
-    response = query.execute()
-    
-    branch_data = defaultdict(lambda: {'count': 0, 'percentage': 0})
-    total_count = 0
-    
-    for record in response.data:
-        branch = record['branch'] or 'Unknown'
-        qty = record['total_qty'] or 0
-        branch_data[branch]['count'] += qty
-        total_count += qty
-    
-    # Calculate percentages
-    for branch in branch_data:
-        branch_data[branch]['percentage'] = round((branch_data[branch]['count'] / total_count * 100), 2) if total_count > 0 else 0
-    
-    return [{'branch': k, **v} for k, v in branch_data.items()]
+    qty = pd.to_numeric(frame['total_qty'], errors='coerce').fillna(0)
+    frame['total_qty'] = qty.astype('int64') if (qty % 1 == 0).all() else qty
+
+    everything = pd.Series(True, index=frame.index)
+    branch_mask = frame['branch'] == branch.capitalize() if branch != "all" else everything
+    channel_mask = frame['channel_abb'] == channel if channel != "all" else everything
+    repository_mask = frame['repository'] == repository if repository != "all" else everything
+
+    # Monthly cube, split by branch
+    monthly = frame.loc[branch_mask & channel_mask & repository_mask]
+    month_names = pd.to_datetime(monthly['month'], format='%Y-%m-%d').dt.month
+    branch_names = monthly['branch'].str.lower()
+    monthly_totals = pd.DataFrame({
+        'month': month_names,
+        'karur': monthly['total_qty'].where(branch_names == 'karur', 0),
+        'mumbai': monthly['total_qty'].where(branch_names == 'mumbai', 0),
+        'total': monthly['total_qty'],
+    }).groupby('month').sum()
+
+    monthly_data = [
+        {'month': calendar.month_name[month], 'karur': karur, 'mumbai': mumbai, 'total': total}
+        for month, karur, mumbai, total in zip(
+            monthly_totals.index.tolist(),
+            monthly_totals['karur'].tolist(),
+            monthly_totals['mumbai'].tolist(),
+            monthly_totals['total'].tolist()
+        )
+    ]
+    quarterly_data = get_quarterly_data(monthly_data)
+
+    channel_data = _share_breakdown(frame, branch_mask & repository_mask, 'channel_abb', 'channel')
+    repository_data = _share_breakdown(frame, branch_mask & channel_mask, 'repository', 'repository')
+    # The per-cube branch query was called with the branch value as its channel
+    # argument, i.e. matched against channel_abb; kept for identical output
+    branch_as_channel_mask = frame['channel_abb'] == branch if branch != "all" else everything
+    branch_data = _share_breakdown(frame, branch_as_channel_mask & repository_mask, 'branch', 'branch')
+
+    return monthly_data, quarterly_data, channel_data, repository_data, branch_data
 
 def calculate_percentages(totals):
     """Calculate percentage distribution between branches."""
@@ -199,12 +235,9 @@ def monthly_dispatch_report():
         channel = request.args.get('channel', 'all')
         repository = request.args.get('repository', 'all')
         
-        # Get all required data
-        monthly_data = get_monthly_data(year, branch, channel, repository)
-        quarterly_data = get_quarterly_data(monthly_data)
-        channel_data = get_channel_data(year, branch, repository)
-        repository_data = get_repository_data(year, branch, channel)
-        branch_data = get_branch_data(year, branch, repository)
+        # Get all required data in a single fetch
+        monthly_data, quarterly_data, channel_data, repository_data, branch_data = \
+            build_dispatch_report(year, branch, channel, repository)
         
         # Prepare data for charts
         monthly_labels = [m['month'] for m in monthly_data]
@@ -225,16 +258,7 @@ def monthly_dispatch_report():
         branch_data_values = [b['count'] for b in branch_data]
         
         # Get available years for the dropdown
-        supabase = get_supabase_client()
-        years_response = supabase.table('tab_shipment_meta') \
-            .select('month') \
-            .execute()
-        
-        years = sorted(list(set(
-            datetime.strptime(record['month'], '%Y-%m-%d').year
-            for record in years_response.data
-            if record['month'] and isinstance(record['month'], str)
-        )))
+        years = get_available_years()
         
         return render_template('reports/dispatch_reports.html',
                              year=year,
@@ -288,16 +312,7 @@ def dispatch_summary_report():
     percentages = calculate_percentages(totals)
     
     # Get available years for the dropdown
-    supabase = get_supabase_client()
-    years_response = supabase.table('tab_shipment_meta') \
-        .select('month') \
-        .execute()
-    
-    years = sorted(list(set(
-        datetime.strptime(record['month'], '%Y-%m-%d').year
-        for record in years_response.data
-        if record['month'] and isinstance(record['month'], str)
-    )))
+    years = get_available_years()
     
     return render_template('reports/dispatch_summary.html',
                          year=year,
@@ -314,12 +329,9 @@ def api_monthly_dispatch():
     channel = request.args.get('channel', 'all')
     repository = request.args.get('repository', 'all')
     
-    # Get all required data
-    monthly_data = get_monthly_data(year, branch, channel, repository)
-    quarterly_data = get_quarterly_data(monthly_data)
-    channel_data = get_channel_data(year, branch, repository)
-    repository_data = get_repository_data(year, branch, channel)
-    branch_data = get_branch_data(year, branch, repository)
+    # Get all required data in a single fetch
+    monthly_data, quarterly_data, channel_data, repository_data, branch_data = \
+        build_dispatch_report(year, branch, channel, repository)
     
     # Prepare data for charts
     monthly_labels = [m['month'] for m in monthly_data]
@@ -359,6 +371,25 @@ def api_monthly_dispatch():
         'branch_data_values': branch_data_values
     })
 
+@bp.route('/dispatch/monthly/export')
+def export_monthly_dispatch():
+    """Download the monthly dispatch report cubes as an Excel workbook."""
+    year = int(request.args.get('year', datetime.now().year))
+    branch = request.args.get('branch', 'all')
+    channel = request.args.get('channel', 'all')
+    repository = request.args.get('repository', 'all')
+
+    monthly_data, quarterly_data, channel_data, repository_data, branch_data = \
+        build_dispatch_report(year, branch, channel, repository)
+
+    return xlsx_response([
+        ('Monthly Data', ['month', 'karur', 'mumbai', 'total'], monthly_data),
+        ('Quarterly Data', ['quarter', 'karur', 'mumbai', 'total'], quarterly_data),
+        ('Channel Data', ['channel', 'count', 'percentage'], channel_data),
+        ('Repository Data', ['repository', 'count', 'percentage'], repository_data),
+        ('Branch Data', ['branch', 'count', 'percentage'], branch_data)
+    ], f'dispatch_report_{year}.xlsx')
+
 @bp.route('/api/dispatch/monthly/compare')
 def api_monthly_compare():
     """API endpoint for comparing monthly data between two years."""
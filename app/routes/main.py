@@ -1,11 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, request
+from flask import Blueprint, render_template, redirect, url_for, request, jsonify
 from flask_login import login_required, login_user, logout_user, current_user
 from app import User
 from app.models.data_models import get_monthly_production_data, get_available_production_months, get_article_summary_data, get_monthly_cutting_data, get_available_cutting_months, get_article_cutting_summary_data, get_cutting_summary_metrics, get_production_summary_metrics
-from app.routes.data import get_all_data
+from app.routes.data import search_tables
+from app.utils.suggest_index import suggest_index, SUGGEST_FIELDS
+import math
 
 bp = Blueprint('main', __name__)
 
+# Rows per page within each section of the search results
+SEARCH_PAGE_SIZE = 10
+# Upper bound on the number of typeahead suggestions per request
+SUGGEST_MAX_LIMIT = 25
+
 @bp.route('/')
 def dashboard():
     # For now, automatically log in a test user
@@ -35,31 +42,55 @@ def search_results():
         return redirect(url_for('data.production_data')) # Assuming production_data route handles pending orders
     # --- End Page Search / Redirect Logic ---
 
-    # If no direct page match, proceed with content search (existing logic)
-    production_results = []
-    cutting_results = []
-    sales_order_results = []
-    pending_order_results = []
+    # If no direct page match, proceed with content search across tables
+    # Section name -> (table, columns to search, key columns ranked first on exact/prefix match)
+    search_specs = {
+        "production": ("tab_production", ["product", "design", "sku", "po_no"], ["po_no", "sku"]),
+        "cutting": ("tab_cutting", ["product", "design", "sku", "po_no"], ["po_no", "sku"]),
+        "sales_order": ("tab_sales_order", ["po_no", "customer_name"], ["po_no"]),
+        "pending_order": ("tab_inprod", ["shipment_id", "product", "channel_abb"], ["shipment_id"])
+    }
+
+    search_sections = {}
+    section_results = {section: [] for section in search_specs}
 
     if query:
-        # Define columns to search for each table
-        production_search_columns = ["product", "design", "sku", "po_no"]
-        cutting_search_columns = ["product", "design", "sku", "po_no"]
-        sales_order_search_columns = ["po_no", "customer_name"]
-        pending_order_search_columns = ["shipment_id", "product", "channel_abb"]
-
-        # Fetch results from different tables
-        production_results = get_all_data("tab_production", search_term=query, columns=production_search_columns)
-        cutting_results = get_all_data("tab_cutting", search_term=query, columns=cutting_search_columns)
-        sales_order_results = get_all_data("tab_sales_order", search_term=query, columns=sales_order_search_columns)
-        pending_order_results = get_all_data("tab_inprod", search_term=query, columns=pending_order_search_columns)
+        # Fetch ranked results from all tables concurrently, then page each section
+        for section, result in search_tables(query, search_specs).items():
+            total_pages = max(1, math.ceil(len(result["rows"]) / SEARCH_PAGE_SIZE))
+            page = max(1, min(request.args.get(f"{section}_page", 1, type=int), total_pages))
+            offset = (page - 1) * SEARCH_PAGE_SIZE
+            section_results[section] = result["rows"][offset:offset + SEARCH_PAGE_SIZE]
+            search_sections[section] = {
+                "total": result["total"],
+                "shown": len(result["rows"]),
+                "page": page,
+                "total_pages": total_pages
+            }
 
     return render_template('search_results.html',
                            search_query=query,
-                           production_results=production_results,
-                           cutting_results=cutting_results,
-                           sales_order_results=sales_order_results,
-                           pending_order_results=pending_order_results)
+                           search_sections=search_sections,
+                           production_results=section_results["production"],
+                           cutting_results=section_results["cutting"],
+                           sales_order_results=section_results["sales_order"],
+                           pending_order_results=section_results["pending_order"])
+
+@bp.route('/api/suggest')
+@login_required
+def suggest():
+    """Typeahead: values of the requested fields that start with `q`, served from the in-memory index."""
+    query = request.args.get('q', '').strip()
+    fields = [field for field in request.args.get('fields', '').split(',') if field in SUGGEST_FIELDS]
+    limit = max(1, min(request.args.get('limit', 10, type=int), SUGGEST_MAX_LIMIT))
+
+    response = jsonify({
+        "query": query,
+        "ready": suggest_index.ready,
+        "suggestions": suggest_index.suggest(query, fields or None, limit)
+    })
+    response.headers['Cache-Control'] = 'private, max-age=30'
+    return response
 
 @bp.route('/logout')
 def logout():
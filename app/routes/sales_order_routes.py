@@ -1,15 +1,32 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from datetime import datetime
 import uuid
+import os
 from app.utils.supabase_client import get_supabase_client
 from app.utils.auth import login_required
+from app.utils.idempotency import idempotent
+from app.utils.read_replica import replicate_delete
+from app.utils.cache import cached, invalidate_table
+from app.models.data_models import read_table
+from app.models.sales_order_models import save_sales_order, get_sales_order, forget_sales_orders, SalesOrderExists, read_order_file, import_sales_orders, IMPORT_HEADER_FIELDS, IMPORT_ITEM_FIELDS
 
 bp = Blueprint('sales_order', __name__, url_prefix='/sales-order')
 
+# Seconds to cache the status/branch filter values; writes invalidate them sooner
+SALES_ORDER_FACETS_TTL = int(os.getenv('SALES_ORDER_FACETS_TTL', 3600))
+
+@cached(ttl=SALES_ORDER_FACETS_TTL, depends_on=("tab_sales_order",))
+def get_sales_order_facets():
+    """Distinct statuses and branches for the list filter dropdowns, from a single scan."""
+    rows = read_table('tab_sales_order').select('status,branch').execute().data or []
+    statuses = sorted(set(row['status'] for row in rows if row.get('status')))
+    branches = sorted(set(row['branch'] for row in rows if row.get('branch')))
+    return statuses, branches
+
 @bp.route('/')
 @login_required
 def list_orders():
-    page = request.args.get('page', 1, type=int)
+    page = max(1, request.args.get('page', 1, type=int))
     per_page = 10
     offset = (page - 1) * per_page
     
@@ -18,8 +35,8 @@ def list_orders():
     status = request.args.get('status', '')
     branch = request.args.get('branch', '')
     
-    # Build query
-    query = get_supabase_client().table('tab_sales_order').select('*')
+    # Build query; the total comes back in the count header of the page request
+    query = read_table('tab_sales_order').select('*', count='exact')
     
     # Apply filters
     if po_no:
@@ -29,28 +46,13 @@ def list_orders():
     if branch:
         query = query.eq('branch', branch)
     
-    # Get total count for pagination
-    count_result = get_supabase_client().table('tab_sales_order').select('*', count='exact')
-    if po_no:
-        count_result = count_result.ilike('po_no', f'%{po_no}%')
-    if status:
-        count_result = count_result.eq('status', status)
-    if branch:
-        count_result = count_result.eq('branch', branch)
-    
-    count_data = count_result.execute()
-    total_count = count_data.count if hasattr(count_data, 'count') else 0
-    
     # Get paginated results
     result = query.range(offset, offset + per_page - 1).execute()
     orders = result.data
+    total_count = result.count if result.count is not None else offset + len(orders)
     
     # Get unique values for filter dropdowns
-    all_statuses_data = get_supabase_client().table('tab_sales_order').select('status').execute().data
-    statuses = list(set(s['status'] for s in all_statuses_data if s['status'])) if all_statuses_data else []
-    
-    all_branches_data = get_supabase_client().table('tab_sales_order').select('branch').execute().data
-    branches = list(set(b['branch'] for b in all_branches_data if b['branch'])) if all_branches_data else []
+    statuses, branches = get_sales_order_facets()
     
     return render_template('sales_order/sales_order_list.html',
                          orders=orders,
@@ -63,8 +65,30 @@ def list_orders():
                          statuses=statuses,
                          branches=branches)
 
+def items_from_form(po_no):
+    """Builds the item rows of an order from the submitted form, numbered by position."""
+    items = []
+    for i in range(int(request.form['item_count'])):
+        items.append({
+            'id': str(uuid.uuid4()),
+            'sr_no': i + 1,
+            'po_no': po_no,
+            'sku': request.form.get(f'items[{i}][sku]'),
+            'product': request.form.get(f'items[{i}][product]'),
+            'category': request.form.get(f'items[{i}][category]'),
+            'line': request.form.get(f'items[{i}][line]'),
+            'design': request.form.get(f'items[{i}][design]'),
+            'size': request.form.get(f'items[{i}][size]'),
+            'pack_of': request.form.get(f'items[{i}][pack_of]'),
+            'sets': request.form.get(f'items[{i}][sets]'),
+            'pieces': request.form.get(f'items[{i}][pieces]'),
+            'created_at': datetime.utcnow().isoformat()
+        })
+    return items
+
 @bp.route('/new', methods=['GET', 'POST'])
 @login_required
+@idempotent
 def create_order():
     if request.method == 'POST':
         try:
@@ -82,47 +106,15 @@ def create_order():
                 'created_at': datetime.utcnow().isoformat()
             }
             
-            # Check if PO number already exists
-            existing = get_supabase_client().table('tab_sales_order').select('po_no').eq('po_no', data['po_no']).execute()
-            if existing.data:
-                flash('PO number already exists!', 'error')
-                return render_template('sales_order/sales_order_form.html', data=data, items=[])
-            
-            # Insert parent record
-            result = get_supabase_client().table('tab_sales_order').insert(data).execute()
-            
-            # Process child items
-            items = []
-            total_qty = 0
-            for i in range(int(request.form['item_count'])):
-                item = {
-                    'id': str(uuid.uuid4()),
-                    'sr_no': i + 1,
-                    'po_no': data['po_no'],
-                    'sku': request.form.get(f'items[{i}][sku]'),
-                    'product': request.form.get(f'items[{i}][product]'),
-                    'category': request.form.get(f'items[{i}][category]'),
-                    'line': request.form.get(f'items[{i}][line]'),
-                    'design': request.form.get(f'items[{i}][design]'),
-                    'size': request.form.get(f'items[{i}][size]'),
-                    'pack_of': request.form.get(f'items[{i}][pack_of]'),
-                    'sets': request.form.get(f'items[{i}][sets]'),
-                    'pieces': request.form.get(f'items[{i}][pieces]'),
-                    'created_at': datetime.utcnow().isoformat()
-                }
-                items.append(item)
-                total_qty += int(item['pieces'] or 0)
-            
-            # Insert child records
-            if items:
-                get_supabase_client().table('tab_sales_order_items').insert(items).execute()
-            
-            # Update total quantity
-            get_supabase_client().table('tab_sales_order').update({'total_qty': total_qty}).eq('po_no', data['po_no']).execute()
+            # Save header and items, and recompute total_qty, in one call
+            save_sales_order(data, items_from_form(data['po_no']), create=True)
             
             flash('Sales order created successfully!', 'success')
             return redirect(url_for('sales_order.list_orders'))
             
+        except SalesOrderExists:
+            flash('PO number already exists!', 'error')
+            return render_template('sales_order/sales_order_form.html', data=data, items=[])
         except Exception as e:
             flash(f'Error creating sales order: {str(e)}', 'error')
             return render_template('sales_order/sales_order_form.html', data=data, items=[])
@@ -142,6 +134,32 @@ def create_order():
     }
     return render_template('sales_order/sales_order_form.html', data=empty_data, items=[])
 
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@idempotent
+def import_orders():
+    """Bulk-creates orders from a CSV/XLSX file with one line per item; ?format=json returns the report as JSON."""
+    columns = IMPORT_HEADER_FIELDS + IMPORT_ITEM_FIELDS
+    if request.method == 'GET':
+        return render_template('sales_order/sales_order_import.html', columns=columns, report=None)
+
+    wants_json = request.args.get('format') == 'json'
+    upload = request.files.get('file')
+    try:
+        if not upload or not upload.filename:
+            raise ValueError("Choose a file to import.")
+        report = import_sales_orders(read_order_file(upload.stream, upload.filename))
+    except ValueError as e:
+        if wants_json:
+            return jsonify({'message': str(e)}), 400
+        flash(str(e), 'error')
+        return render_template('sales_order/sales_order_import.html', columns=columns, report=None), 400
+
+    if wants_json:
+        return jsonify(report)
+    flash(f"Imported {report['orders_imported']} orders with {report['items_imported']} items.", 'success' if not report['errors'] else 'warning')
+    return render_template('sales_order/sales_order_import.html', columns=columns, report=report)
+
 @bp.route('/<po_no>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_order(po_no):
@@ -159,40 +177,8 @@ def edit_order(po_no):
                 'mode': request.form['mode']
             }
             
-            # Update parent record
-            get_supabase_client().table('tab_sales_order').update(data).eq('po_no', po_no).execute()
-            
-            # Delete existing items
-            get_supabase_client().table('tab_sales_order_items').delete().eq('po_no', po_no).execute()
-            
-            # Process new items
-            items = []
-            total_qty = 0
-            for i in range(int(request.form['item_count'])):
-                item = {
-                    'id': str(uuid.uuid4()),
-                    'sr_no': i + 1,
-                    'po_no': po_no,
-                    'sku': request.form.get(f'items[{i}][sku]'),
-                    'product': request.form.get(f'items[{i}][product]'),
-                    'category': request.form.get(f'items[{i}][category]'),
-                    'line': request.form.get(f'items[{i}][line]'),
-                    'design': request.form.get(f'items[{i}][design]'),
-                    'size': request.form.get(f'items[{i}][size]'),
-                    'pack_of': request.form.get(f'items[{i}][pack_of]'),
-                    'sets': request.form.get(f'items[{i}][sets]'),
-                    'pieces': request.form.get(f'items[{i}][pieces]'),
-                    'created_at': datetime.utcnow().isoformat()
-                }
-                items.append(item)
-                total_qty += int(item['pieces'] or 0)
-            
-            # Insert new items
-            if items:
-                get_supabase_client().table('tab_sales_order_items').insert(items).execute()
-            
-            # Update total quantity
-            get_supabase_client().table('tab_sales_order').update({'total_qty': total_qty}).eq('po_no', po_no).execute()
+            # Save header and items, and recompute total_qty, in one call
+            save_sales_order({'po_no': po_no, **data}, items_from_form(po_no))
             
             flash('Sales order updated successfully!', 'success')
             return redirect(url_for('sales_order.list_orders'))
@@ -202,16 +188,20 @@ def edit_order(po_no):
             return render_template('sales_order/sales_order_form.html', data=data)
     
     # Get existing order data
-    order = get_supabase_client().table('tab_sales_order').select('*').eq('po_no', po_no).execute().data[0]
-    items = get_supabase_client().table('tab_sales_order_items').select('*').eq('po_no', po_no).execute().data
+    found = get_sales_order(po_no)
+    if found is None:
+        abort(404)
+    order, items = found
     
     return render_template('sales_order/sales_order_form.html', data=order, items=items)
 
 @bp.route('/<po_no>/view')
 @login_required
 def view_order(po_no):
-    order = get_supabase_client().table('tab_sales_order').select('*').eq('po_no', po_no).execute().data[0]
-    items = get_supabase_client().table('tab_sales_order_items').select('*').eq('po_no', po_no).execute().data
+    found = get_sales_order(po_no)
+    if found is None:
+        abort(404)
+    order, items = found
     
     return render_template('sales_order/sales_order_detail.html', order=order, items=items)
 
@@ -223,7 +213,10 @@ def delete_order(po_no):
         get_supabase_client().table('tab_sales_order_items').delete().eq('po_no', po_no).execute()
         # Delete parent record
         get_supabase_client().table('tab_sales_order').delete().eq('po_no', po_no).execute()
+        replicate_delete('tab_sales_order_items', 'po_no', [po_no])
+        replicate_delete('tab_sales_order', 'po_no', [po_no])
         
+        forget_sales_orders([po_no])
         flash('Sales order deleted successfully!', 'success')
     except Exception as e:
         flash(f'Error deleting sales order: {str(e)}', 'error')
@@ -0,0 +1,64 @@
+import os
+from app.utils.read_replica import serves_table, query_replica
+
+# 'replica' answers the report aggregations with SQL over the local read
+# replica (see READ_REPLICA_PATH); 'supabase' keeps them on the upstream views
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'replica')
+
+# Shipment ids excluded from the dispatch reports (case-insensitive substrings)
+DISPATCH_EXCLUDED_SHIPMENTS = ['Return', 'LPN', 'Mango', 'FMC']
+
+
+def analytics_available(*table_names) -> bool:
+    """True when the analytics backend can answer queries over all the given tables."""
+    return ANALYTICS_BACKEND == 'replica' and all(serves_table(table_name) for table_name in table_names)
+
+
+def article_summary_rows(table_name: str, year_month=None) -> list[dict]:
+    """
+    Per-product produced and rejected quantities of a month, in the shape of
+    the article_*_summary views (product, total_produced_qty, total_rejection_qty).
+    """
+    where = "WHERE product IS NOT NULL AND product != ''"
+    params = []
+    if year_month:
+        where += " AND substr(date, 1, 7) = ?"
+        params.append(year_month)
+    return query_replica(
+        f'SELECT product, SUM(COALESCE(produced_qty, 0)) AS total_produced_qty, '
+        f'SUM(COALESCE(rejection, 0)) AS total_rejection_qty '
+        f'FROM "{table_name}" {where} GROUP BY product',
+        params
+    )
+
+
+def article_months(table_name: str) -> list[str]:
+    """Distinct YYYY-MM months that have rows, most recent first."""
+    rows = query_replica(
+        f'SELECT DISTINCT substr(date, 1, 7) AS month_key FROM "{table_name}" '
+        f'WHERE date IS NOT NULL ORDER BY month_key DESC'
+    )
+    return [row['month_key'] for row in rows]
+
+
+def dispatch_cube_rows(year: int, columns: list[str]) -> list[dict]:
+    """
+    The year's shipments pre-aggregated to one row per combination of the
+    dimension columns, with total_qty summed.
+
+    Every dispatch cube is a sum of total_qty over a subset defined by these
+    dimensions, so building the cubes from these rows gives the same result
+    as building them from the raw shipments.
+    """
+    dimensions = [column for column in columns if column != 'total_qty']
+    dimension_list = ', '.join(f'"{column}"' for column in dimensions)
+    exclusions = ''.join(' AND shipment_id NOT LIKE ?' for _ in DISPATCH_EXCLUDED_SHIPMENTS)
+    return query_replica(
+        f'SELECT {dimension_list}, SUM(total_qty) AS total_qty FROM tab_shipment_meta '
+        f'WHERE month >= ? AND month < ?{exclusions} GROUP BY {dimension_list} '
+        # Order combinations by their first shipment in (month, shipment_id)
+        # order, the order fetch_dispatch_rows reads the raw rows in; month is
+        # a fixed-width YYYY-MM-DD string, so the concatenation sorts the same
+        f"ORDER BY MIN(month || ' ' || COALESCE(shipment_id, ''))",
+        [f'{year}-01-01', f'{year + 1}-01-01'] + [f'%{value}%' for value in DISPATCH_EXCLUDED_SHIPMENTS]
+    )
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 512))
+
+
+class MemoryCacheBackend:
+    """
+    Thread-safe in-process store with least-recently-used eviction and per-entry expiry.
+
+    Any object with the same get/set/delete/clear methods can be installed with
+    set_cache_backend(), e.g. to share cached results between workers.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (True, value) for a live entry, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, predicate):
+        """Removes every entry whose key matches the predicate."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_backend = MemoryCacheBackend()
+_stats = {}
+_stats_lock = threading.Lock()
+# Maps a table name to the cached functions that read from it
+_dependents = {}
+
+
+def set_cache_backend(backend):
+    """Replaces the cache backend used by all @cached functions."""
+    global _backend
+    _backend = backend
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        stats = _stats.setdefault(name, {'hits': 0, 'misses': 0})
+        stats[outcome] += 1
+
+
+def cached(ttl: float, depends_on=(), fallback=None):
+    """
+    Caches a function's return value per argument set for `ttl` seconds.
+
+    Args:
+        ttl: Time to live of a cached result, in seconds.
+        depends_on: Table names the function reads from; invalidate_table() on
+            any of them drops the function's cached results.
+        fallback: Optional callable whose result is returned when the function
+            raises. The fallback is logged and never cached, so the next call
+            tries the data source again instead of serving it for `ttl` seconds.
+            Without a fallback, exceptions propagate and nothing is cached.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        for table_name in depends_on:
+            _dependents.setdefault(table_name, set()).add(name)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            hit, value = _backend.get(key)
+            if hit:
+                _record(name, 'hits')
+                return value
+            _record(name, 'misses')
+            try:
+                value = func(*args, **kwargs)
+            except Exception as e:
+                if fallback is None:
+                    raise
+                print(f"Error in {func.__name__}: {e}")
+                return fallback()
+            _backend.set(key, value, ttl)
+            return value
+
+        def invalidate_call(*args, **kwargs):
+            """Drops the cached result of one call, identified by the same arguments."""
+            call_key = (name, args, tuple(sorted(kwargs.items())))
+            _backend.delete(lambda key: key == call_key)
+
+        wrapper.invalidate = lambda: invalidate(name)
+        wrapper.invalidate_call = invalidate_call
+        return wrapper
+    return decorator
+
+
+def invalidate(*names):
+    """Drops the cached results of the named functions."""
+    names = set(names)
+    _backend.delete(lambda key: key[0] in names)
+
+
+def invalidate_table(table_name: str):
+    """Drops the cached results of every function that depends on the given table."""
+    names = _dependents.get(table_name)
+    if names:
+        invalidate(*names)
+
+
+def clear_cache():
+    _backend.clear()
+
+
+def cache_stats() -> dict:
+    """Returns hit/miss counts and hit ratio per cached function."""
+    with _stats_lock:
+        return {
+            name: {**stats, 'hit_ratio': round(stats['hits'] / (stats['hits'] + stats['misses']), 4)}
+            for name, stats in _stats.items()
+        }
@@ -0,0 +1,195 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.xlsx_export import write_xlsx
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ARTIFACT_DIR = os.getenv('EXPORT_ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'queryos_exports'))
+EXPORT_ARTIFACT_TTL = int(os.getenv('EXPORT_ARTIFACT_TTL', 900))
+EXPORT_JOB_WORKERS = int(os.getenv('EXPORT_JOB_WORKERS', 2))
+# A queued/running job whose state has not changed for this long is treated as dead
+EXPORT_JOB_STALE_AFTER = int(os.getenv('EXPORT_JOB_STALE_AFTER', 300))
+# Rows written between progress updates
+EXPORT_PROGRESS_INTERVAL = 1000
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Returns this worker process's job pool, creating it on first use."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=EXPORT_JOB_WORKERS, thread_name_prefix='export-job')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def export_job_id(params: dict) -> str:
+    """Jobs are identified by their parameters, so identical requests map to the same job."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def _meta_path(job_id: str) -> str:
+    return os.path.join(EXPORT_ARTIFACT_DIR, f'{job_id}.json')
+
+
+def _save_job(job: dict):
+    """Persists job state next to the artifact so every worker process can serve it."""
+    os.makedirs(EXPORT_ARTIFACT_DIR, exist_ok=True)
+    job['updated_at'] = time.time()
+    tmp_path = f"{_meta_path(job['id'])}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, _meta_path(job['id']))
+
+
+def _remove_job(job: dict):
+    for path in (job.get('artifact'), _meta_path(job['id'])):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _is_expired(job: dict) -> bool:
+    finished_at = job.get('finished_at')
+    return finished_at is not None and time.time() - finished_at > EXPORT_ARTIFACT_TTL
+
+
+def _is_stale(job: dict) -> bool:
+    return job['status'] in ('queued', 'running') and time.time() - job['updated_at'] > EXPORT_JOB_STALE_AFTER
+
+
+def get_export_job(job_id: str):
+    """
+    Returns the job's state, or None if it is unknown or its artifact has expired.
+    A 'progress' percentage is included when the total row count is known.
+    """
+    try:
+        with open(_meta_path(job_id)) as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if _is_expired(job):
+        _remove_job(job)
+        return None
+
+    total_rows = job.get('total_rows')
+    if job['status'] == 'finished':
+        job['progress'] = 100
+    elif total_rows:
+        job['progress'] = min(99, round(job['rows_written'] / total_rows * 100))
+    else:
+        job['progress'] = None
+    return job
+
+
+def purge_expired_export_jobs():
+    """Deletes the state and artifacts of every expired job."""
+    if not os.path.isdir(EXPORT_ARTIFACT_DIR):
+        return
+    for name in os.listdir(EXPORT_ARTIFACT_DIR):
+        if name.endswith('.json'):
+            get_export_job(name[:-len('.json')])
+
+
+def _write_csv(path: str, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        headers = None
+        for row in rows:
+            if headers is None:
+                headers = list(row.keys())
+                writer.writerow(headers)
+            writer.writerow([row.get(key) for key in headers])
+
+
+def _tracked(rows, job: dict):
+    """Passes rows through while recording progress on the job."""
+    for row in rows:
+        yield row
+        job['rows_written'] += 1
+        if job['rows_written'] % EXPORT_PROGRESS_INTERVAL == 0:
+            _save_job(job)
+
+
+def _run_export_job(job: dict, rows_factory, count_rows):
+    job['status'] = 'running'
+    _save_job(job)
+
+    artifact_path = os.path.join(EXPORT_ARTIFACT_DIR, f"{job['id']}.{job['format']}")
+    # A private file per run: a stale job taken over by another worker writes
+    # its own copy, and whichever finishes last replaces the artifact whole
+    part_path = None
+    try:
+        part_fd, part_path = tempfile.mkstemp(dir=EXPORT_ARTIFACT_DIR, prefix=f"{job['id']}.", suffix='.part')
+        os.close(part_fd)
+        if count_rows:
+            job['total_rows'] = count_rows()
+            _save_job(job)
+        rows = _tracked(rows_factory(), job)
+        if job['format'] == 'xlsx':
+            write_xlsx(part_path, [(job['filename'], None, rows)])
+        else:
+            _write_csv(part_path, rows)
+        os.replace(part_path, artifact_path)
+
+        job.update(status='finished', artifact=artifact_path, finished_at=time.time())
+        _save_job(job)
+        logger.info(f"Export job {job['id']} finished with {job['rows_written']} rows.")
+    except Exception as e:
+        logger.error(f"Export job {job['id']} failed: {str(e)}", exc_info=True)
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
+        job.update(status='failed', error=str(e), finished_at=time.time())
+        _save_job(job)
+
+
+def submit_export_job(params: dict, rows_factory, filename: str, export_format: str = 'csv', count_rows=None) -> dict:
+    """
+    Queues an export in the background and returns its job state.
+
+    If a job with identical parameters is still running, or finished within
+    EXPORT_ARTIFACT_TTL, that job is returned instead of starting a new one.
+
+    Args:
+        params: Everything that determines the export's content (table, search, filters).
+        rows_factory: Callable returning an iterable of row dicts; called on the job thread.
+        filename: Download filename without extension.
+        export_format: 'csv' or 'xlsx'.
+        count_rows: Optional callable returning the expected row count, used for
+            progress reporting; called on the job thread.
+    """
+    export_format = 'xlsx' if export_format == 'xlsx' else 'csv'
+    job_id = export_job_id({**params, 'format': export_format})
+
+    with _lock:
+        purge_expired_export_jobs()
+        job = get_export_job(job_id)
+        if job and (job['status'] == 'finished' or (job['status'] in ('queued', 'running') and not _is_stale(job))):
+            return job
+
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'format': export_format,
+            'filename': filename,
+            'params': params,
+            'rows_written': 0,
+            'total_rows': None,
+            'artifact': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+        }
+        _save_job(job)
+        _get_executor().submit(_run_export_job, job, rows_factory, count_rows)
+    return get_export_job(job_id)
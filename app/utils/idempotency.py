@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+from flask import request, session, flash, jsonify, redirect, make_response, url_for
+from app.utils.cache import MemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+# Seconds a create request's response is remembered under its idempotency key
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+# SQLite file holding the keys, shared by every worker process on the host.
+# Set it empty to keep keys in memory, which is only safe with a single worker process.
+IDEMPOTENCY_STORE_PATH = os.getenv('IDEMPOTENCY_STORE_PATH', os.path.join(tempfile.gettempdir(), 'queryos_idempotency.sqlite3'))
+# Most keys remembered by the in-memory store; the least recently used are dropped first
+IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', 10000))
+# A key claimed by a request that never finished is released after this long; keep it
+# above the longest a create request can run (bulk imports, the worker timeout), or a
+# retry arriving while the first request is still writing would run it a second time
+IDEMPOTENCY_PENDING_TTL = int(os.getenv('IDEMPOTENCY_PENDING_TTL', 900))
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_FIELD = 'idempotency_key'
+# Form fields that may differ between two submissions of the same entry
+UNFINGERPRINTED_FIELDS = {IDEMPOTENCY_FIELD, 'csrf_token'}
+
+
+class MemoryIdempotencyStore:
+    """
+    Keeps idempotency keys in this process only.
+
+    Each worker process has its own copy, so a retry routed to another worker
+    is not recognised; use SqliteIdempotencyStore when running several workers.
+    """
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self._entries = MemoryCacheBackend(max_entries=max_keys)
+        self._lock = threading.Lock()
+
+    def claim(self, key, fingerprint: str, ttl: float):
+        """
+        Marks a key as in progress unless it is already known.
+
+        Returns:
+            None if the key was claimed, otherwise the stored (fingerprint, response);
+            response is None while the first request is still running.
+        """
+        with self._lock:
+            found, entry = self._entries.get(key)
+            if found:
+                return entry
+            self._entries.set(key, (fingerprint, None), ttl)
+            return None
+
+    def save(self, key, fingerprint: str, response, ttl: float):
+        """Stores the (status, headers, body) of the request that claimed the key."""
+        self._entries.set(key, (fingerprint, response), ttl)
+
+    def release(self, key):
+        """Forgets a claimed key so the request can be retried."""
+        self._entries.delete(lambda entry: entry == key)
+
+
+class SqliteIdempotencyStore:
+    """
+    Keeps idempotency keys in a SQLite file, shared by every worker process on the host.
+
+    Claims are a single INSERT OR IGNORE, so two workers receiving the same key
+    at once cannot both run the request.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS _idempotency_keys '
+                '(key TEXT PRIMARY KEY, fingerprint TEXT, response TEXT, expires_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS _idempotency_keys_expires_at ON _idempotency_keys (expires_at)')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(key) -> str:
+        return json.dumps(key)
+
+    def claim(self, key, fingerprint: str, ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('DELETE FROM _idempotency_keys WHERE expires_at <= ?', (now,))
+        inserted = conn.execute(
+            'INSERT OR IGNORE INTO _idempotency_keys (key, fingerprint, response, expires_at) VALUES (?, ?, NULL, ?)',
+            (self._key(key), fingerprint, now + ttl)
+        ).rowcount
+        if inserted:
+            return None
+        row = conn.execute(
+            'SELECT fingerprint, response FROM _idempotency_keys WHERE key = ?', (self._key(key),)
+        ).fetchone()
+        if row is None:
+            # Expired and removed in between; treat it as a fresh claim
+            return self.claim(key, fingerprint, ttl)
+        stored_fingerprint, response = row
+        if response is None:
+            return stored_fingerprint, None
+        status, headers, body = json.loads(response)
+        return stored_fingerprint, (status, [tuple(header) for header in headers], bytes.fromhex(body))
+
+    def save(self, key, fingerprint: str, response, ttl: float):
+        status, headers, body = response
+        conn = self._connect()
+        conn.execute(
+            'UPDATE _idempotency_keys SET fingerprint = ?, response = ?, expires_at = ? WHERE key = ?',
+            (fingerprint, json.dumps([status, headers, body.hex()]), time.time() + ttl, self._key(key))
+        )
+
+    def release(self, key):
+        self._connect().execute('DELETE FROM _idempotency_keys WHERE key = ?', (self._key(key),))
+
+
+def _default_store():
+    if IDEMPOTENCY_STORE_PATH:
+        return SqliteIdempotencyStore(IDEMPOTENCY_STORE_PATH)
+    logger.info("IDEMPOTENCY_STORE_PATH is empty; idempotency keys are kept per worker process.")
+    return MemoryIdempotencyStore()
+
+
+_store = _default_store()
+
+
+def set_idempotency_store(store):
+    """Replaces the key store with any object offering claim/save/release."""
+    global _store
+    _store = store
+
+
+def new_idempotency_key() -> str:
+    """A fresh key for a form to submit with its create request."""
+    return str(uuid.uuid4())
+
+
+def _request_key():
+    return request.headers.get(IDEMPOTENCY_HEADER) or request.form.get(IDEMPOTENCY_FIELD) or None
+
+
+def _request_fingerprint() -> str:
+    """Hash of what the request would write: its form fields and uploads, or its raw body."""
+    digest = hashlib.sha256()
+    digest.update(repr(sorted((request.view_args or {}).items())).encode())
+    if request.form or request.files:
+        for name, value in sorted(request.form.items(multi=True)):
+            if name not in UNFINGERPRINTED_FIELDS:
+                digest.update(repr((name, value)).encode())
+        for name, upload in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(repr((name, upload.filename)).encode())
+            digest.update(upload.stream.read())
+            upload.stream.seek(0)
+    else:
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _wants_json() -> bool:
+    return request.is_json or request.accept_mimetypes.best == 'application/json'
+
+
+def _error_flash_count() -> int:
+    return sum(1 for category, _ in session.get('_flashes', []) if category == 'error')
+
+
+def _reject(message: str, status: int):
+    if _wants_json():
+        return jsonify({'message': message}), status
+    flash(message, 'info' if status == 409 else 'error')
+    return redirect(request.referrer or url_for('main.dashboard'))
+
+
+def _replay(saved):
+    status, headers, body = saved
+    response = make_response(body, status)
+    response.headers.clear()
+    response.headers.extend(headers)
+    response.headers['Idempotent-Replayed'] = 'true'
+    if not _wants_json():
+        flash('This entry was already saved.', 'info')
+    return response
+
+
+def idempotent(view):
+    """
+    Makes a create endpoint safe to retry.
+
+    Requests carrying an Idempotency-Key header (or idempotency_key form field)
+    are remembered per endpoint: a retry with the same key gets the first
+    response back without writing again, and a retry while the first request
+    is still running gets a 409. Each key is bound to a fingerprint of the
+    request's data; reusing it for different data gets a 422. Only successful
+    responses are remembered, i.e. a status below 400 with no error flashed,
+    so failed requests can be retried. Requests without a key behave as before.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _request_key()
+        if not key:
+            return view(*args, **kwargs)
+
+        store_key = ('idempotency', request.endpoint, key)
+        fingerprint = _request_fingerprint()
+        existing = _store.claim(store_key, fingerprint, IDEMPOTENCY_PENDING_TTL)
+        if existing is not None:
+            saved_fingerprint, saved = existing
+            if saved_fingerprint != fingerprint:
+                return _reject('This idempotency key was already used for different data.', 422)
+            if saved is None:
+                return _reject('This entry is still being saved.', 409)
+            return _replay(saved)
+
+        errors_before = _error_flash_count()
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _store.release(store_key)
+            raise
+
+        if response.status_code < 400 and _error_flash_count() == errors_before:
+            # Session cookies are per client and must not be replayed
+            headers = [(name, value) for name, value in response.headers.items() if name.lower() != 'set-cookie']
+            _store.save(store_key, fingerprint, (response.status_code, headers, response.get_data()), IDEMPOTENCY_TTL)
+        else:
+            _store.release(store_key)
+        return response
+    return wrapper
@@ -0,0 +1,44 @@
+import os
+
+# Most rows PostgREST returns for one request (its max-rows setting, 1000 by
+# default on Supabase); longer results are cut short without an error
+POSTGREST_MAX_ROWS = int(os.getenv('POSTGREST_MAX_ROWS', 1000))
+# Rows fetched per round-trip; a page shorter than this is taken as the last
+# one, so it must not exceed max-rows
+KEYSET_PAGE_SIZE = POSTGREST_MAX_ROWS
+
+
+def or_value(value) -> str:
+    """Quotes a value for use inside a PostgREST or=(...) filter."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def keyset_pages(build_query, key_columns: list[str], page_size: int = KEYSET_PAGE_SIZE):
+    """
+    Yields the rows of `build_query()` in chunks ordered by `key_columns`.
+
+    `key_columns` must identify a row, e.g. the primary key, or (timestamp,
+    primary key), and must not be NULL. Each chunk is a fresh query from
+    `build_query` restricted to rows after the last key seen. Rows inserted
+    or edited while paging therefore cannot shift a page boundary and be
+    skipped or read twice, and no chunk rescans the ones before it the way a
+    deep OFFSET does.
+    """
+    last_row = None
+    while True:
+        query = build_query()
+        if last_row is not None:
+            if len(key_columns) == 1:
+                query = query.gt(key_columns[0], last_row[key_columns[0]])
+            else:
+                first, second = key_columns
+                first_value, second_value = or_value(last_row[first]), or_value(last_row[second])
+                query = query.or_(f'{first}.gt.{first_value},and({first}.eq.{first_value},{second}.gt.{second_value})')
+        for column in key_columns:
+            query = query.order(column)
+        rows = query.limit(page_size).execute().data
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_row = rows[-1]
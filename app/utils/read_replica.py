@@ -0,0 +1,561 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from app.utils.supabase_client import get_supabase_client
+from app.utils.paging import keyset_pages
+
+logger = logging.getLogger(__name__)
+
+# Path of the local SQLite replica; reads are only routed to it when this is set
+READ_REPLICA_PATH = os.getenv('READ_REPLICA_PATH', '')
+# Seconds between incremental syncs, and between full re-syncs that pick up
+# deletes and edits which do not move a row's timestamp
+READ_REPLICA_SYNC_INTERVAL = int(os.getenv('READ_REPLICA_SYNC_INTERVAL', 30))
+READ_REPLICA_FULL_SYNC_INTERVAL = int(os.getenv('READ_REPLICA_FULL_SYNC_INTERVAL', 900))
+# Rows fetched per round-trip while syncing
+REPLICA_SYNC_CHUNK_SIZE = 1000
+
+# Mirrored table -> (primary key, timestamp column for incremental sync).
+# Tables without both are only refreshed by full re-syncs. The timestamp must
+# move on every write: the sales order tables use the updated_at column
+# maintained by sql/replica_updated_at.sql, and until it exists they are only
+# refreshed by full re-syncs and the app's own writes.
+REPLICA_TABLES = {
+    "tab_cutting": ("id", "input_timestamp"),
+    "tab_production": ("id", "input_timestamp"),
+    "tab_inprod": ("id", None),
+    "tab_sales_order": ("po_no", "updated_at"),
+    "tab_sales_order_items": ("id", "updated_at"),
+    "tab_shipment_meta": (None, None),
+}
+# Order used to page through tables that have no primary key configured
+REPLICA_FULL_SYNC_ORDER = {
+    "tab_shipment_meta": ["month", "shipment_id"],
+}
+
+_local = threading.local()
+
+
+def replica_enabled() -> bool:
+    return bool(READ_REPLICA_PATH)
+
+
+def _connect() -> sqlite3.Connection:
+    """Returns this thread's connection to the replica file."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid():
+        os.makedirs(os.path.dirname(os.path.abspath(READ_REPLICA_PATH)), exist_ok=True)
+        conn = sqlite3.connect(READ_REPLICA_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS _replica_state '
+            '(table_name TEXT PRIMARY KEY, watermark TEXT, last_sync REAL, last_full_sync REAL)'
+        )
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_columns(conn, table_name: str) -> list[str]:
+    return [row['name'] for row in conn.execute(f'PRAGMA table_info({_quote(table_name)})')]
+
+
+def _to_sqlite(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+@contextmanager
+def _transaction(conn):
+    """Connections run in autocommit mode; this groups statements into one transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def _get_state(conn, table_name: str):
+    return conn.execute('SELECT * FROM _replica_state WHERE table_name = ?', (table_name,)).fetchone()
+
+
+def serves_table(table_name: str) -> bool:
+    """True once the replica is enabled and holds a completed full copy of the table."""
+    if not replica_enabled() or table_name not in REPLICA_TABLES:
+        return False
+    try:
+        state = _get_state(_connect(), table_name)
+    except sqlite3.Error as e:
+        logger.error(f"Error reading read replica state for {table_name}: {str(e)}")
+        return False
+    return state is not None and state['last_full_sync'] is not None
+
+
+# --- Writes --------------------------------------------------------------
+
+def _ensure_columns(conn, table_name: str, columns):
+    existing = set(_table_columns(conn, table_name))
+    for column in columns:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {_quote(table_name)} ADD COLUMN {_quote(column)}')
+
+
+def _insert_rows(conn, table_name: str, rows: list[dict], replace: bool):
+    if not rows:
+        return
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    _ensure_columns(conn, table_name, columns)
+    placeholders = ','.join('?' * len(columns))
+    verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+    conn.executemany(
+        f'{verb} INTO {_quote(table_name)} ({",".join(_quote(c) for c in columns)}) VALUES ({placeholders})',
+        [[_to_sqlite(row.get(column)) for column in columns] for row in rows]
+    )
+
+
+def _create_table(conn, name: str, columns: list[str], primary_key=None):
+    columns = columns or [primary_key or 'id']
+    conn.execute(f'CREATE TABLE {_quote(name)} ({",".join(_quote(c) for c in columns)})')
+
+
+def _create_indexes(conn, table_name: str):
+    primary_key, timestamp_column = REPLICA_TABLES[table_name]
+    if primary_key:
+        _ensure_columns(conn, table_name, [primary_key])
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {_quote(table_name + "__pk")} ON {_quote(table_name)} ({_quote(primary_key)})')
+    if timestamp_column:
+        _ensure_columns(conn, table_name, [timestamp_column])
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {_quote(table_name + "__ts")} ON {_quote(table_name)} ({_quote(timestamp_column)})')
+
+
+def replicate_upsert(table_name: str, rows: list[dict]):
+    """Applies rows just written upstream to the replica, so the app reads its own writes."""
+    if not rows or not serves_table(table_name) or not REPLICA_TABLES[table_name][0]:
+        return
+    try:
+        conn = _connect()
+        with _transaction(conn):
+            _insert_rows(conn, table_name, rows, replace=True)
+    except sqlite3.Error as e:
+        logger.error(f"Error applying write to read replica table {table_name}: {str(e)}")
+
+
+def replicate_delete(table_name: str, column: str, values: list):
+    """Removes rows just deleted upstream from the replica."""
+    if not values or not serves_table(table_name):
+        return
+    try:
+        conn = _connect()
+        if column not in _table_columns(conn, table_name):
+            return
+        with _transaction(conn):
+            conn.execute(
+                f'DELETE FROM {_quote(table_name)} WHERE {_quote(column)} IN ({",".join("?" * len(values))})',
+                list(values)
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Error applying delete to read replica table {table_name}: {str(e)}")
+
+
+# --- Sync ----------------------------------------------------------------
+
+def _fetch_chunks(table_name: str, key_columns: list[str], since=None, timestamp_column=None):
+    """
+    Yields upstream rows in chunks ordered by `key_columns` (the primary key,
+    or (timestamp, primary key)), optionally only those whose timestamp is at
+    or after `since`. Pages are read by keyset, see keyset_pages().
+    """
+    supabase = get_supabase_client()
+
+    def build_query():
+        query = supabase.table(table_name).select('*')
+        return query.gte(timestamp_column, since) if since is not None else query
+
+    return keyset_pages(build_query, key_columns, REPLICA_SYNC_CHUNK_SIZE)
+
+
+def _fetch_chunks_by_offset(table_name: str, order_columns: list[str]):
+    """Yields upstream rows of a table without a primary key, paged by offset."""
+    supabase = get_supabase_client()
+    offset = 0
+    while True:
+        query = supabase.table(table_name).select('*')
+        for column in order_columns:
+            query = query.order(column)
+        rows = query.range(offset, offset + REPLICA_SYNC_CHUNK_SIZE - 1).execute().data
+        if rows:
+            yield rows
+        if len(rows) < REPLICA_SYNC_CHUNK_SIZE:
+            return
+        offset += REPLICA_SYNC_CHUNK_SIZE
+
+
+def _max_timestamp(rows: list[dict], timestamp_column, current):
+    values = [row[timestamp_column] for row in rows if row.get(timestamp_column)]
+    return max(values + ([current] if current else [])) if values else current
+
+
+def full_sync_table(table_name: str):
+    """Copies the whole table into a staging table and swaps it in atomically."""
+    primary_key, timestamp_column = REPLICA_TABLES[table_name]
+    conn = _connect()
+    staging = f'{table_name}__staging'
+    if primary_key:
+        chunks = _fetch_chunks(table_name, [primary_key])
+    else:
+        chunks = _fetch_chunks_by_offset(table_name, REPLICA_FULL_SYNC_ORDER[table_name])
+    started_at = time.time()
+
+    conn.execute(f'DROP TABLE IF EXISTS {_quote(staging)}')
+    watermark = None
+    created = False
+    row_count = 0
+    for rows in chunks:
+        with _transaction(conn):
+            if not created:
+                _create_table(conn, staging, list(rows[0].keys()), primary_key)
+                created = True
+            _insert_rows(conn, staging, rows, replace=False)
+        if timestamp_column:
+            watermark = _max_timestamp(rows, timestamp_column, watermark)
+        row_count += len(rows)
+
+    with _transaction(conn):
+        if not created:
+            _create_table(conn, staging, _table_columns(conn, table_name), primary_key)
+        conn.execute(f'DROP TABLE IF EXISTS {_quote(table_name)}')
+        conn.execute(f'ALTER TABLE {_quote(staging)} RENAME TO {_quote(table_name)}')
+        _create_indexes(conn, table_name)
+        conn.execute(
+            'INSERT OR REPLACE INTO _replica_state (table_name, watermark, last_sync, last_full_sync) VALUES (?, ?, ?, ?)',
+            (table_name, watermark, started_at, started_at)
+        )
+    logger.info(f"Read replica: full sync of {table_name} copied {row_count} rows.")
+
+
+def incremental_sync_table(table_name: str):
+    """Upserts rows whose timestamp is at or after the last one seen."""
+    primary_key, timestamp_column = REPLICA_TABLES[table_name]
+    conn = _connect()
+    state = _get_state(conn, table_name)
+    watermark = state['watermark']
+    started_at = time.time()
+
+    # gte, not gt: rows sharing the watermark may have arrived since; the
+    # primary key makes re-applying them harmless
+    for rows in _fetch_chunks(table_name, [timestamp_column, primary_key], since=watermark, timestamp_column=timestamp_column):
+        with _transaction(conn):
+            _insert_rows(conn, table_name, rows, replace=True)
+        watermark = _max_timestamp(rows, timestamp_column, watermark)
+
+    with _transaction(conn):
+        conn.execute(
+            'UPDATE _replica_state SET watermark = ?, last_sync = ? WHERE table_name = ?',
+            (watermark, started_at, table_name)
+        )
+
+
+def sync_replica():
+    """Brings every mirrored table up to date, doing a full sync where one is due."""
+    conn = _connect()
+    for table_name, (primary_key, timestamp_column) in REPLICA_TABLES.items():
+        try:
+            state = _get_state(conn, table_name)
+            full_sync_due = (
+                state is None or state['last_full_sync'] is None
+                or time.time() - state['last_full_sync'] > READ_REPLICA_FULL_SYNC_INTERVAL
+            )
+            if full_sync_due:
+                full_sync_table(table_name)
+            elif primary_key and timestamp_column and state['watermark'] is not None:
+                # No watermark means the timestamp column is empty or missing
+                # upstream; the table then waits for its next full sync
+                incremental_sync_table(table_name)
+        except Exception as e:
+            logger.error(f"Error syncing read replica table {table_name}: {str(e)}", exc_info=True)
+
+
+_sync_thread = None
+_sync_thread_pid = None
+_sync_thread_lock = threading.Lock()
+
+
+def _sync_loop():
+    # Several worker processes may share the replica file; only the one
+    # holding the lock file syncs, the others just read
+    lock_file = open(f'{READ_REPLICA_PATH}.lock', 'w')
+    holding_lock = False
+    while True:
+        if not holding_lock:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                holding_lock = True
+            except OSError:
+                pass
+        if holding_lock:
+            sync_replica()
+        time.sleep(READ_REPLICA_SYNC_INTERVAL)
+
+
+def start_replica_sync():
+    """Starts the background sync worker of this process when a replica path is configured."""
+    global _sync_thread, _sync_thread_pid
+    if not replica_enabled():
+        return
+    with _sync_thread_lock:
+        if _sync_thread is not None and _sync_thread_pid == os.getpid():
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(READ_REPLICA_PATH)), exist_ok=True)
+        _sync_thread = threading.Thread(target=_sync_loop, name='replica-sync', daemon=True)
+        _sync_thread_pid = os.getpid()
+        _sync_thread.start()
+
+
+# --- Reads ---------------------------------------------------------------
+
+def query_replica(sql: str, params=()) -> list[dict]:
+    """Runs a read-only SQL statement against the replica and returns the rows as dicts."""
+    return [dict(row) for row in _connect().execute(sql, params)]
+
+
+class ReplicaResponse:
+    """Mirrors the data/count attributes of a PostgREST APIResponse."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# PostgREST operator -> SQL comparison
+_COMPARISONS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+def _like_pattern(pattern: str) -> str:
+    # PostgREST accepts * as the wildcard in URL filters
+    return pattern.replace('*', '%')
+
+
+def _split_top_level(text: str) -> list[str]:
+    """Splits a PostgREST logic tree on commas outside parentheses and quotes."""
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for char in text:
+        if escaped:
+            escaped = False
+        elif quoted and char == '\\':
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and depth == 0 and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [part for part in parts if part]
+
+
+def _unquote(value: str) -> str:
+    """Reverses paging.or_value()'s quoting; unquoted values are returned as-is."""
+    if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+        return re.sub(r'\\(.)', r'\1', value[1:-1], flags=re.S)
+    return value
+
+
+_NUMBER = re.compile(r'^-?\d+(\.\d+)?$')
+_LOGIC_GROUP = re.compile(r'^(not\.)?(and|or)\((.*)\)$', re.S)
+
+
+class ReplicaQuery:
+    """
+    Read-only query builder over a replica table.
+
+    Implements the subset of the postgrest request builder used by the
+    listing, search, export and report reads (select with count, eq/neq/gt/
+    gte/lt/lte, ilike, is_, in_, not_, or_, order, range, limit), so those
+    reads work unchanged against the replica.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self._conn = _connect()
+        self._known_columns = set(_table_columns(self._conn, table_name))
+        self._columns = '*'
+        self._count = None
+        self._head = False
+        self._where = []
+        self._params = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+        self._negate = False
+
+    # Columns the replica has never seen read as NULL instead of failing
+    def _column(self, name: str) -> str:
+        return _quote(name) if name in self._known_columns else 'NULL'
+
+    def _condition(self, field: str, operator: str, value, params: list) -> str:
+        column = self._column(field)
+        if operator in _COMPARISONS:
+            comparison = _COMPARISONS[operator]
+            if not (isinstance(value, str) and _NUMBER.match(value)):
+                params.append(value)
+                return f'{column} {comparison} ?'
+            # Columns are untyped, so a numeric-looking string is compared the
+            # way Postgres would for the column's type
+            params.extend([value, value])
+            return (
+                f"(CASE WHEN typeof({column}) IN ('integer', 'real') THEN {column} {comparison} CAST(? AS NUMERIC) "
+                f"ELSE {column} {comparison} CAST(? AS TEXT) END)"
+            )
+        if operator == 'ilike':
+            params.append(_like_pattern(str(value)))
+            # SQLite LIKE is case-insensitive for ASCII
+            return f'{column} LIKE ?'
+        if operator == 'is':
+            value = None if value in (None, 'null') else value
+            if value is None:
+                return f'{column} IS NULL'
+            params.append(1 if str(value).lower() == 'true' else 0)
+            return f'{column} IS ?'
+        if operator == 'in':
+            values = list(value)
+            params.extend(values)
+            return f'{column} IN ({",".join("?" * len(values))})' if values else '0'
+        raise ValueError(f"Unsupported operator for read replica: {operator}")
+
+    def _filter(self, field: str, operator: str, value):
+        params = []
+        condition = self._condition(field, operator, value, params)
+        if self._negate:
+            condition = f'NOT ({condition})'
+            self._negate = False
+        self._where.append(condition)
+        self._params.extend(params)
+        return self
+
+    def _parse_logic_tree(self, expression: str, joiner: str, params: list) -> str:
+        conditions = []
+        for part in _split_top_level(expression):
+            group = _LOGIC_GROUP.match(part)
+            if group:
+                inner = self._parse_logic_tree(group.group(3), ' AND ' if group.group(2) == 'and' else ' OR ', params)
+                conditions.append(f'NOT ({inner})' if group.group(1) else f'({inner})')
+                continue
+            field, rest = part.split('.', 1)
+            negated = rest.startswith('not.')
+            if negated:
+                rest = rest[len('not.'):]
+            operator, value = rest.split('.', 1)
+            if operator == 'in':
+                value = [_unquote(item) for item in _split_top_level(value[1:-1])]
+            else:
+                value = _unquote(value)
+            condition = self._condition(field, operator, value, params)
+            conditions.append(f'NOT ({condition})' if negated else condition)
+        return joiner.join(conditions)
+
+    def select(self, *columns, count=None, head=False):
+        names = [name.strip() for column in columns for name in column.split(',') if name.strip()]
+        self._columns = '*' if not names or '*' in names else names
+        self._count = count
+        self._head = head
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._filter(column, 'lte', value)
+
+    def ilike(self, column, pattern):
+        return self._filter(column, 'ilike', pattern)
+
+    def is_(self, column, value):
+        return self._filter(column, 'is', value)
+
+    def in_(self, column, values):
+        return self._filter(column, 'in', values)
+
+    def or_(self, filters: str):
+        params = []
+        condition = f'({self._parse_logic_tree(filters, " OR ", params)})'
+        if self._negate:
+            condition = f'NOT {condition}'
+            self._negate = False
+        self._where.append(condition)
+        self._params.extend(params)
+        return self
+
+    def order(self, column, desc=False, nullsfirst=None):
+        if nullsfirst is None:
+            # Postgres puts NULLs first in descending order and last in ascending order
+            nullsfirst = desc
+        self._order.append(f'{self._column(column)} {"DESC" if desc else "ASC"} NULLS {"FIRST" if nullsfirst else "LAST"}')
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def range(self, start, end):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def execute(self) -> ReplicaResponse:
+        table = _quote(self.table_name)
+        where = f' WHERE {" AND ".join(self._where)}' if self._where else ''
+
+        count = None
+        if self._count:
+            count = self._conn.execute(f'SELECT COUNT(*) FROM {table}{where}', self._params).fetchone()[0]
+        if self._head:
+            return ReplicaResponse([], count)
+
+        if self._columns == '*':
+            select_columns = '*'
+        else:
+            select_columns = ','.join(f'{self._column(name)} AS {_quote(name)}' for name in self._columns)
+        sql = f'SELECT {select_columns} FROM {table}{where}'
+        if self._order:
+            sql += f' ORDER BY {", ".join(self._order)}'
+        if self._limit is not None or self._offset is not None:
+            sql += f' LIMIT {int(self._limit) if self._limit is not None else -1} OFFSET {int(self._offset or 0)}'
+
+        rows = [dict(row) for row in self._conn.execute(sql, self._params)]
+        return ReplicaResponse(rows, count)
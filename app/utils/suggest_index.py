@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from itertools import islice
+from sortedcontainers import SortedDict
+from app.models.data_models import read_table
+from app.utils.paging import keyset_pages
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_REFRESH_INTERVAL = int(os.getenv('SUGGEST_REFRESH_INTERVAL', 60))
+# Seconds between full rebuilds, which drop values no longer in the tables and
+# reload the tables that have no timestamp column
+SUGGEST_REBUILD_INTERVAL = int(os.getenv('SUGGEST_REBUILD_INTERVAL', 3600))
+SUGGEST_INDEX_ENABLED = os.getenv('SUGGEST_INDEX_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Table -> (key columns identifying a row, timestamp column used for
+# incremental refresh, indexed columns). Loads page by keyset on the key, and
+# incremental refreshes on (timestamp, key). Tables without a timestamp column
+# are only reloaded by full rebuilds.
+SUGGEST_SOURCES = {
+    "tab_cutting": (["id"], "input_timestamp", ["po_no", "sku", "product", "design"]),
+    "tab_production": (["id"], "input_timestamp", ["po_no", "sku", "product", "design"]),
+    "tab_sales_order": (["po_no"], "created_at", ["po_no"]),
+    "tab_sales_order_items": (["id"], "created_at", ["sku", "product", "design"]),
+    "tab_shipment_meta": (["month", "shipment_id"], None, ["shipment_id"]),
+}
+SUGGEST_FIELDS = ["po_no", "sku", "product", "design", "shipment_id"]
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index of distinct values per field.
+
+    Each field keeps a SortedDict keyed by the lower-cased value, so a prefix
+    lookup is a range scan over a sorted structure and costs O(log n + k).
+    Rows are read through read_table(), so with the read replica enabled the
+    loads hit the local replica file instead of Supabase.
+    """
+
+    def __init__(self):
+        self._values = self._empty_values()
+        # Highest timestamp seen per table, for incremental refresh
+        self._watermarks = {}
+        self._built_at = None
+        self._lock = threading.Lock()
+        self.ready = False
+
+    @staticmethod
+    def _empty_values() -> dict:
+        return {field: SortedDict() for field in SUGGEST_FIELDS}
+
+    @staticmethod
+    def _add_value(values: dict, field: str, value):
+        if value is None or field not in values:
+            return
+        value = str(value).strip()
+        if value:
+            values[field].setdefault(value.lower(), value)
+
+    def add(self, field: str, value):
+        with self._lock:
+            self._add_value(self._values, field, value)
+
+    def suggest(self, prefix: str, fields: list[str] = None, limit: int = 10) -> list[dict]:
+        """Returns up to `limit` {"field", "value"} matches starting with `prefix`, case-insensitively."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        matches = []
+        with self._lock:
+            for field in fields or SUGGEST_FIELDS:
+                values = self._values.get(field)
+                if values is None:
+                    continue
+                keys = values.irange(minimum=prefix, maximum=prefix + '\uffff')
+                matches.extend({"field": field, "value": values[key]} for key in islice(keys, limit - len(matches)))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def _load_table(self, table_name: str, key_columns: list[str], timestamp_column, columns: list[str], add, since=None):
+        """Passes every row (or those with a timestamp at or after `since`) to add(); returns the highest timestamp seen."""
+        select_columns = list(dict.fromkeys(columns + key_columns + ([timestamp_column] if timestamp_column else [])))
+        watermark = since
+
+        def build_query():
+            query = read_table(table_name).select(",".join(select_columns))
+            # gte, not gt: rows sharing the watermark may have arrived since
+            return query.gte(timestamp_column, since) if since else query
+
+        page_keys = [timestamp_column] + key_columns if since else key_columns
+        for rows in keyset_pages(build_query, page_keys):
+            for row in rows:
+                for column in columns:
+                    add(column, row.get(column))
+                if timestamp_column and row.get(timestamp_column):
+                    watermark = max(watermark or '', row[timestamp_column])
+        return watermark
+
+    def rebuild(self) -> bool:
+        """
+        Reloads every table into a new index and swaps it in, so values that
+        were edited away or deleted disappear. The current index keeps serving
+        until the new one is complete; if any table fails, it is kept as is.
+        """
+        values = self._empty_values()
+        watermarks = {}
+        for table_name, (key_columns, timestamp_column, columns) in SUGGEST_SOURCES.items():
+            try:
+                watermarks[table_name] = self._load_table(
+                    table_name, key_columns, timestamp_column, columns,
+                    lambda field, value: self._add_value(values, field, value)
+                )
+            except Exception as e:
+                logger.error(f"Error rebuilding suggest index from {table_name}: {str(e)}", exc_info=True)
+                return False
+        with self._lock:
+            self._values = values
+            self._watermarks = watermarks
+        self._built_at = time.monotonic()
+        self.ready = True
+        return True
+
+    def refresh(self):
+        """Rebuilds the index when a rebuild is due, otherwise loads the rows added since the last refresh."""
+        if self._built_at is None or time.monotonic() - self._built_at >= SUGGEST_REBUILD_INTERVAL:
+            if self.rebuild() or self._built_at is None:
+                return
+        for table_name, (key_columns, timestamp_column, columns) in SUGGEST_SOURCES.items():
+            if not timestamp_column:
+                continue
+            try:
+                self._watermarks[table_name] = self._load_table(
+                    table_name, key_columns, timestamp_column, columns, self.add, since=self._watermarks.get(table_name)
+                )
+            except Exception as e:
+                logger.error(f"Error refreshing suggest index from {table_name}: {str(e)}", exc_info=True)
+
+
+suggest_index = SuggestIndex()
+_refresher = None
+_refresher_pid = None
+_refresher_lock = threading.Lock()
+
+
+def _refresh_loop(stop_event: threading.Event):
+    while True:
+        suggest_index.refresh()
+        if stop_event.wait(SUGGEST_REFRESH_INTERVAL):
+            return
+
+
+def start_suggest_index():
+    """Builds the index in a background thread of this worker and keeps it refreshed."""
+    global _refresher, _refresher_pid
+    if not SUGGEST_INDEX_ENABLED:
+        return
+    with _refresher_lock:
+        if _refresher is not None and _refresher_pid == os.getpid():
+            return
+        _refresher = threading.Thread(target=_refresh_loop, args=(threading.Event(),), name='suggest-index', daemon=True)
+        _refresher_pid = os.getpid()
+        _refresher.start()
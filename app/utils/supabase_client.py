@@ -1,5 +1,8 @@
 import os
-from supabase import create_client, Client
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
+from postgrest.utils import SyncClient
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,7 +10,55 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
-def get_supabase_client() -> Client:
+# HTTP transport settings for the shared client
+SUPABASE_HTTP2 = os.getenv('SUPABASE_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 30))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', 5))
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv('SUPABASE_POOL_MAX_CONNECTIONS', 20))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv('SUPABASE_POOL_MAX_KEEPALIVE', 10))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', 60))
+
+_client: Client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def _build_http_session(postgrest_client) -> SyncClient:
+    """Creates the keep-alive HTTP session used for PostgREST requests."""
+    return SyncClient(
+        base_url=postgrest_client.session.base_url,
+        headers=postgrest_client.session.headers,
+        timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+        http2=SUPABASE_HTTP2,
+        follow_redirects=True,
+    )
+
+def create_supabase_client() -> Client:
+    """Creates a new Supabase client whose PostgREST session uses the configured connection pool."""
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError('Missing SUPABASE_URL or SUPABASE_KEY in environment variables')
-    return create_client(SUPABASE_URL, SUPABASE_KEY) 
\ No newline at end of file
+    client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
+    default_session = client.postgrest.session
+    client.postgrest.session = _build_http_session(client.postgrest)
+    default_session.close()
+    return client
+
+def get_supabase_client() -> Client:
+    """
+    Returns the Supabase client shared by this worker process.
+    The client is created on first use and reused afterwards, so requests share
+    pooled keep-alive (HTTP/2 by default) connections instead of paying for a new
+    client and TLS handshake on every call. A forked worker builds its own client.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = create_supabase_client()
+                _client_pid = pid
+    return _client
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import xlsxwriter
+from flask import Response
+
+# Bytes read from the finished workbook per chunk sent to the client
+XLSX_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _cell_value(value):
+    """XlsxWriter handles scalars natively; anything else is written as text."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def write_xlsx(path: str, sheets):
+    """
+    Writes a workbook in XlsxWriter's constant_memory mode.
+
+    Strings are always written as text: a value starting with '=' or looking
+    like a URL is not turned into a formula or hyperlink.
+
+    Args:
+        path: Destination file path.
+        sheets: Iterable of (sheet_name, headers, rows) where rows is an iterable
+            of dicts. If headers is None, the first row's keys are used. Rows are
+            written as they are consumed, so only one row is held at a time.
+    """
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    try:
+        header_format = workbook.add_format({'bold': True})
+        for sheet_name, headers, rows in sheets:
+            worksheet = workbook.add_worksheet(sheet_name[:31])
+            row_index = 1
+            for row in rows:
+                if headers is None:
+                    headers = list(row.keys())
+                if row_index == 1:
+                    worksheet.write_row(0, 0, headers, header_format)
+                worksheet.write_row(row_index, 0, [_cell_value(row.get(key)) for key in headers])
+                row_index += 1
+            if row_index == 1 and headers:
+                worksheet.write_row(0, 0, headers, header_format)
+    finally:
+        workbook.close()
+
+
+def _stream_file(path: str):
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(XLSX_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def xlsx_response(sheets, filename: str) -> Response:
+    """
+    Builds the workbook in a temporary file and streams it to the client.
+    The temporary file is removed once the download finishes.
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        write_xlsx(path, sheets)
+    except Exception:
+        os.remove(path)
+        raise
+
+    output = Response(_stream_file(path), mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    output.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    output.headers["Content-Length"] = str(os.path.getsize(path))
+    return output
@@ -1,16 +1,191 @@
+import csv
+import hashlib
+import io
+import json
 import logging
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+import os
+import uuid
+import weakref
+from collections import namedtuple
+from functools import lru_cache
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, Response, stream_with_context
 from datetime import datetime
-from database import get_db_connection
+from database import get_db_connection, release_db_connection, db_connection, stream_query, copy_rows
 
 cutting_bp = Blueprint('cutting', __name__, url_prefix='/cutting')
 
 logger = logging.getLogger(__name__)
 
+# Columns of the cutting table, in the order used for exports and bulk loads
+CUTTING_COLUMNS = [
+    'id', 'input_timestamp', 'date', 'po_no', 'sku', 'product',
+    'line', 'design', 'size', 'pcs_pack', 'sets',
+    'produced_qty', 'unpair_pcs', 'rejection'
+]
+
+# Filter fields compared as numbers; all others are compared case-insensitively as text
+NUMERIC_FIELDS = {'pcs_pack', 'sets', 'produced_qty', 'rejection'}
+SEARCH_FIELDS = ['po_no', 'sku', 'product']
+# Operator -> SQL for numeric fields and for text fields; None means the operator takes no value
+FILTER_OPERATORS = {
+    'equal': ('{field} = {value}', '{field} ILIKE {value}'),
+    'not_equal': ('{field} != {value}', '{field} NOT ILIKE {value}'),
+    'like': ('{field} ILIKE {value}', '{field} ILIKE {value}'),
+    'not_like': ('{field} NOT ILIKE {value}', '{field} NOT ILIKE {value}'),
+    'is_set': ('{field} IS NOT NULL', None),
+    'not_set': ('{field} IS NULL', None),
+    'gt': ('{field} > {value}', '{field} > {value}'),
+    'lt': ('{field} < {value}', '{field} < {value}'),
+}
+VALUELESS_OPERATORS = {'is_set', 'not_set'}
+CONTAINS_OPERATORS = {'like', 'not_like'}
+
+# Count strategy for the listing total as (plain listing, listing with search/filters):
+# 'exact' (count(*) OVER() on the page query), 'planned' (the planner's row
+# estimate) or 'capped' (counts at most CUTTING_COUNT_CAP rows past the page).
+# CUTTING_COUNT_MODES takes 'plain,filtered', or one mode for both.
+COUNT_MODE_CHOICES = ('exact', 'planned', 'capped')
+
+def parse_count_modes(value: str) -> tuple:
+    """Reads a CUTTING_COUNT_MODES value into a (plain listing, filtered listing) pair."""
+    modes = tuple(mode.strip().lower() for mode in value.split(',') if mode.strip())
+    if len(modes) == 1:
+        modes = modes * 2
+    if len(modes) != 2 or any(mode not in COUNT_MODE_CHOICES for mode in modes):
+        raise ValueError(f"CUTTING_COUNT_MODES must be one or two of {', '.join(COUNT_MODE_CHOICES)}, got '{value}'")
+    return modes
+
+CUTTING_COUNT_MODES = parse_count_modes(os.getenv('CUTTING_COUNT_MODES') or 'planned,capped')
+CUTTING_COUNT_CAP = int(os.getenv('CUTTING_COUNT_CAP', 1000))
+
+Statement = namedtuple('Statement', ['name', 'sql'])
+# `count` is None when the page statement carries the total itself
+CompiledQuery = namedtuple('CompiledQuery', ['page', 'count', 'count_mode'])
+# Statements already prepared on each pooled connection
+_prepared = weakref.WeakKeyDictionary()
+
+def parse_filters(args) -> list[tuple]:
+    """
+    Reads filter_field_N/filter_operator_N/filter_value_N args into (field, operator, value) tuples.
+    Fields outside CUTTING_COLUMNS and unknown operators are skipped.
+    """
+    filters = []
+    filter_index = 0
+    while True:
+        field = args.get(f'filter_field_{filter_index}')
+        operator = args.get(f'filter_operator_{filter_index}')
+        if not field or not operator:
+            return filters
+        if field in CUTTING_COLUMNS and operator in FILTER_OPERATORS:
+            filters.append((field, operator, args.get(f'filter_value_{filter_index}')))
+        else:
+            logger.warning(f"Ignoring cutting filter {field!r} {operator!r}")
+        filter_index += 1
+
+def _statement(sql: str) -> Statement:
+    return Statement('cutting_' + hashlib.sha1(sql.encode()).hexdigest()[:16], sql)
+
+@lru_cache(maxsize=256)
+def compile_query(search_term_count: int, filter_shape: tuple, count_mode: str = 'exact') -> CompiledQuery:
+    """
+    Compiles a listing query for a filter shape into parameterized SQL.
+
+    The shape is the number of search terms and the (field, operator) pairs,
+    not their values, so every request with the same shape shares one compiled
+    (and, per connection, prepared) statement. Parameters are numbered in the
+    order query_params() produces them, with LIMIT and OFFSET last.
+
+    With count_mode 'exact' each page row carries the filtered total in a
+    trailing count(*) OVER() column. 'planned' adds a statement to EXPLAIN for
+    the planner's row estimate, and 'capped' one that counts at most
+    (OFFSET, LIMIT) matching rows.
+    """
+    where_clauses = []
+    param_number = 0
+    for _ in range(search_term_count):
+        param_number += 1
+        where_clauses.append('(' + ' OR '.join(f'{field} ILIKE ${param_number}' for field in SEARCH_FIELDS) + ')')
+    for field, operator in filter_shape:
+        # Field names come from the CUTTING_COLUMNS whitelist, never from the request as-is
+        if field not in CUTTING_COLUMNS:
+            raise ValueError(f'Unknown cutting column: {field}')
+        numeric_sql, text_sql = FILTER_OPERATORS[operator]
+        template = numeric_sql if field in NUMERIC_FIELDS or text_sql is None else text_sql
+        value = None
+        if operator not in VALUELESS_OPERATORS:
+            param_number += 1
+            value = f'${param_number}'
+        where_clauses.append(template.format(field=field, value=value))
+
+    where_sql = (' WHERE ' + ' AND '.join(where_clauses)) if where_clauses else ''
+    window_sql = ', count(*) OVER() AS _total' if count_mode == 'exact' else ''
+    page = _statement(f"SELECT *{window_sql} FROM cutting{where_sql} "
+                      f"ORDER BY input_timestamp DESC LIMIT ${param_number + 1} OFFSET ${param_number + 2}")
+    count = None
+    if count_mode == 'planned':
+        count = _statement(f"SELECT 1 FROM cutting{where_sql}")
+    elif count_mode == 'capped':
+        count = _statement(f"SELECT count(*) FROM (SELECT 1 FROM cutting{where_sql} "
+                           f"OFFSET ${param_number + 1} LIMIT ${param_number + 2}) capped")
+    return CompiledQuery(page, count, count_mode)
+
+def query_params(search_terms: list[str], filters: list[tuple]) -> list:
+    """Filter values in compile_query()'s parameter order (without LIMIT/OFFSET)."""
+    params = [f'%{term}%' for term in search_terms]
+    for field, operator, value in filters:
+        if operator in VALUELESS_OPERATORS:
+            continue
+        params.append(f'%{value}%' if operator in CONTAINS_OPERATORS else value)
+    return params
+
+def _execute_prepared(conn, cur, statement: Statement, params: list, explain: bool = False):
+    """Prepares the statement on this connection once, then executes (or EXPLAINs) it by name."""
+    prepared = _prepared.setdefault(conn, set())
+    if statement.name not in prepared:
+        cur.execute(f"PREPARE {statement.name} AS {statement.sql}")
+        prepared.add(statement.name)
+    execute_sql = f"EXECUTE {statement.name}"
+    if params:
+        execute_sql += f" ({', '.join(['%s'] * len(params))})"
+    cur.execute(f"EXPLAIN (FORMAT JSON) {execute_sql}" if explain else execute_sql, params)
+
+def _page_total(conn, cur, compiled: CompiledQuery, params: list, rows: list, has_more: bool, page: int, per_page: int):
+    """
+    Returns (total, exact, capped) for a fetched page under the query's count mode.
+    The last page (no row after it) has an exact total whatever the mode.
+    """
+    offset = (page - 1) * per_page
+    if rows and not has_more or (not rows and page == 1):
+        return offset + len(rows), True, False
+
+    if compiled.count_mode == 'exact':
+        if rows:
+            return rows[0][-1], True, False
+        # Past the last page there is no row to carry the total; read it from the first row instead
+        _execute_prepared(conn, cur, compiled.page, params + [1, 0])
+        first_row = cur.fetchone()
+        return (first_row[-1] if first_row else 0), True, False
+
+    if compiled.count_mode == 'planned':
+        _execute_prepared(conn, cur, compiled.count, params, explain=True)
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        # An estimate can undershoot the rows already seen, and a next page exists
+        return (max(estimate, offset + len(rows) + 1) if rows else estimate), False, False
+
+    # Past the last page, count from the start instead
+    count_from = offset if rows else 0
+    _execute_prepared(conn, cur, compiled.count, params + [count_from, CUTTING_COUNT_CAP + 1])
+    counted = cur.fetchone()[0]
+    capped = counted > CUTTING_COUNT_CAP
+    return count_from + min(counted, CUTTING_COUNT_CAP), not capped, capped
+
 @cutting_bp.route('/')
 def index():
     search = request.args.get('search', '')
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     per_page = 10
     
     conn = None # Initialize conn to None
@@ -19,95 +194,24 @@ def index():
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        
-        # Base query
-        query = "SELECT * FROM cutting"
-        count_query = "SELECT COUNT(*) FROM cutting"
-        params = []
-        where_clauses = []
-
-        # Handle general search
-        if search:
-            search_terms = search.split()
-            search_conditions = []
-            for term in search_terms:
-                search_conditions.append("(po_no ILIKE %s OR sku ILIKE %s OR product ILIKE %s)")
-                search_param = f'%{term}%'
-                params.extend([search_param, search_param, search_param])
-            if search_conditions:
-                where_clauses.append(f"({" AND ".join(search_conditions)})")
-
-        # Define numeric fields for proper comparison
-        numeric_fields = {'pcs_pack', 'sets', 'produced_qty', 'rejection'}
-
-        # Handle filters
-        filter_index = 0
-        while True:
-            field = request.args.get(f'filter_field_{filter_index}')
-            operator = request.args.get(f'filter_operator_{filter_index}')
-            value = request.args.get(f'filter_value_{filter_index}')
-
-            if not field or not operator:
-                break
-            
-            if operator == 'equal':
-                if field in numeric_fields:
-                    where_clauses.append(f"{field} = %s")
-                    params.append(value)
-                else: # Treat as string, use ILIKE for case-insensitive equality
-                    where_clauses.append(f"{field} ILIKE %s")
-                    params.append(value) # No wildcards here, ILIKE behaves as case-insensitive '='
-            elif operator == 'not_equal':
-                if field in numeric_fields:
-                    where_clauses.append(f"{field} != %s")
-                    params.append(value)
-                else: # Treat as string, use NOT ILIKE for case-insensitive inequality
-                    where_clauses.append(f"{field} NOT ILIKE %s")
-                    params.append(value)
-            elif operator == 'like':
-                where_clauses.append(f"{field} ILIKE %s")
-                params.append(f'%{value}%')
-            elif operator == 'not_like':
-                where_clauses.append(f"{field} NOT ILIKE %s")
-                params.append(f'%{value}%')
-            elif operator == 'is_set':
-                where_clauses.append(f"{field} IS NOT NULL")
-            elif operator == 'not_set':
-                where_clauses.append(f"{field} IS NULL")
-            elif operator == 'gt':
-                where_clauses.append(f"{field} > %s")
-                params.append(value)
-            elif operator == 'lt':
-                where_clauses.append(f"{field} < %s")
-                params.append(value)
-            
-            filter_index += 1
-
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-            count_query += " WHERE " + " AND ".join(where_clauses)
-    
-        print(f"Executing count query: {count_query} with params: {params[:len(params) - 2]}") # Exclude pagination params from logging
-        # Get total count
-        cur.execute(count_query, params[:len(params) - 2] if len(params) > 2 else params) # Pass parameters without pagination for count query
-        total = cur.fetchone()[0]
-        
-        # Add pagination
-        query += " ORDER BY input_timestamp DESC LIMIT %s OFFSET %s"
-        params.extend([per_page, (page - 1) * per_page])
-        
-        print(f"Executing data query: {query} with params: {params}") # Debug print
-        
-        cur.execute(query, params)
+
+        search_terms = search.split()
+        filters = parse_filters(request.args)
+        count_mode = CUTTING_COUNT_MODES[1 if search_terms or filters else 0]
+        compiled = compile_query(len(search_terms), tuple((field, operator) for field, operator, _ in filters), count_mode)
+        params = query_params(search_terms, filters)
+
+        # In 'exact' mode this one execution returns the page and, in every row, the filtered total;
+        # one row past the page shows whether another follows
+        _execute_prepared(conn, cur, compiled.page, params + [per_page + 1, (page - 1) * per_page])
         rows = cur.fetchall()
-        
-        # Get column names
-        headers = [desc[0] for desc in cur.description]
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        headers = [desc[0] for desc in cur.description if desc[0] != '_total']
+        total, total_exact, total_capped = _page_total(conn, cur, compiled, params, rows, has_more, page, per_page)
         
         # Convert rows to dictionaries
-        data = []
-        for row in rows:
-            data.append(dict(zip(headers, row)))
+        data = [dict(zip(headers, row)) for row in rows]
         
         total_pages = (total + per_page - 1) // per_page
         
@@ -117,6 +221,9 @@ def index():
                             search=search,
                             page=page,
                             total_pages=total_pages,
+                            total_rows=total,
+                            total_exact=total_exact,
+                            total_capped=total_capped,
                             current_filters=request.args.to_dict(flat=True))
 
     except Exception as e:
@@ -127,14 +234,12 @@ def index():
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 @cutting_bp.route('/add', methods=['POST'])
 def add():
     try:
         data = request.form
-        conn = get_db_connection()
-        cur = conn.cursor()
         
         query = """
         INSERT INTO cutting (
@@ -163,11 +268,9 @@ def add():
             data.get('rejection')
         )
         
-        cur.execute(query, values)
-        conn.commit()
-        
-        cur.close()
-        conn.close()
+        # The connection goes back to the pool even if the statement fails
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(query, values)
         
         flash('Cutting data added successfully!', 'success')
         return redirect(url_for('cutting.index'))
@@ -180,8 +283,6 @@ def add():
 def edit(id):
     try:
         data = request.form
-        conn = get_db_connection()
-        cur = conn.cursor()
         
         query = """
         UPDATE cutting SET
@@ -216,11 +317,9 @@ def edit(id):
             id
         )
         
-        cur.execute(query, values)
-        conn.commit()
-        
-        cur.close()
-        conn.close()
+        # The connection goes back to the pool even if the statement fails
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute(query, values)
         
         flash('Cutting data updated successfully!', 'success')
         return redirect(url_for('cutting.index'))
@@ -232,18 +331,63 @@ def edit(id):
 @cutting_bp.route('/delete/<id>', methods=['POST'])
 def delete(id):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("DELETE FROM cutting WHERE id = %s", (id,))
-        conn.commit()
-        
-        cur.close()
-        conn.close()
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM cutting WHERE id = %s", (id,))
         
         flash('Cutting data deleted successfully!', 'success')
         return redirect(url_for('cutting.index'))
         
     except Exception as e:
         flash(f'Error deleting cutting data: {str(e)}', 'error')
-        return redirect(url_for('cutting.index')) 
\ No newline at end of file
+        return redirect(url_for('cutting.index'))
+
+@cutting_bp.route('/export')
+def export():
+    """Streams the whole cutting table as CSV through a server-side cursor."""
+    rows = stream_query(f"SELECT {', '.join(CUTTING_COLUMNS)} FROM cutting ORDER BY input_timestamp DESC")
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CUTTING_COLUMNS)
+        for row in rows:
+            writer.writerow([row[column] for column in CUTTING_COLUMNS])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=cutting.csv'
+    return response
+
+def _bulk_load_values(reader):
+    """Maps uploaded CSV rows to CUTTING_COLUMNS, filling in id and input_timestamp when absent."""
+    loaded_at = datetime.now().isoformat()
+    for row in reader:
+        values = {column: (row.get(column) or '').strip() for column in CUTTING_COLUMNS}
+        values['id'] = values['id'] or str(uuid.uuid4())
+        values['input_timestamp'] = values['input_timestamp'] or loaded_at
+        yield [values[column] for column in CUTTING_COLUMNS]
+
+@cutting_bp.route('/bulk-load', methods=['POST'])
+def bulk_load():
+    """
+    Loads an uploaded CSV (header row with cutting column names) with COPY FROM STDIN.
+    The file is read and sent as COPY consumes it, and loads all-or-nothing.
+    """
+    upload = request.files.get('file')
+    if not upload:
+        flash('Choose a CSV file to load.', 'error')
+        return redirect(url_for('cutting.index'))
+
+    try:
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        reader.fieldnames = [name.strip().lower().replace(' ', '_') for name in reader.fieldnames or []]
+        loaded = copy_rows('cutting', CUTTING_COLUMNS, _bulk_load_values(reader))
+        flash(f'Loaded {loaded} cutting rows.', 'success')
+    except Exception as e:
+        logger.error(f"Error bulk loading cutting data: {str(e)}", exc_info=True)
+        flash(f'Error loading cutting data: {str(e)}', 'error')
+    return redirect(url_for('cutting.index'))
@@ -0,0 +1,247 @@
+import csv
+import io
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_PORT = int(os.getenv('DB_PORT', 5432))
+DB_NAME = os.getenv('DB_NAME')
+DB_USER = os.getenv('DB_USER')
+DB_PASSWORD = os.getenv('DB_PASSWORD')
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
+
+# Connection pool settings (one pool per worker process)
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', 10))
+# A connection idle for longer than this is pinged before it is handed out
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', 30))
+# Rows fetched per round-trip by server-side cursors
+DB_STREAM_BATCH_SIZE = int(os.getenv('DB_STREAM_BATCH_SIZE', 2000))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within DB_POOL_CHECKOUT_TIMEOUT."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool with checkout timeouts and health checks.
+
+    psycopg2's ThreadedConnectionPool raises as soon as all connections are in
+    use; here callers wait up to `checkout_timeout` seconds for one to be
+    returned. Connections that sat idle for `health_check_after` seconds are
+    pinged first and replaced if the server has dropped them.
+    """
+
+    def __init__(self, min_size: int, max_size: int, checkout_timeout: float, health_check_after: float, **connect_kwargs):
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self._pool = ThreadedConnectionPool(min_size, max_size, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(max_size)
+        # id(connection) -> time it was last returned
+        self._returned_at = {}
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        returned_at = self._returned_at.get(id(conn))
+        if returned_at is None or time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Checks out a connection, waiting up to checkout_timeout for one to be free."""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolTimeout(f'No database connection became free within {self.checkout_timeout}s')
+        try:
+            conn = self._pool.getconn()
+            while not self._is_healthy(conn):
+                # A fresh connection is never pinged, so this ends once the stale ones are gone
+                self._returned_at.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, discard: bool = False):
+        """Returns a connection; open transactions are rolled back, broken or discarded connections are closed."""
+        try:
+            discard = discard or bool(conn.closed)
+            if discard:
+                self._returned_at.pop(id(conn), None)
+            else:
+                self._returned_at[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=discard)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+        self._returned_at.clear()
+
+
+def create_pool() -> ConnectionPool:
+    """Creates a connection pool from the DB_* settings."""
+    if not DB_NAME or not DB_USER:
+        raise ValueError('Missing DB_NAME or DB_USER in environment variables')
+    return ConnectionPool(
+        DB_POOL_MIN_SIZE,
+        DB_POOL_MAX_SIZE,
+        DB_POOL_CHECKOUT_TIMEOUT,
+        DB_POOL_HEALTH_CHECK_AFTER,
+        host=DB_HOST,
+        port=DB_PORT,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        connect_timeout=DB_CONNECT_TIMEOUT,
+    )
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Returns the connection pool of this worker process, creating it on first use.
+    A forked worker builds its own pool instead of sharing its parent's sockets.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = create_pool()
+                _pool_pid = pid
+    return _pool
+
+
+def get_db_connection():
+    """Checks out a pooled connection; hand it back with release_db_connection(), or use db_connection()."""
+    return get_pool().getconn()
+
+
+def release_db_connection(conn, discard: bool = False):
+    get_pool().putconn(conn, discard=discard)
+
+
+@contextmanager
+def db_connection():
+    """
+    Yields a pooled connection and always returns it to the pool.
+
+    The transaction is committed if the block succeeds and rolled back if it
+    raises; a connection that broke during the block is closed, not reused.
+    """
+    conn = get_db_connection()
+    discard = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            if not conn.closed:
+                conn.rollback()
+        except psycopg2.Error:
+            discard = True
+        raise
+    finally:
+        release_db_connection(conn, discard=discard)
+
+
+def close_pool():
+    """Closes every connection of this worker's pool; the next checkout builds a new pool."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+
+
+def stream_query(query, params=None, batch_size: int = DB_STREAM_BATCH_SIZE):
+    """
+    Yields the rows of a query as dicts, read through a named (server-side) cursor.
+
+    Only `batch_size` rows are held in memory at a time, however large the
+    result. The pooled connection stays checked out until the generator is
+    exhausted or closed.
+    """
+    with db_connection() as conn:
+        with conn.cursor(name=f'stream_{uuid.uuid4().hex}') as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                headers = [column[0] for column in cur.description]
+                for row in rows:
+                    yield dict(zip(headers, row))
+
+
+class _CsvReader(io.TextIOBase):
+    """File-like view of rows as CSV text, produced on demand as COPY reads it."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate(0)
+        if size is None or size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def copy_rows(table_name: str, columns: list[str], rows) -> int:
+    """
+    Bulk-loads rows into a table with COPY FROM STDIN, in one transaction.
+
+    Args:
+        table_name: Target table.
+        columns: Column names, in the order of the values in each row.
+        rows: Iterable of value sequences; None and '' are loaded as NULL.
+            Rows are serialized lazily, so the iterable may be a generator.
+    Returns:
+        The number of rows loaded.
+    """
+    with db_connection() as conn, conn.cursor() as cur:
+        statement = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+            sql.Identifier(table_name),
+            sql.SQL(', ').join(map(sql.Identifier, columns)),
+        )
+        cur.copy_expert(statement.as_string(conn), _CsvReader(rows))
+        return cur.rowcount
@@ -0,0 +1,35 @@
+-- Adds an updated_at column to the sales order tables and keeps it current on
+-- every insert and update, whichever client writes the row. The read replica
+-- (app.utils.read_replica) syncs these tables incrementally on updated_at;
+-- created_at alone would miss edits to existing orders until the next full
+-- re-sync.
+--
+-- The trigger also overwrites values supplied by the writer, so inserts that
+-- populate every column from JSON (as save_sales_order does) still get a
+-- timestamp.
+
+alter table tab_sales_order add column if not exists updated_at timestamptz not null default now();
+alter table tab_sales_order_items add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists tab_sales_order_updated_at_idx on tab_sales_order (updated_at, po_no);
+create index if not exists tab_sales_order_items_updated_at_idx on tab_sales_order_items (updated_at, id);
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists tab_sales_order_set_updated_at on tab_sales_order;
+create trigger tab_sales_order_set_updated_at
+    before insert or update on tab_sales_order
+    for each row execute function public.set_updated_at();
+
+drop trigger if exists tab_sales_order_items_set_updated_at on tab_sales_order_items;
+create trigger tab_sales_order_items_set_updated_at
+    before insert or update on tab_sales_order_items
+    for each row execute function public.set_updated_at();
@@ -0,0 +1,117 @@
+-- Saves a sales order header and its items, and recomputes total_qty, in one
+-- transaction. Item changes are applied as a diff against the stored items.
+-- Called by app.models.sales_order_models.save_sales_order through PostgREST
+-- RPC:  POST /rest/v1/rpc/save_sales_order
+--
+--   p_order   jsonb  header columns; must include po_no
+--   p_items   jsonb  array of the order's complete item rows
+--   p_create  bool   true for a new order: fails with unique_violation when
+--                    the PO already exists; false updates the existing header
+--
+-- Returns one row, {"order": <header row>, "items": [<item rows>]}. It is a
+-- set-returning function so the response body is a JSON array, which is what
+-- the Python client expects.
+
+-- Quoted, comma-separated columns of p_table that are keys of p_row. Inserts
+-- list only these, so columns the JSON leaves out get their defaults instead
+-- of the explicit NULLs a whole jsonb_populate_record row would write.
+create or replace function public.jsonb_insert_columns(p_table regclass, p_row jsonb)
+returns text
+language sql
+stable
+as $$
+    select string_agg(quote_ident(a.attname), ', ' order by a.attnum)
+    from pg_attribute a
+    where a.attrelid = p_table and a.attnum > 0 and not a.attisdropped and p_row ? a.attname;
+$$;
+
+create or replace function public.save_sales_order(p_order jsonb, p_items jsonb, p_create boolean default false)
+returns setof jsonb
+language plpgsql
+as $$
+declare
+    v_po_no text := p_order->>'po_no';
+    v_order tab_sales_order;
+    v_item jsonb;
+begin
+    if v_po_no is null or v_po_no = '' then
+        raise exception 'po_no is required' using errcode = 'not_null_violation';
+    end if;
+
+    if p_create then
+        if exists (select 1 from tab_sales_order where po_no = v_po_no) then
+            raise exception 'PO number % already exists', v_po_no using errcode = 'unique_violation';
+        end if;
+        execute format(
+            'insert into tab_sales_order (%1$s) select %1$s from jsonb_populate_record(null::tab_sales_order, $1)',
+            jsonb_insert_columns('tab_sales_order', p_order)
+        ) using p_order;
+    else
+        -- Keys missing from p_order keep their current values
+        update tab_sales_order t
+        set (po_date, delivery_date, branch, warehouse, status, repository, country, mode) = (
+            select r.po_date, r.delivery_date, r.branch, r.warehouse, r.status, r.repository, r.country, r.mode
+            from jsonb_populate_record(t, p_order) r
+        )
+        where t.po_no = v_po_no;
+        if not found then
+            raise exception 'PO number % does not exist', v_po_no using errcode = 'no_data_found';
+        end if;
+    end if;
+
+    -- Apply only the item changes. Items are matched on (sr_no, sku): stored
+    -- items without a submitted match are deleted, matched items are updated
+    -- only when a value differs, and unmatched submitted items are inserted.
+    delete from tab_sales_order_items i
+    where i.po_no = v_po_no
+      and not exists (
+          select 1 from jsonb_populate_recordset(null::tab_sales_order_items, p_items) s
+          where s.sr_no is not distinct from i.sr_no and s.sku is not distinct from i.sku
+      );
+
+    update tab_sales_order_items i
+    set product = s.product, category = s.category, line = s.line, design = s.design,
+        size = s.size, pack_of = s.pack_of, sets = s.sets, pieces = s.pieces
+    from jsonb_populate_recordset(null::tab_sales_order_items, p_items) s
+    where i.po_no = v_po_no
+      and s.sr_no is not distinct from i.sr_no and s.sku is not distinct from i.sku
+      and (i.product, i.category, i.line, i.design, i.size, i.pack_of, i.sets, i.pieces)
+          is distinct from (s.product, s.category, s.line, s.design, s.size, s.pack_of, s.sets, s.pieces);
+
+    -- New items are inserted one by one with the columns each one sends, so
+    -- omitted columns (e.g. id) take their defaults. The loop's query sees the
+    -- items as they were before these inserts.
+    for v_item in
+        select e.value
+        from jsonb_array_elements(p_items) e
+        cross join lateral jsonb_populate_record(null::tab_sales_order_items, e.value) s
+        where not exists (
+            select 1 from tab_sales_order_items i
+            where i.po_no = v_po_no and i.sr_no is not distinct from s.sr_no and i.sku is not distinct from s.sku
+        )
+    loop
+        execute format(
+            'insert into tab_sales_order_items (%1$s) select %1$s from jsonb_populate_record(null::tab_sales_order_items, $1)',
+            jsonb_insert_columns('tab_sales_order_items', v_item)
+        ) using v_item;
+    end loop;
+
+    update tab_sales_order
+    set total_qty = (
+        select coalesce(sum(coalesce(nullif(i.pieces::text, ''), '0')::numeric), 0)::bigint
+        from tab_sales_order_items i
+        where i.po_no = v_po_no
+    )
+    where po_no = v_po_no
+    returning * into v_order;
+
+    return next jsonb_build_object(
+        'order', to_jsonb(v_order),
+        'items', coalesce(
+            (select jsonb_agg(to_jsonb(i) order by i.sr_no) from tab_sales_order_items i where i.po_no = v_po_no),
+            '[]'::jsonb
+        )
+    );
+    return;
+end;
+$$;
@@ -30,4 +30,70 @@ window.addEventListener('pageshow', function(event) {
 // Show loading when navigating away (e.g., form submission, link click)
 window.addEventListener('beforeunload', function() {
     window.showLoading();
-}); 
\ No newline at end of file
+}); 
+
+// Typeahead for inputs marked with data-suggest="<field>[,<field>...]".
+// Suggestions come from /api/suggest and are shown through a <datalist>;
+// delegated listeners also cover rows added to the page later.
+(function() {
+    const SUGGEST_DELAY_MS = 150;
+    const SUGGEST_LIMIT = 10;
+    const timers = new WeakMap();
+    const responseCache = new Map();
+    let datalistCount = 0;
+
+    function getDatalist(input) {
+        if (!input.getAttribute('list')) {
+            const datalist = document.createElement('datalist');
+            datalist.id = 'suggest-list-' + (++datalistCount);
+            document.body.appendChild(datalist);
+            input.setAttribute('list', datalist.id);
+        }
+        return document.getElementById(input.getAttribute('list'));
+    }
+
+    function renderSuggestions(input, suggestions) {
+        const datalist = getDatalist(input);
+        datalist.innerHTML = '';
+        suggestions.forEach(function(suggestion) {
+            const option = document.createElement('option');
+            option.value = suggestion.value;
+            if (input.dataset.suggest.indexOf(',') !== -1) {
+                option.label = suggestion.field.replace('_', ' ');
+            }
+            datalist.appendChild(option);
+        });
+    }
+
+    function fetchSuggestions(input) {
+        const query = input.value.trim();
+        if (!query) {
+            renderSuggestions(input, []);
+            return;
+        }
+        const url = '/api/suggest?' + new URLSearchParams({ q: query, fields: input.dataset.suggest, limit: SUGGEST_LIMIT });
+        if (responseCache.has(url)) {
+            renderSuggestions(input, responseCache.get(url));
+            return;
+        }
+        fetch(url, { credentials: 'same-origin' })
+            .then(function(response) { return response.ok ? response.json() : { suggestions: [] }; })
+            .then(function(data) {
+                responseCache.set(url, data.suggestions);
+                // Ignore responses that arrive after the input has changed
+                if (input.value.trim() === query) {
+                    renderSuggestions(input, data.suggestions);
+                }
+            })
+            .catch(function() {});
+    }
+
+    document.addEventListener('input', function(event) {
+        const input = event.target;
+        if (!(input instanceof HTMLInputElement) || !input.dataset.suggest) {
+            return;
+        }
+        clearTimeout(timers.get(input));
+        timers.set(input, setTimeout(function() { fetchSuggestions(input); }, SUGGEST_DELAY_MS));
+    });
+})();
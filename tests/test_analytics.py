@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from app.models.data_models import summarize_articles
+from app.routes.dispatch_reports import build_dispatch_report
+from app.utils import analytics, read_replica
+from tests.test_dispatch_reports import _shipments
+
+
+# --- summarize_articles ---------------------------------------------------
+
+def test_summarize_articles_ranks_by_share():
+    rows = [
+        {'product': 'Rug', 'total_produced_qty': 30, 'total_rejection_qty': 1},
+        {'product': 'Mat', 'total_produced_qty': 50, 'total_rejection_qty': 2},
+        {'product': 'Rug', 'total_produced_qty': 20, 'total_rejection_qty': 3},
+        {'product': 'Cushion', 'total_produced_qty': 100, 'total_rejection_qty': 0},
+    ]
+
+    labels, quantities, rejections, percentages, total = summarize_articles(rows)
+
+    assert labels == ['Cushion', 'Mat', 'Rug']
+    assert quantities == [100, 50, 50]
+    assert rejections == [0, 2, 4]
+    assert percentages == ['50.00%', '25.00%', '25.00%']
+    assert total == 200
+
+
+def test_summarize_articles_skips_blank_products_and_coerces_quantities():
+    rows = [
+        {'product': None, 'total_produced_qty': 10, 'total_rejection_qty': 0},
+        {'product': '', 'total_produced_qty': 10, 'total_rejection_qty': 0},
+        {'product': 'Mat', 'total_produced_qty': 'n/a', 'total_rejection_qty': None},
+        {'product': 'Rug', 'total_produced_qty': '3', 'total_rejection_qty': '1'},
+    ]
+
+    labels, quantities, rejections, percentages, total = summarize_articles(rows)
+
+    assert labels == ['Rug', 'Mat']
+    assert quantities == [3, 0]
+    assert rejections == [1, 0]
+    assert percentages == ['100.00%', '0.00%']
+    assert total == 3
+    assert all(type(value) is int for value in quantities + rejections + [total])
+
+
+def test_summarize_articles_without_production():
+    assert summarize_articles([]) == ([], [], [], [], 0)
+
+    labels, quantities, _, percentages, total = summarize_articles(
+        [{'product': 'Mat', 'total_produced_qty': 0, 'total_rejection_qty': 0}]
+    )
+    assert (labels, quantities, percentages, total) == (['Mat'], [0], ['0.00%'], 0)
+
+
+# --- dispatch cubes on the replica ------------------------------------------
+
+@pytest.fixture
+def replicated_shipments(supabase, tmp_path, monkeypatch):
+    monkeypatch.setattr(read_replica, 'READ_REPLICA_PATH', str(tmp_path / 'replica.sqlite3'))
+    monkeypatch.setattr(read_replica, '_local', threading.local())
+    supabase.tables['tab_shipment_meta'] = _shipments(3000, seed=3)
+    read_replica.full_sync_table('tab_shipment_meta')
+    yield
+    read_replica._connect().close()
+
+
+@pytest.mark.parametrize('branch, channel, repository', [
+    ('all', 'all', 'all'),
+    ('karur', 'FK', 'all'),
+    ('AMZ', 'all', 'R2'),
+])
+def test_aggregated_cube_rows_give_the_raw_row_report(replicated_shipments, monkeypatch, branch, channel, repository):
+    monkeypatch.setattr(analytics, 'ANALYTICS_BACKEND', 'replica')
+    aggregated = build_dispatch_report(2024, branch, channel, repository)
+    monkeypatch.setattr(analytics, 'ANALYTICS_BACKEND', 'supabase')
+    raw = build_dispatch_report(2024, branch, channel, repository)
+
+    assert aggregated == raw
@@ -0,0 +1,137 @@
+import pytest
+
+from blueprints.cutting import compile_query, query_params, parse_filters, parse_count_modes, _page_total
+
+
+SHAPE = (('sku', 'equal'), ('sets', 'gt'), ('line', 'is_set'), ('product', 'like'))
+
+
+def test_compile_query_numbers_params_with_limit_and_offset_last():
+    compiled = compile_query(2, SHAPE)
+
+    assert compiled.page.sql == (
+        'SELECT *, count(*) OVER() AS _total FROM cutting WHERE '
+        '(po_no ILIKE $1 OR sku ILIKE $1 OR product ILIKE $1) AND '
+        '(po_no ILIKE $2 OR sku ILIKE $2 OR product ILIKE $2) AND '
+        'sku ILIKE $3 AND sets > $4 AND line IS NOT NULL AND product ILIKE $5 '
+        'ORDER BY input_timestamp DESC LIMIT $6 OFFSET $7'
+    )
+    assert compiled.count is None
+    assert compiled.count_mode == 'exact'
+
+
+def test_compile_query_without_filters():
+    compiled = compile_query(0, ())
+
+    assert compiled.page.sql == (
+        'SELECT *, count(*) OVER() AS _total FROM cutting ORDER BY input_timestamp DESC LIMIT $1 OFFSET $2'
+    )
+
+
+def test_compile_query_count_statements():
+    planned = compile_query(1, (('sets', 'gt'),), 'planned')
+    capped = compile_query(1, (('sets', 'gt'),), 'capped')
+    where_sql = 'WHERE (po_no ILIKE $1 OR sku ILIKE $1 OR product ILIKE $1) AND sets > $2'
+
+    # Only 'exact' carries the total on the page rows
+    assert planned.page.sql == capped.page.sql == (
+        f'SELECT * FROM cutting {where_sql} ORDER BY input_timestamp DESC LIMIT $3 OFFSET $4'
+    )
+    assert planned.count.sql == f'SELECT 1 FROM cutting {where_sql}'
+    assert capped.count.sql == f'SELECT count(*) FROM (SELECT 1 FROM cutting {where_sql} OFFSET $3 LIMIT $4) capped'
+
+
+def test_compile_query_shares_statements_per_shape():
+    assert compile_query(1, SHAPE) is compile_query(1, SHAPE)
+    assert compile_query(1, SHAPE).page.name != compile_query(2, SHAPE).page.name
+    assert compile_query(1, SHAPE, 'planned').count.name != compile_query(1, SHAPE, 'capped').count.name
+
+
+def test_compile_query_rejects_unknown_columns():
+    with pytest.raises(ValueError):
+        compile_query(0, (('id; DROP TABLE cutting', 'equal'),))
+
+
+def test_query_params_follow_the_compiled_order():
+    filters = [('sku', 'equal', 'SKU1'), ('sets', 'gt', '3'), ('line', 'is_set', None), ('product', 'like', 'mat')]
+
+    assert query_params(['po1', 'rug'], filters) == ['%po1%', '%rug%', 'SKU1', '3', '%mat%']
+
+
+def test_parse_filters_skips_unknown_fields_and_operators():
+    args = {
+        'filter_field_0': 'sku', 'filter_operator_0': 'equal', 'filter_value_0': 'SKU1',
+        'filter_field_1': 'password', 'filter_operator_1': 'equal', 'filter_value_1': 'x',
+        'filter_field_2': 'sets', 'filter_operator_2': 'between', 'filter_value_2': '1',
+        'filter_field_3': 'line', 'filter_operator_3': 'not_set',
+        # Parsing stops at the first missing index
+        'filter_field_5': 'product', 'filter_operator_5': 'like', 'filter_value_5': 'mat',
+    }
+
+    assert parse_filters(args) == [('sku', 'equal', 'SKU1'), ('line', 'not_set', None)]
+
+
+
+def test_parse_count_modes():
+    assert parse_count_modes('planned,capped') == ('planned', 'capped')
+    assert parse_count_modes(' Exact ') == ('exact', 'exact')
+    for value in ('', 'fast', 'exact,planned,capped'):
+        with pytest.raises(ValueError):
+            parse_count_modes(value)
+
+
+class CountCursor:
+    """Answers the count statements _page_total runs with a fixed result row."""
+
+    def __init__(self, result):
+        self.result = result
+        self.executed = []
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    def fetchone(self):
+        return self.result
+
+
+class FakeConnection:
+    """Only keys the per-connection set of prepared statements."""
+
+
+def _total(count_mode, result, rows, has_more, page, per_page=10):
+    cur = CountCursor(result)
+    compiled = compile_query(0, (), count_mode)
+    return _page_total(FakeConnection(), cur, compiled, [], rows, has_more, page, per_page), cur
+
+
+def test_page_total_of_the_last_page_is_exact():
+    total, cur = _total('planned', None, [('row',)] * 10, False, 3)
+
+    assert total == (30, True, False)
+    assert cur.executed == []
+
+
+def test_planned_total_on_a_full_page_leaves_a_next_page():
+    total, _ = _total('planned', ([{'Plan': {'Plan Rows': 12}}],), [('row',)] * 10, True, 3)
+
+    assert total == (31, False, False)
+
+
+def test_planned_total_uses_the_estimate_when_larger():
+    total, _ = _total('planned', ('[{"Plan": {"Plan Rows": 5000}}]',), [('row',)] * 10, True, 1)
+
+    assert total == (5000, False, False)
+
+
+def test_capped_total_counts_from_the_page():
+    total, cur = _total('capped', (1001,), [('row',)] * 10, True, 2)
+
+    assert total == (1010, False, True)
+    assert cur.executed[-1][1][-2:] == [10, 1001]
+
+
+def test_capped_total_past_the_end_counts_from_the_start():
+    total, cur = _total('capped', (15,), [], False, 5)
+
+    assert total == (15, True, False)
+    assert cur.executed[-1][1][-2:] == [0, 1001]
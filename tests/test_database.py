@@ -0,0 +1,242 @@
+import threading
+
+import psycopg2
+import pytest
+
+import database
+from database import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((self.name, query, params))
+        if self.conn.broken:
+            self.conn.closed = 2
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        self._rows = list(self.conn.result)
+        self.description = [(column,) for column in self.conn.result_columns]
+
+    def copy_expert(self, statement, file):
+        # COPY pulls the data in fixed-size chunks
+        head, rest = file.read(7), file.read()
+        self.conn.copied.append((statement, head, rest))
+        self.rowcount = len((head + rest).splitlines())
+
+    def fetchmany(self, size):
+        self.conn.fetch_sizes.append(size)
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.commits = 0
+        self.rollbacks = 0
+        self.executed = []
+        self.fetch_sizes = []
+        self.copied = []
+        self.result, self.result_columns = [], []
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeThreadedPool:
+    """Stands in for psycopg2's ThreadedConnectionPool: hands out idle connections or opens new ones."""
+
+    def __init__(self, min_size, max_size, **connect_kwargs):
+        self.connect_kwargs = connect_kwargs
+        self.idle = []
+        self.opened = []
+
+    def getconn(self):
+        if self.idle:
+            return self.idle.pop()
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def putconn(self, conn, close=False):
+        if close:
+            conn.closed = 1
+        else:
+            self.idle.append(conn)
+
+    def closeall(self):
+        for conn in self.opened:
+            conn.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A pool of two fake connections installed as this process's pool."""
+    monkeypatch.setattr(database, 'ThreadedConnectionPool', FakeThreadedPool)
+    pool = ConnectionPool(1, 2, checkout_timeout=0.05, health_check_after=30)
+    monkeypatch.setattr(database, '_pool', pool)
+    monkeypatch.setattr(database, '_pool_pid', database.os.getpid())
+    return pool
+
+
+def test_checkout_waits_for_a_free_connection(pool):
+    first, second = pool.getconn(), pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    threading.Timer(0.01, pool.putconn, args=(first,)).start()
+    pool.checkout_timeout = 5
+    assert pool.getconn() is first
+    pool.putconn(second)
+
+
+def test_discarded_connections_are_closed_and_free_their_slot(pool):
+    conn = pool.getconn()
+    pool.putconn(conn, discard=True)
+
+    assert conn.closed
+    replacement = pool.getconn()
+    assert replacement is not conn
+    pool.putconn(replacement)
+
+
+def test_stale_connections_are_pinged_and_replaced(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+    pool.health_check_after = 0
+    conn.broken = True
+
+    replacement = pool.getconn()
+
+    assert replacement is not conn and conn.closed
+    assert conn.executed == [(None, 'SELECT 1', None)]
+    pool.putconn(replacement)
+
+
+def test_recently_used_connections_are_not_pinged(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert conn.executed == []
+
+
+def test_db_connection_commits_on_success(pool):
+    with database.db_connection() as conn:
+        pass
+
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    assert pool._pool.idle == [conn]
+
+
+def test_db_connection_rolls_back_and_returns_the_connection_on_error(pool):
+    with pytest.raises(ValueError):
+        with database.db_connection() as conn:
+            raise ValueError('bad row')
+
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+    assert pool._pool.idle == [conn]
+
+
+def test_db_connection_discards_a_connection_that_broke(pool):
+    with pytest.raises(psycopg2.OperationalError):
+        with database.db_connection() as conn, conn.cursor() as cur:
+            conn.broken = True
+            cur.execute('SELECT 1')
+
+    assert conn.closed and pool._pool.idle == []
+    # The slot was freed, so both connections can still be checked out
+    pool.putconn(pool.getconn())
+
+
+def test_release_db_connection_returns_a_checked_out_connection(pool):
+    conn = database.get_db_connection()
+    database.release_db_connection(conn)
+
+    assert pool._pool.idle == [conn]
+
+
+def test_forked_worker_builds_its_own_pool(pool, monkeypatch):
+    monkeypatch.setattr(database, '_pool_pid', -1)
+    monkeypatch.setattr(database, 'create_pool', lambda: 'new pool')
+
+    assert database.get_pool() == 'new pool'
+
+
+def test_create_pool_requires_credentials(monkeypatch):
+    monkeypatch.setattr(database, 'DB_NAME', None)
+
+    with pytest.raises(ValueError):
+        database.create_pool()
+
+
+def test_stream_query_reads_through_a_named_cursor_in_batches(pool):
+    conn = pool.getconn()
+    conn.result_columns = ['id', 'sets']
+    conn.result = [(number, number % 3) for number in range(5)]
+    pool.putconn(conn)
+
+    rows = list(database.stream_query('SELECT id, sets FROM cutting', batch_size=2))
+
+    assert rows == [{'id': number, 'sets': number % 3} for number in range(5)]
+    name, query, _ = conn.executed[0]
+    assert name.startswith('stream_') and query == 'SELECT id, sets FROM cutting'
+    assert conn.fetch_sizes == [2, 2, 2, 2]
+    assert conn.commits == 1 and pool._pool.idle == [conn]
+
+
+def test_closing_a_stream_early_returns_the_connection(pool):
+    conn = pool.getconn()
+    conn.result_columns = ['id']
+    conn.result = [(number,) for number in range(10)]
+    pool.putconn(conn)
+
+    stream = database.stream_query('SELECT id FROM cutting', batch_size=3)
+    assert next(stream) == {'id': 0}
+    stream.close()
+
+    assert pool._pool.idle == [conn]
+
+
+def test_copy_rows_serializes_rows_as_csv_on_demand(pool, monkeypatch):
+    # Identifiers are normally quoted by libpq, which needs a live connection
+    monkeypatch.setattr(database.sql.ext, 'quote_ident', lambda name, context: f'"{name}"')
+    rows = iter([('A1', 3, None), ('B, "2"', '', 4.5)])
+
+    loaded = database.copy_rows('cutting', ['article', 'sets', 'weight'], rows)
+
+    conn = pool._pool.idle[0]
+    statement, head, rest = conn.copied[0]
+    assert statement == 'COPY "cutting" ("article", "sets", "weight") FROM STDIN WITH (FORMAT csv)'
+    assert head + rest == 'A1,3,\n"B, ""2""",,4.5\n'
+    assert loaded == 2
+    assert conn.commits == 1
+
+
+def test_csv_reader_honours_read_sizes():
+    reader = database._CsvReader(iter([('a', 1)] * 3))
+
+    assert reader.read(3) == 'a,1'
+    assert reader.read(1) == '\n'
+    assert reader.read() == 'a,1\na,1\n'
+    assert reader.read(10) == ''
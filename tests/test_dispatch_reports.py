@@ -0,0 +1,119 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from app.routes.dispatch_reports import build_dispatch_report, get_monthly_data, get_quarterly_data
+from app.utils.supabase_client import get_supabase_client
+
+
+# --- reference: the per-cube queries build_dispatch_report replaced --------
+
+def _breakdown(year, column, label, filters):
+    query = get_supabase_client().table('tab_shipment_meta') \
+        .select(f'{column}, total_qty') \
+        .gte('month', f'{year}-01-01') \
+        .lt('month', f'{year + 1}-01-01') \
+        .not_.ilike('shipment_id', '%Return%') \
+        .not_.ilike('shipment_id', '%LPN%') \
+        .not_.ilike('shipment_id', '%Mango%') \
+        .not_.ilike('shipment_id', '%FMC%')
+    for filter_column, value in filters:
+        if value != "all":
+            query = query.eq(filter_column, value.capitalize() if filter_column == 'branch' else value)
+
+    counts = defaultdict(int)
+    for record in query.execute().data:
+        counts[record[column] or 'Unknown'] += record['total_qty'] or 0
+    total_count = sum(counts.values())
+    return [
+        {label: key, 'count': count, 'percentage': round((count / total_count * 100), 2) if total_count > 0 else 0}
+        for key, count in counts.items()
+    ]
+
+
+def get_channel_data(year, branch="all", repository="all"):
+    return _breakdown(year, 'channel_abb', 'channel', [('branch', branch), ('repository', repository)])
+
+
+def get_repository_data(year, branch="all", channel="all"):
+    return _breakdown(year, 'repository', 'repository', [('branch', branch), ('channel_abb', channel)])
+
+
+def get_branch_data(year, channel="all", repository="all"):
+    return _breakdown(year, 'branch', 'branch', [('channel_abb', channel), ('repository', repository)])
+
+
+def _shipments(count, seed=7):
+    generator = random.Random(seed)
+    return [
+        {
+            'shipment_id': generator.choice(['SH', 'SH-Return', 'LPN', 'SH-Mango', 'FMC']) + f'-{number:05d}',
+            'month': f"{generator.choice([2023, 2024, 2024, 2024, 2025])}-{generator.randint(1, 12):02d}-01",
+            'branch': generator.choice(['Karur', 'Mumbai', 'Delhi']),
+            'channel_abb': generator.choice(['AMZ', 'FK', 'MYN', '', None]),
+            'repository': generator.choice(['R1', 'R2', '', None]),
+            'total_qty': generator.choice([0, 1, 12, 250, None]),
+        }
+        for number in range(count)
+    ]
+
+
+@pytest.fixture
+def shipments(supabase):
+    rows = _shipments(400)
+    # The report reads shipments ordered by (month, shipment_id); store them
+    # that way so the unordered reference queries see the same order
+    rows.sort(key=lambda row: (row['month'], row['shipment_id']))
+    supabase.tables['tab_shipment_meta'] = rows
+    return rows
+
+
+@pytest.mark.parametrize('branch, channel, repository', [
+    ('all', 'all', 'all'),
+    ('karur', 'all', 'all'),
+    ('all', 'AMZ', 'all'),
+    ('all', 'all', 'R1'),
+    ('mumbai', 'FK', 'R2'),
+    # The routes passed the branch where get_branch_data expects a channel
+    ('AMZ', 'all', 'all'),
+])
+def test_build_dispatch_report_matches_per_cube_queries(shipments, branch, channel, repository):
+    monthly_data = get_monthly_data(2024, branch, channel, repository)
+    expected = (
+        monthly_data,
+        get_quarterly_data(monthly_data),
+        get_channel_data(2024, branch, repository),
+        get_repository_data(2024, branch, channel),
+        get_branch_data(2024, branch, repository),
+    )
+
+    assert build_dispatch_report(2024, branch, channel, repository) == expected
+
+
+def test_build_dispatch_report_pages_past_max_rows(supabase):
+    rows = _shipments(12000, seed=11)
+    supabase.tables['tab_shipment_meta'] = rows
+    counted = [
+        row for row in rows
+        if row['month'].startswith('2024') and not any(tag in row['shipment_id'] for tag in ('Return', 'LPN', 'Mango', 'FMC'))
+    ]
+    assert len(counted) > supabase.max_rows
+
+    monthly_data, quarterly_data, _, _, branch_data = build_dispatch_report(2024)
+
+    total = sum(row['total_qty'] or 0 for row in counted)
+    assert sum(month['total'] for month in monthly_data) == total
+    assert sum(quarter['total'] for quarter in quarterly_data) == total
+    assert sum(branch['count'] for branch in branch_data) == total
+    gets = [params for method, table, params in supabase.requests if method == 'GET']
+    assert len(gets) == len(counted) // 1000 + 1
+    assert all(('order', 'month.asc,shipment_id.asc') in params for params in gets)
+
+
+def test_build_dispatch_report_without_shipments(supabase):
+    monthly_data, quarterly_data, channel_data, repository_data, branch_data = build_dispatch_report(2024)
+
+    assert monthly_data == []
+    assert channel_data == repository_data == branch_data == []
+    assert quarterly_data == get_quarterly_data([])
@@ -0,0 +1,82 @@
+import io
+from datetime import date
+
+from app.models.data_models import read_entry_rows, prepare_entry_rows, ingest_entries, ENTRY_MAX_QUANTITY
+
+
+# --- prepare_entry_rows -----------------------------------------------------
+
+def _entry(**values):
+    return {'po_no': 'PO1', 'sku': 'SKU1', 'product': 'Mat', 'pcs_pack': '4', 'produced_qty': '10', **values}
+
+
+def test_prepare_entry_rows_computes_sets_and_unpaired_pieces():
+    frame, errors = prepare_entry_rows(read_entry_rows(records=[
+        _entry(date='2024-05-01'),
+        _entry(pcs_pack='0', produced_qty='7'),
+        _entry(produced_qty='12', rejection=''),
+    ]))
+
+    assert errors == {}
+    assert frame['sets'].tolist() == [2, 0, 3]
+    assert frame['unpair_pcs'].tolist() == [2, 7, 0]
+    assert frame['rejection'].tolist() == [0, 0, 0]
+    assert frame['date'].tolist() == ['2024-05-01', date.today().isoformat(), date.today().isoformat()]
+
+
+def test_prepare_entry_rows_reports_errors_per_row():
+    frame, errors = prepare_entry_rows(read_entry_rows(records=[
+        _entry(),
+        _entry(po_no='', sku=''),
+        _entry(produced_qty='2.5'),
+        _entry(pcs_pack='-1'),
+        _entry(produced_qty=str(ENTRY_MAX_QUANTITY + 1)),
+        _entry(rejection='inf'),
+        _entry(date='01/05/2024'),
+        _entry(date='2024-02-30'),
+    ]))
+
+    assert 0 not in errors
+    assert errors[1] == ['po_no is required', 'sku is required']
+    assert errors[2] == [f'produced_qty must be a whole number between 0 and {ENTRY_MAX_QUANTITY}']
+    assert errors[3] == [f'pcs_pack must be a whole number between 0 and {ENTRY_MAX_QUANTITY}']
+    assert errors[4] == [f'produced_qty must be a whole number between 0 and {ENTRY_MAX_QUANTITY}']
+    assert errors[5] == [f'rejection must be a whole number between 0 and {ENTRY_MAX_QUANTITY}']
+    assert errors[6] == errors[7] == ['date must be a valid YYYY-MM-DD date']
+    # Invalid numbers never wrap around in the int64 columns
+    assert frame['produced_qty'].between(0, ENTRY_MAX_QUANTITY).all()
+
+
+def test_prepare_entry_rows_accepts_the_maximum_quantity():
+    frame, errors = prepare_entry_rows(read_entry_rows(records=[_entry(produced_qty=str(ENTRY_MAX_QUANTITY))]))
+
+    assert errors == {}
+    assert frame.at[0, 'produced_qty'] == ENTRY_MAX_QUANTITY
+    assert frame.at[0, 'sets'] * 4 + frame.at[0, 'unpair_pcs'] == ENTRY_MAX_QUANTITY
+
+
+def test_read_entry_rows_normalizes_csv_columns():
+    frame = read_entry_rows(csv_stream=io.StringIO('PO No,SKU,Product,Pcs Pack,Produced Qty\n PO1 ,S1,Mat,2,5\n'))
+
+    assert list(frame.columns)[:4] == ['date', 'po_no', 'sku', 'product']
+    assert frame.at[0, 'po_no'] == 'PO1'
+    # Columns missing from the file are added empty, not as NaN
+    assert frame.at[0, 'line'] == ''
+
+
+# --- ingest_entries -----------------------------------------------------------
+
+def test_ingest_entries_isolates_rows_that_fail_to_insert(supabase):
+    frame = read_entry_rows(records=[_entry(sku=f'SKU{number}') for number in range(600)] + [_entry(po_no='')])
+    # The database rejects one row, which fails the whole first chunk
+    supabase.fail_when = lambda method, table, params: method == 'POST' and len(supabase.requests) in (1, 44)
+
+    report = ingest_entries('tab_cutting', frame, first_row=2)
+
+    assert (report['rows'], report['inserted'], report['failed']) == (601, 599, 2)
+    failed = [result for result in report['results'] if result['status'] != 'inserted']
+    assert failed[0]['row'] == 44 and failed[0]['status'] == 'failed'
+    assert failed[1] == {'row': 602, 'status': 'invalid', 'errors': ['po_no is required']}
+    assert len(supabase.rows('tab_cutting')) == 599
+    # One chunk request, its row-by-row retry, then the second chunk in one request
+    assert len(supabase.requests) == 1 + 500 + 1
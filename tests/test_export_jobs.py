@@ -0,0 +1,125 @@
+import csv
+import os
+import time
+
+import pytest
+from openpyxl import load_workbook
+
+from app.utils import export_jobs
+from app.utils.export_jobs import submit_export_job, get_export_job
+
+
+class InlineExecutor:
+    """Runs submitted jobs immediately, so tests see their final state."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, function, *args):
+        self.submitted += 1
+        function(*args)
+
+
+@pytest.fixture
+def executor(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'EXPORT_ARTIFACT_DIR', str(tmp_path))
+    executor = InlineExecutor()
+    monkeypatch.setattr(export_jobs, '_get_executor', lambda: executor)
+    return executor
+
+
+def _rows(count):
+    return ({'id': number, 'po_no': f'PO{number}', 'formula': '=1+1'} for number in range(count))
+
+
+def test_job_writes_a_csv_artifact(executor, tmp_path):
+    job = submit_export_job({'table': 'tab_cutting'}, lambda: _rows(2500), 'Daily Cutting', count_rows=lambda: 2500)
+
+    assert (job['status'], job['rows_written'], job['total_rows'], job['progress']) == ('finished', 2500, 2500, 100)
+    with open(job['artifact'], newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 2500 and rows[0] == {'id': '0', 'po_no': 'PO0', 'formula': '=1+1'}
+    # Only the artifact and its state remain, no partial files
+    assert sorted(os.listdir(tmp_path)) == [f"{job['id']}.csv", f"{job['id']}.json"]
+
+
+def test_job_writes_an_xlsx_artifact(executor):
+    job = submit_export_job({'table': 'tab_cutting'}, lambda: _rows(3), 'Daily Cutting', 'xlsx')
+
+    sheet = load_workbook(job['artifact']).active
+    assert [cell.value for cell in sheet[1]] == ['id', 'po_no', 'formula']
+    assert sheet['C2'].value == '=1+1' and sheet['C2'].data_type == 's'
+
+
+def test_identical_requests_share_one_job(executor):
+    first = submit_export_job({'table': 'tab_cutting', 'search': 'x'}, lambda: _rows(5), 'Daily Cutting')
+    second = submit_export_job({'table': 'tab_cutting', 'search': 'x'}, lambda: _rows(5), 'Daily Cutting')
+    other_format = submit_export_job({'table': 'tab_cutting', 'search': 'x'}, lambda: _rows(5), 'Daily Cutting', 'xlsx')
+
+    assert first['id'] == second['id'] != other_format['id']
+    assert executor.submitted == 2
+
+
+def test_failed_job_is_reported_and_retried(executor, tmp_path):
+    def failing_rows():
+        yield from _rows(10)
+        raise RuntimeError('connection reset')
+
+    failed = submit_export_job({'table': 'tab_cutting'}, failing_rows, 'Daily Cutting')
+
+    assert (failed['status'], failed['error']) == ('failed', 'connection reset')
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.part') or name.endswith('.csv')]
+
+    retried = submit_export_job({'table': 'tab_cutting'}, lambda: _rows(10), 'Daily Cutting')
+    assert retried['status'] == 'finished'
+    assert executor.submitted == 2
+
+
+def test_running_job_is_reused_until_it_goes_stale(executor, monkeypatch):
+    executor.submit = lambda function, *args: None
+    queued = submit_export_job({'table': 'tab_cutting'}, lambda: _rows(1), 'Daily Cutting')
+    assert submit_export_job({'table': 'tab_cutting'}, lambda: _rows(1), 'Daily Cutting')['created_at'] == queued['created_at']
+
+    monkeypatch.setattr(export_jobs, 'EXPORT_JOB_STALE_AFTER', -1)
+    assert submit_export_job({'table': 'tab_cutting'}, lambda: _rows(1), 'Daily Cutting')['created_at'] > queued['created_at']
+
+
+def test_expired_jobs_are_removed(executor, tmp_path, monkeypatch):
+    job = submit_export_job({'table': 'tab_cutting'}, lambda: _rows(1), 'Daily Cutting')
+    monkeypatch.setattr(export_jobs, 'EXPORT_ARTIFACT_TTL', -1)
+
+    assert get_export_job(job['id']) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_progress_while_running(executor):
+    seen = []
+
+    def rows():
+        for row in _rows(2000):
+            if row['id'] == 1500:
+                seen.append(get_export_job(job_id)['progress'])
+            yield row
+
+    job_id = export_jobs.export_job_id({'table': 'tab_cutting', 'format': 'csv'})
+    submit_export_job({'table': 'tab_cutting'}, rows, 'Daily Cutting', count_rows=lambda: 4000)
+
+    # Progress is saved every EXPORT_PROGRESS_INTERVAL rows
+    assert seen == [25]
+
+
+def test_export_job_routes(supabase, client, executor):
+    supabase.tables['tab_cutting'] = [{'id': f'c{number}', 'po_no': 'PO1'} for number in range(3)]
+
+    response = client.post('/data/export-jobs', json={'table': 'cutting', 'format': 'csv'})
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['status'] == 'finished' and job['total_rows'] == 3
+
+    assert client.get(job['status_url']).get_json()['progress'] == 100
+    download = client.get(job['download_url'])
+    assert download.status_code == 200
+    assert download.get_data(as_text=True).splitlines()[0] == 'id,po_no'
+
+    assert client.post('/data/export-jobs', json={'table': 'users'}).status_code == 400
+    assert client.get('/data/export-jobs/unknown').status_code == 404
@@ -0,0 +1,59 @@
+import csv
+import io
+
+import pytest
+from flask import get_flashed_messages
+
+
+def _cutting_rows(count):
+    return [{'id': f'c{number:05d}', 'po_no': f'PO{number % 9}', 'sku': 'SKU1', 'produced_qty': number} for number in range(count)]
+
+
+def test_csv_export_streams_every_chunk(supabase, client):
+    supabase.tables['tab_cutting'] = _cutting_rows(2500)
+
+    response = client.get('/data/cutting-phase/export')
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert response.status_code == 200
+    assert [row['id'] for row in rows] == [f'c{number:05d}' for number in range(2500)]
+    # Keyset chunks of EXPORT_CHUNK_SIZE rows, never one request for the whole table
+    assert len([request for request in supabase.requests if request[0] == 'GET']) == 3
+
+
+def test_export_without_rows_redirects_with_a_notice(supabase, client):
+    with client:
+        response = client.get('/data/cutting-phase/export')
+
+        assert response.status_code == 302
+        assert get_flashed_messages() == ['No data to export.']
+
+
+def test_export_failing_before_the_first_row_redirects_with_the_error(supabase, client):
+    supabase.tables['tab_cutting'] = _cutting_rows(10)
+    supabase.fail_when = lambda method, table, params: True
+
+    with client:
+        response = client.get('/data/cutting-phase/export?format=xlsx')
+
+        assert response.status_code == 302
+        assert get_flashed_messages()[0].startswith('Error exporting data:')
+
+
+def test_xlsx_export_failing_mid_way_is_not_downloaded(supabase, client):
+    supabase.tables['tab_cutting'] = _cutting_rows(1500)
+    supabase.fail_when = lambda method, table, params: any(key == 'id' for key, _ in params)
+
+    response = client.get('/data/cutting-phase/export?format=xlsx')
+
+    assert response.status_code == 302
+
+
+def test_csv_export_failing_mid_stream_aborts_the_download(supabase, client):
+    supabase.tables['tab_cutting'] = _cutting_rows(1500)
+    # The second chunk is the first request with a keyset condition on id
+    supabase.fail_when = lambda method, table, params: any(key == 'id' for key, _ in params)
+
+    # The error surfaces while the body is streamed instead of ending it early
+    with pytest.raises(RuntimeError):
+        client.get('/data/cutting-phase/export').get_data()
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+
+from app.utils import idempotency
+from app.utils.idempotency import idempotent, MemoryIdempotencyStore, SqliteIdempotencyStore, set_idempotency_store
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    store = MemoryIdempotencyStore() if request.param == 'memory' else SqliteIdempotencyStore(str(tmp_path / 'keys.sqlite3'))
+    previous = idempotency._store
+    set_idempotency_store(store)
+    yield store
+    set_idempotency_store(previous)
+
+
+class Entries(list):
+    """Rows written by the test endpoint, with its client."""
+    block = None
+    client = None
+
+
+@pytest.fixture
+def entries():
+    """A JSON create endpoint counting its writes; `entries.block` holds the first call open."""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    written = Entries()
+
+    @app.route('/entries', methods=['POST'])
+    @idempotent
+    def create_entry():
+        if written.block is not None:
+            written.block.wait(5)
+        written.append(request.get_json())
+        return jsonify({'id': len(written)}), 201
+
+    written.client = app.test_client()
+    return written
+
+
+def _post(entries, data, key='key-1'):
+    return entries.client.post('/entries', json=data, headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_the_first_response(store, entries):
+    first = _post(entries, {'article': 'A1'})
+    second = _post(entries, {'article': 'A1'})
+
+    assert (first.status_code, second.status_code) == (201, 201)
+    assert second.get_json() == first.get_json() == {'id': 1}
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert len(entries) == 1
+
+
+def test_requests_without_a_key_always_run(store, entries):
+    entries.client.post('/entries', json={'article': 'A1'})
+    entries.client.post('/entries', json={'article': 'A1'})
+
+    assert len(entries) == 2
+
+
+def test_reusing_a_key_for_different_data_is_rejected(store, entries):
+    _post(entries, {'article': 'A1'})
+    response = _post(entries, {'article': 'A2'})
+
+    assert response.status_code == 422
+    assert len(entries) == 1
+
+
+def test_retry_while_the_first_request_runs_gets_a_conflict(store, entries):
+    claimed = threading.Event()
+    claim = store.claim
+
+    def signalling_claim(*args):
+        result = claim(*args)
+        claimed.set()
+        return result
+
+    store.claim = signalling_claim
+    entries.block = threading.Event()
+    first = threading.Thread(target=_post, args=(entries, {'article': 'A1'}))
+    first.start()
+    try:
+        assert claimed.wait(5)
+        response = _post(entries, {'article': 'A1'})
+    finally:
+        entries.block.set()
+        first.join()
+
+    assert response.status_code == 409
+    assert len(entries) == 1
+
+
+def test_failed_requests_release_the_key(store, entries):
+    app = entries.client.application
+
+    @app.route('/failing', methods=['POST'])
+    @idempotent
+    def failing():
+        entries.append(request.get_json())
+        return jsonify({'message': 'invalid'}), 400
+
+    headers = {'Idempotency-Key': 'key-2'}
+    assert entries.client.post('/failing', json={'article': 'A1'}, headers=headers).status_code == 400
+    assert entries.client.post('/failing', json={'article': 'A1'}, headers=headers).status_code == 400
+    assert len(entries) == 2
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'keys.sqlite3')
+    first, second = SqliteIdempotencyStore(path), SqliteIdempotencyStore(path)
+
+    assert first.claim(('idempotency', 'e', 'k'), 'f', 60) is None
+    assert second.claim(('idempotency', 'e', 'k'), 'f', 60) == ('f', None)
+    first.save(('idempotency', 'e', 'k'), 'f', (201, [('Content-Type', 'application/json')], b'{}'), 60)
+    assert second.claim(('idempotency', 'e', 'k'), 'f', 60) == ('f', (201, [('Content-Type', 'application/json')], b'{}'))
+
+
+def test_expired_claims_can_be_taken_again(tmp_path):
+    store = SqliteIdempotencyStore(str(tmp_path / 'keys.sqlite3'))
+
+    assert store.claim(('idempotency', 'e', 'k'), 'f', -1) is None
+    assert store.claim(('idempotency', 'e', 'k'), 'g', 60) is None
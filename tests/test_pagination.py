@@ -0,0 +1,199 @@
+from urllib.parse import urlencode
+
+import pytest
+from flask import Flask
+
+from app.models.data_models import get_paginated_data, encode_cursor, decode_cursor, cursor_filter
+
+
+@pytest.fixture
+def request_args():
+    """Runs get_paginated_data inside a request carrying the given query args."""
+    app = Flask(__name__)
+    contexts = []
+
+    def enter(**args):
+        context = app.test_request_context('/?' + urlencode(args))
+        context.push()
+        contexts.append(context)
+
+    enter()
+    yield enter
+    for context in reversed(contexts):
+        context.pop()
+
+
+def _rows(count, **values):
+    return [
+        {'id': f'r{number:05d}', 'input_timestamp': f'2024-01-01T00:00:{number % 60:02d}.{number:05d}', 'sets': number % 7, **values}
+        for number in range(count)
+    ]
+
+
+# --- offset pages ---------------------------------------------------------
+
+def test_offset_page_fetches_only_the_window(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(45)
+
+    page = get_paginated_data('tab_test', page=2, limit=10, count_mode='exact')
+
+    # Newest first
+    assert [row['id'] for row in page['rows']] == [f'r{number:05d}' for number in range(34, 24, -1)]
+    assert (page['total_rows'], page['total_pages'], page['total_exact']) == (45, 5, True)
+    _, _, params = supabase.requests[-1]
+    # One row past the page shows whether another follows
+    assert ('offset', '10') in params and ('limit', '11') in params
+
+
+def test_offset_short_page_is_the_last_whatever_the_count_mode(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(25)
+    supabase.estimates['tab_test'] = 5000
+
+    page = get_paginated_data('tab_test', page=3, limit=10, count_mode='planned')
+
+    assert len(page['rows']) == 5
+    assert (page['total_rows'], page['total_pages'], page['total_exact']) == (25, 3, True)
+
+
+def test_offset_page_applies_filters(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(70)
+    request_args(filter_field_0='sets', filter_operator_0='equal', filter_value_0='3')
+
+    page = get_paginated_data('tab_test', page=1, limit=5, count_mode='exact')
+
+    assert all(row['sets'] == 3 for row in page['rows'])
+    assert page['total_rows'] == 10
+
+
+def test_offset_page_clamps_the_limit(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(300)
+
+    page = get_paginated_data('tab_test', page=1, limit=5000, count_mode='exact')
+
+    assert len(page['rows']) == 100
+    assert page['total_pages'] == 3
+
+
+def test_offset_page_past_the_end(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(5)
+
+    page = get_paginated_data('tab_test', page=4, limit=10, count_mode='exact')
+
+    assert page['rows'] == []
+    assert (page['total_rows'], page['total_pages'], page['total_exact']) == (5, 1, True)
+
+
+# --- approximate totals ---------------------------------------------------
+
+def test_capped_total_beyond_the_cap(supabase, request_args):
+    # More rows than the API returns for one request, so the probe is cut at max-rows
+    supabase.tables['tab_test'] = _rows(2500)
+
+    page = get_paginated_data('tab_test', page=2, limit=10, count_mode='capped')
+
+    assert (page['total_rows'], page['total_capped'], page['total_exact']) == (10 + 999, True, False)
+    _, _, params = supabase.requests[-1]
+    assert ('select', 'id') in params and ('limit', '1000') in params
+
+
+def test_capped_total_within_the_cap_is_exact(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(999)
+
+    page = get_paginated_data('tab_test', page=1, limit=10, count_mode='capped')
+
+    assert (page['total_rows'], page['total_capped'], page['total_exact']) == (999, False, True)
+
+
+def test_capped_total_applies_filters_to_the_probe(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(700)
+    request_args(filter_field_0='sets', filter_operator_0='equal', filter_value_0='3')
+
+    page = get_paginated_data('tab_test', page=2, limit=10, count_mode='capped')
+
+    assert (page['total_rows'], page['total_capped']) == (100, False)
+
+
+def test_capped_page_past_the_end_counts_from_the_start(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(15)
+
+    page = get_paginated_data('tab_test', page=5, limit=10, count_mode='capped')
+
+    assert page['rows'] == []
+    assert (page['total_rows'], page['total_pages'], page['total_capped']) == (15, 2, False)
+
+
+def test_planned_total_on_a_full_page_leaves_a_next_page(supabase, request_args):
+    # The planner estimate undershoots the rows already seen
+    supabase.tables['tab_test'] = _rows(45)
+    supabase.estimates['tab_test'] = 20
+
+    page = get_paginated_data('tab_test', page=3, limit=10, count_mode='planned')
+
+    assert len(page['rows']) == 10
+    assert (page['total_rows'], page['total_pages'], page['total_exact']) == (31, 4, False)
+
+
+def test_planned_total_uses_the_estimate_when_larger(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(45)
+    supabase.estimates['tab_test'] = 5000
+
+    page = get_paginated_data('tab_test', page=1, limit=10, count_mode='planned')
+
+    assert (page['total_rows'], page['total_pages'], page['total_exact']) == (5000, 500, False)
+
+
+def test_estimated_total_on_a_page_filling_max_rows(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(1500)
+    supabase.estimates['tab_test'] = 1200
+
+    page = get_paginated_data('tab_test', page=2, limit=100, count_mode='estimated')
+
+    assert (page['total_rows'], page['total_pages']) == (1200, 12)
+
+
+# --- cursor pages ---------------------------------------------------------
+
+def test_cursor_round_trip():
+    token = encode_cursor({'input_timestamp': '2024-05-01T10:00:00', 'id': 'abc'}, 'prev')
+
+    assert decode_cursor(token) == ('2024-05-01T10:00:00', 'abc', 'prev')
+    assert '=' not in token
+
+
+def test_cursor_round_trip_without_timestamp():
+    token = encode_cursor({'input_timestamp': None, 'id': 42})
+
+    assert decode_cursor(token) == (None, 42, 'next')
+
+
+def test_decode_cursor_rejects_malformed_tokens():
+    assert decode_cursor('not a cursor') is None
+    assert decode_cursor('') is None
+    assert decode_cursor(encode_cursor({'input_timestamp': '2024-05-01'})) is None
+
+
+def test_cursor_filter_crosses_the_null_boundary():
+    assert cursor_filter('2024-05-01', 'abc') == (
+        'input_timestamp.lt."2024-05-01",and(input_timestamp.eq."2024-05-01",id.lt."abc"),input_timestamp.is.null'
+    )
+    assert cursor_filter('2024-05-01', 'abc', descending=False) == (
+        'input_timestamp.gt."2024-05-01",and(input_timestamp.eq."2024-05-01",id.gt."abc")'
+    )
+    assert cursor_filter(None, 'abc') == 'and(input_timestamp.is.null,id.lt."abc")'
+    assert cursor_filter(None, 'abc', descending=False) == (
+        'input_timestamp.not.is.null,and(input_timestamp.is.null,id.gt."abc")'
+    )
+
+
+def test_first_cursor_page_links_to_the_next(supabase, request_args):
+    supabase.tables['tab_test'] = _rows(12)
+
+    page = get_paginated_data('tab_test', limit=5, columns=['sets'], pagination='cursor')
+
+    assert page['pagination_mode'] == 'cursor'
+    assert [row['id'] for row in page['rows']] == ['r00011', 'r00010', 'r00009', 'r00008', 'r00007']
+    assert page['prev_cursor'] is None
+    assert decode_cursor(page['next_cursor'])[1:] == ('r00007', 'next')
+    # The keyset is selected even when the caller didn't ask for it, and one extra row shows another page follows
+    _, _, params = supabase.requests[-1]
+    assert ('select', 'sets,input_timestamp,id') in params and ('limit', '6') in params
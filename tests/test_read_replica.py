@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from app.utils import read_replica
+from app.utils.read_replica import ReplicaQuery
+
+
+ROWS = [
+    {'id': 'c1', 'po_no': 'PO1', 'sku': 'SKU-A', 'product': 'Mat', 'produced_qty': 5, 'input_timestamp': '2024-05-01'},
+    {'id': 'c2', 'po_no': 'PO1', 'sku': 'SKU-B', 'product': None, 'produced_qty': 25, 'input_timestamp': '2024-05-02'},
+    {'id': 'c3', 'po_no': 'PO2', 'sku': 'SKU-A', 'product': 'Rug', 'produced_qty': 15, 'input_timestamp': None},
+    {'id': 'c4', 'po_no': 'PO3, "Q"', 'sku': 'SKU-C', 'product': 'Runner', 'produced_qty': 0, 'input_timestamp': '2024-05-02'},
+]
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """A replica file holding a copy of tab_cutting."""
+    monkeypatch.setattr(read_replica, 'READ_REPLICA_PATH', str(tmp_path / 'replica.sqlite3'))
+    monkeypatch.setattr(read_replica, '_local', threading.local())
+    conn = read_replica._connect()
+    read_replica._create_table(conn, 'tab_cutting', list(ROWS[0].keys()), 'id')
+    read_replica._insert_rows(conn, 'tab_cutting', ROWS, replace=False)
+    yield conn
+    conn.close()
+
+
+def _ids(query) -> list:
+    return [row['id'] for row in query.order('id').execute().data]
+
+
+def test_or_with_simple_conditions(replica):
+    query = ReplicaQuery('tab_cutting').select('id').or_('sku.ilike.%-b%,product.eq.Rug')
+
+    assert _ids(query) == ['c2', 'c3']
+
+
+def test_or_with_nested_and_groups(replica):
+    query = ReplicaQuery('tab_cutting').select('id').or_('and(po_no.eq.PO1,produced_qty.lt.20),id.in.(c3,c4)')
+
+    assert _ids(query) == ['c1', 'c3', 'c4']
+
+
+def test_or_with_negated_conditions_and_groups(replica):
+    query = ReplicaQuery('tab_cutting').select('id').or_('product.not.is.null,not.and(po_no.eq.PO1,sku.eq.SKU-B)')
+
+    # c2 has no product and is excluded by the negated group
+    assert _ids(query) == ['c1', 'c3', 'c4']
+
+
+def test_or_with_quoted_values(replica):
+    query = ReplicaQuery('tab_cutting').select('id').or_('po_no.eq."PO3, \\"Q\\"",input_timestamp.lt."2024-05-02"')
+
+    assert _ids(query) == ['c1', 'c4']
+
+
+def test_or_compares_numeric_strings_as_numbers(replica):
+    # As text '5' > '20', but produced_qty is numeric
+    query = ReplicaQuery('tab_cutting').select('id').or_('produced_qty.gt.20,produced_qty.eq.0')
+
+    assert _ids(query) == ['c2', 'c4']
+
+
+def test_or_combines_with_other_filters(replica):
+    query = ReplicaQuery('tab_cutting').select('id', count='exact') \
+        .or_('sku.eq.SKU-A,sku.eq.SKU-B') \
+        .not_.is_('product', None)
+    response = query.order('id').execute()
+
+    assert [row['id'] for row in response.data] == ['c1', 'c3']
+    assert response.count == 2
+
+
+def test_negated_or(replica):
+    query = ReplicaQuery('tab_cutting').select('id').not_.or_('po_no.eq.PO1,produced_qty.eq.0')
+
+    assert _ids(query) == ['c3']
+
+
+def test_or_on_unknown_column_matches_nothing(replica):
+    query = ReplicaQuery('tab_cutting').select('id').or_('missing.eq.x,id.eq.c1')
+
+    assert _ids(query) == ['c1']
+
+
+def test_unsupported_operator_is_rejected(replica):
+    with pytest.raises(ValueError):
+        ReplicaQuery('tab_cutting').select('id').or_('sku.fts.mat')
+
+
+# --- sync -------------------------------------------------------------------
+
+@pytest.fixture
+def replica_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(read_replica, 'READ_REPLICA_PATH', str(tmp_path / 'replica.sqlite3'))
+    monkeypatch.setattr(read_replica, '_local', threading.local())
+    yield
+    read_replica._connect().close()
+
+
+def _cutting(prefix, count, timestamp):
+    return [{'id': f'{prefix}{number:05d}', 'input_timestamp': timestamp, 'po_no': prefix} for number in range(count)]
+
+
+def test_full_then_incremental_sync(supabase, replica_path):
+    supabase.tables['tab_cutting'] = _cutting('a', 2500, '2024-01-01')
+    read_replica.full_sync_table('tab_cutting')
+
+    # New rows share the watermark's timestamp and outnumber a page
+    supabase.rows('tab_cutting').extend(_cutting('b', 1500, '2024-01-01'))
+    supabase.rows('tab_cutting')[0]['po_no'] = 'edited'
+    supabase.rows('tab_cutting')[0]['input_timestamp'] = '2024-01-02'
+    supabase.requests.clear()
+    read_replica.incremental_sync_table('tab_cutting')
+
+    assert ReplicaQuery('tab_cutting').select('id', count='exact').limit(1).execute().count == 4000
+    assert ReplicaQuery('tab_cutting').select('po_no').eq('id', 'a00000').execute().data == [{'po_no': 'edited'}]
+    assert read_replica._get_state(read_replica._connect(), 'tab_cutting')['watermark'] == '2024-01-02'
+    # Incremental pages are keyset pages on (timestamp, id) from the watermark
+    assert all(('input_timestamp', 'gte.2024-01-01') in params for _, _, params in supabase.requests)
+    assert all(('order', 'input_timestamp.asc,id.asc') in params for _, _, params in supabase.requests)
+    assert len(supabase.requests) == 5
+
+
+def test_sync_keeps_values_with_quotes_and_commas(supabase, replica_path):
+    rows = [{'id': f'x"{number:04d},\\', 'input_timestamp': '2024-01-01', 'po_no': 'P'} for number in range(1001)]
+    supabase.tables['tab_cutting'] = list(rows)
+    read_replica.full_sync_table('tab_cutting')
+    supabase.rows('tab_cutting').extend(_cutting('y', 1, '2024-01-01'))
+
+    read_replica.incremental_sync_table('tab_cutting')
+
+    assert ReplicaQuery('tab_cutting').select('id', count='exact').limit(1).execute().count == 1002
@@ -0,0 +1,119 @@
+import io
+
+import pandas as pd
+import pytest
+from flask import get_flashed_messages
+
+from app.models.sales_order_models import read_order_file, validate_order_rows, import_sales_orders, IMPORT_MAX_QUANTITY
+
+
+def _file(text):
+    return read_order_file(io.BytesIO(text.encode()), 'orders.csv')
+
+
+def _line(**values):
+    return {'po_no': 'PO1', 'po_date': '2025-02-03', 'sku': 'SKU1', 'pieces': '2', **values}
+
+
+def _frame(*lines):
+    return read_order_file(io.BytesIO(pd.DataFrame(list(lines)).to_csv(index=False).encode()), 'orders.csv')
+
+
+def test_read_order_file_normalizes_columns():
+    frame = _file('PO No,SKU,Pieces\n PO1 ,SKU1,2\n,,\n')
+
+    assert len(frame) == 1
+    assert frame.iloc[0][['po_no', 'sku', 'pieces', 'branch']].tolist() == ['PO1', 'SKU1', '2', '']
+
+
+@pytest.mark.parametrize('content, filename', [
+    (b'not a zip archive', 'orders.xlsx'),
+    (b'\x00\x01garbage', 'orders.xls'),
+    ('po_no\n"unterminated'.encode(), 'orders.csv'),
+])
+def test_read_order_file_reports_unreadable_files(content, filename):
+    with pytest.raises(ValueError, match='Could not read'):
+        read_order_file(io.BytesIO(content), filename)
+
+
+def test_read_order_file_rejects_other_types_and_missing_po_column():
+    with pytest.raises(ValueError, match='Upload a'):
+        read_order_file(io.BytesIO(b''), 'orders.json')
+    with pytest.raises(ValueError, match='po_no'):
+        _file('sku\nSKU1\n')
+
+
+def test_validate_order_rows_bounds_quantities(supabase):
+    frame, errors = validate_order_rows(_frame(
+        _line(po_no='PO1'),
+        _line(po_no='PO2', pieces='1e20'),
+        _line(po_no='PO3', sets='2.5'),
+        _line(po_no='PO4', pack_of='-1'),
+        _line(po_no='PO5', pieces=str(IMPORT_MAX_QUANTITY)),
+    ))
+
+    message = f'must be a whole number between 0 and {IMPORT_MAX_QUANTITY}'
+    assert errors == {1: [f'pieces {message}'], 2: [f'sets {message}'], 3: [f'pack_of {message}']}
+    assert frame['pieces'].tolist() == [2, pd.NA, 2, 2, IMPORT_MAX_QUANTITY]
+
+
+def test_validate_order_rows_requires_iso_dates(supabase):
+    frame, errors = validate_order_rows(_frame(
+        _line(po_no='PO1', po_date='2025-02-03'),
+        _line(po_no='PO2', po_date='02/03/2025'),
+        _line(po_no='PO3', po_date='2025-02-30'),
+        # Excel date cells read as text
+        _line(po_no='PO4', po_date='2025-02-03 00:00:00'),
+    ))
+
+    assert errors == {1: ['po_date must be a valid YYYY-MM-DD date'], 2: ['po_date must be a valid YYYY-MM-DD date']}
+    assert frame.loc[[0, 3], 'po_date'].tolist() == ['2025-02-03', '2025-02-03']
+
+
+def test_validate_order_rows_rejects_whole_pos(supabase):
+    supabase.rows('tab_sales_order').append({'po_no': 'TAKEN'})
+
+    _, errors = validate_order_rows(_frame(
+        _line(po_no='PO1'),
+        _line(po_no='PO1', pieces='x'),
+        _line(po_no='PO2', branch='Karur'),
+        _line(po_no='PO2', branch='Mumbai'),
+        _line(po_no='TAKEN'),
+        _line(po_no=''),
+    ))
+
+    assert errors[0] == ['not imported: another line of this PO has errors']
+    assert errors[2] == errors[3] == ['order header values differ between lines of this PO']
+    assert errors[4] == ['PO number already exists']
+    assert errors[5] == ['po_no is required']
+
+
+def test_import_sales_orders_reports_file_rows(supabase):
+    report = import_sales_orders(_frame(
+        _line(po_no='PO1', pieces='2'),
+        _line(po_no='PO1', sku='SKU2', pieces='3'),
+        _line(po_no='PO2', pieces='1e20'),
+    ))
+
+    assert (report['orders_imported'], report['items_imported']) == (1, 2)
+    assert report['errors'] == [{'row': 4, 'po_no': 'PO2', 'errors': [f'pieces must be a whole number between 0 and {IMPORT_MAX_QUANTITY}']}]
+    assert supabase.rows('tab_sales_order')[0]['total_qty'] == 5
+    assert [item['sr_no'] for item in supabase.rows('tab_sales_order_items')] == [1, 2]
+
+
+@pytest.fixture
+def logged_in(client):
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    return client
+
+
+def test_import_route_rejects_bad_uploads_with_400(supabase, logged_in):
+    with logged_in:
+        response = logged_in.post('/sales-order/import', data={'file': (io.BytesIO(b'not a zip archive'), 'orders.xlsx')})
+        assert response.status_code == 400
+        assert get_flashed_messages()[0].startswith('Could not read orders.xlsx')
+
+    response = logged_in.post('/sales-order/import?format=json', data={'file': (io.BytesIO(b'not a zip archive'), 'orders.xlsx')})
+    assert response.status_code == 400
+    assert response.get_json()['message'].startswith('Could not read orders.xlsx')
@@ -0,0 +1,129 @@
+import pytest
+from postgrest.exceptions import APIError
+
+from app.models.sales_order_models import diff_order_items, save_sales_order, save_sales_order_local, SalesOrderExists
+
+
+def _item(id, sr_no, sku, **values):
+    return {'id': id, 'po_no': 'PO1', 'sr_no': sr_no, 'sku': sku, **values}
+
+
+def test_diff_order_items_classifies_changes():
+    existing = [
+        _item('a', 1, 'SKU1', product='Mat', pieces=10),
+        _item('b', 2, 'SKU2', product='Rug', pieces=5),
+        _item('c', 3, 'SKU3', product='Runner', pieces=2),
+    ]
+    submitted = [
+        # Form values are strings; an equal value is not a change
+        {'sr_no': '1', 'sku': 'SKU1', 'product': 'Mat', 'pieces': '10'},
+        {'sr_no': '2', 'sku': 'SKU2', 'product': 'Rug', 'pieces': '8'},
+        {'id': 'd', 'sr_no': '4', 'sku': 'SKU4', 'product': 'Cushion', 'pieces': '1'},
+    ]
+
+    inserts, updates, delete_ids = diff_order_items(existing, submitted)
+
+    assert inserts == [submitted[2]]
+    assert updates == [{**existing[1], 'pieces': '8'}]
+    assert delete_ids == ['c']
+
+
+def test_diff_order_items_treats_none_and_blank_alike():
+    existing = [_item('a', 1, 'SKU1', design=None, size='')]
+    submitted = [{'sr_no': 1, 'sku': 'SKU1', 'design': '', 'size': None}]
+
+    assert diff_order_items(existing, submitted) == ([], [], [])
+
+
+def test_diff_order_items_matches_on_sr_no_and_sku():
+    existing = [_item('a', 1, 'SKU1', product='Mat')]
+    submitted = [{'id': 'b', 'sr_no': 1, 'sku': 'SKU9', 'product': 'Mat'}]
+
+    inserts, updates, delete_ids = diff_order_items(existing, submitted)
+
+    assert inserts == submitted
+    assert updates == []
+    assert delete_ids == ['a']
+
+
+# --- save_sales_order ---------------------------------------------------------
+
+def test_save_sales_order_calls_the_function(supabase):
+    calls = []
+
+    def save_sales_order_function(arguments):
+        calls.append(arguments)
+        return [{'order': {**arguments['p_order'], 'total_qty': 3}, 'items': arguments['p_items']}]
+
+    supabase.functions['save_sales_order'] = save_sales_order_function
+    items = [{'id': 'i1', 'po_no': 'PO1', 'sr_no': 1, 'sku': 'SKU1', 'pieces': 3}]
+
+    saved = save_sales_order({'po_no': 'PO1'}, items, create=True)
+
+    assert calls == [{'p_order': {'po_no': 'PO1'}, 'p_items': items, 'p_create': True}]
+    assert saved == {'order': {'po_no': 'PO1', 'total_qty': 3}, 'items': items}
+    # Everything happened in the one call
+    assert [table for _, table, _ in supabase.requests] == ['rpc/save_sales_order']
+
+
+def test_save_sales_order_maps_unique_violations(supabase):
+    def taken(arguments):
+        raise APIError({'code': '23505', 'message': 'PO number PO1 already exists'})
+
+    supabase.functions['save_sales_order'] = taken
+
+    with pytest.raises(SalesOrderExists):
+        save_sales_order({'po_no': 'PO1'}, [], create=True)
+
+
+def test_save_sales_order_falls_back_without_the_function(supabase):
+    saved = save_sales_order({'po_no': 'PO1'}, [{'id': 'i1', 'po_no': 'PO1', 'sr_no': 1, 'sku': 'SKU1', 'pieces': 4}], create=True)
+
+    assert saved['order'] == {'po_no': 'PO1', 'total_qty': 4}
+    assert supabase.rows('tab_sales_order_items')[0]['id'] == 'i1'
+
+
+def test_save_sales_order_local_creates_order(supabase):
+    items = [
+        {'id': 'i2', 'po_no': 'PO1', 'sr_no': 2, 'sku': 'SKU2', 'pieces': '5'},
+        {'id': 'i1', 'po_no': 'PO1', 'sr_no': 1, 'sku': 'SKU1', 'pieces': '10'},
+    ]
+
+    saved = save_sales_order_local({'po_no': 'PO1', 'status': 'Open'}, items, create=True)
+
+    assert saved['order']['total_qty'] == 15
+    assert [item['id'] for item in saved['items']] == ['i1', 'i2']
+    assert supabase.rows('tab_sales_order') == [{'po_no': 'PO1', 'status': 'Open', 'total_qty': 15}]
+    assert len(supabase.rows('tab_sales_order_items')) == 2
+
+
+def test_save_sales_order_local_rejects_existing_po(supabase):
+    supabase.rows('tab_sales_order').append({'po_no': 'PO1'})
+
+    with pytest.raises(SalesOrderExists):
+        save_sales_order_local({'po_no': 'PO1'}, [], create=True)
+
+
+def test_save_sales_order_local_applies_only_the_item_diff(supabase):
+    supabase.rows('tab_sales_order').append({'po_no': 'PO1', 'status': 'Open', 'total_qty': 17})
+    supabase.rows('tab_sales_order_items').extend([
+        _item('a', 1, 'SKU1', product='Mat', pieces=10),
+        _item('b', 2, 'SKU2', product='Rug', pieces=5),
+        _item('c', 3, 'SKU3', product='Runner', pieces=2),
+    ])
+    submitted = [
+        {'sr_no': 1, 'sku': 'SKU1', 'product': 'Mat', 'pieces': 10},
+        {'sr_no': 2, 'sku': 'SKU2', 'product': 'Rug', 'pieces': 7},
+        {'id': 'd', 'po_no': 'PO1', 'sr_no': 4, 'sku': 'SKU4', 'product': 'Cushion', 'pieces': 1},
+    ]
+    supabase.requests.clear()
+
+    saved = save_sales_order_local({'po_no': 'PO1', 'status': 'Closed'}, submitted, create=False)
+
+    item_writes = [method for method, table, _ in supabase.requests if table == 'tab_sales_order_items' and method != 'GET']
+    # One delete, one upsert and one insert; the unchanged item is not written
+    assert sorted(item_writes) == ['DELETE', 'POST', 'POST']
+    assert saved['order'] == {'po_no': 'PO1', 'status': 'Closed', 'total_qty': 18}
+    assert [(item['id'], item['pieces']) for item in saved['items']] == [('a', 10), ('b', 7), ('d', 1)]
+    stored = {item['id']: item['pieces'] for item in supabase.rows('tab_sales_order_items')}
+    assert stored == {'a': 10, 'b': 7, 'd': 1}
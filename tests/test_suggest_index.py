@@ -0,0 +1,79 @@
+import pytest
+
+from app.utils import suggest_index as suggest_module
+from app.utils.suggest_index import SuggestIndex
+
+
+@pytest.fixture
+def tables(supabase):
+    supabase.tables.update({
+        'tab_cutting': [
+            {'id': f'c{number:05d}', 'input_timestamp': f'2024-01-01T{number // 3600 % 24:02d}:{number // 60 % 60:02d}:{number % 60:02d}',
+             'po_no': f'PO-{number:05d}', 'sku': 'SKU-MAT', 'product': 'Mat', 'design': None}
+            for number in range(2500)
+        ],
+        'tab_production': [],
+        'tab_sales_order': [{'po_no': 'SO-1', 'created_at': '2024-01-01'}],
+        'tab_sales_order_items': [{'id': 'i1', 'sku': 'Rug-Blue', 'product': 'Rug', 'design': 'Stripe', 'created_at': '2024-01-01'}],
+        'tab_shipment_meta': [
+            {'month': '2024-01-01', 'shipment_id': f'SH-{number:04d}'} for number in range(1200)
+        ] + [{'month': '2023-12-01', 'shipment_id': 'SH-9999'}],
+    })
+    return supabase
+
+
+def test_rebuild_pages_every_table_by_keyset(tables):
+    index = SuggestIndex()
+
+    assert index.rebuild() and index.ready
+    assert index.suggest('po-0249', ['po_no']) == [{'field': 'po_no', 'value': f'PO-0249{digit}'} for digit in range(10)]
+    assert index.suggest('sh-9999') == [{'field': 'shipment_id', 'value': 'SH-9999'}]
+    cutting_orders = [dict(params).get('order') for method, table, params in tables.requests if table == 'tab_cutting']
+    shipment_orders = [dict(params).get('order') for method, table, params in tables.requests if table == 'tab_shipment_meta']
+    # More rows than max-rows, read in keyset pages with a total order and no OFFSET
+    assert cutting_orders == ['id.asc'] * 3
+    assert shipment_orders == ['month.asc,shipment_id.asc'] * 2
+    assert not any(key == 'offset' for _, _, params in tables.requests for key, _ in params)
+
+
+def test_suggest_is_case_insensitive_and_limited(tables):
+    index = SuggestIndex()
+    index.rebuild()
+
+    assert index.suggest('rug') == [{'field': 'sku', 'value': 'Rug-Blue'}, {'field': 'product', 'value': 'Rug'}]
+    assert index.suggest('mAt', ['sku', 'product']) == [{'field': 'product', 'value': 'Mat'}]
+    assert len(index.suggest('po-', limit=7)) == 7
+    assert index.suggest('  ') == []
+
+
+def test_refresh_loads_only_rows_since_the_watermark(tables):
+    index = SuggestIndex()
+    index.rebuild()
+    tables.rows('tab_cutting').append({'id': 'c99999', 'input_timestamp': '2024-02-01', 'po_no': 'PO-NEW', 'sku': None, 'product': None, 'design': None})
+    tables.rows('tab_shipment_meta').append({'month': '2024-02-01', 'shipment_id': 'SH-NEW'})
+    tables.requests.clear()
+
+    index.refresh()
+
+    assert index.suggest('po-new') == [{'field': 'po_no', 'value': 'PO-NEW'}]
+    # Tables without a timestamp wait for the next rebuild
+    assert index.suggest('sh-new') == []
+    cutting = [params for method, table, params in tables.requests if table == 'tab_cutting']
+    assert len(cutting) == 1
+    assert ('input_timestamp', 'gte.2024-01-01T00:41:39') in cutting[0]
+    assert ('order', 'input_timestamp.asc,id.asc') in cutting[0]
+
+
+def test_rebuild_drops_removed_values_and_survives_failures(tables, monkeypatch):
+    index = SuggestIndex()
+    index.rebuild()
+    tables.tables['tab_sales_order'] = []
+
+    tables.fail_when = lambda method, table, params: table == 'tab_shipment_meta'
+    assert not index.rebuild()
+    assert index.suggest('so-') == [{'field': 'po_no', 'value': 'SO-1'}]
+
+    tables.fail_when = None
+    monkeypatch.setattr(suggest_module, 'SUGGEST_REBUILD_INTERVAL', 0)
+    index.refresh()
+    assert index.suggest('so-') == []